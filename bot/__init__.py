@@ -1,9 +1,12 @@
 import signal
 import sys
 import logging
-from wcferry import Wcf
+from wcferry import Wcf, WxMsg
 from queue import Empty
+from services import PicMaker
 from .msg_handler import MsgHandler
+from .dispatcher import MsgDispatcher, SerializedWcf
+from .contact_directory import ContactDirectory
 
 # 初始化日志
 logging.basicConfig(
@@ -18,13 +21,34 @@ class QCBot:
     def __init__(self):
         """初始化机器人和消息处理"""
         self.wcf = Wcf()
-        self.msg_handler = MsgHandler()
+        # 接收循环与工作线程并发调用 wcf 接口，统一经由串行化代理
+        self.safe_wcf = SerializedWcf(self.wcf)
+        self.contacts = ContactDirectory(self.safe_wcf)
+        self.msg_handler = MsgHandler(contacts=self.contacts)
+        self.dispatcher = MsgDispatcher(self._handle_message, self._reply_text)
 
     def signal_handler(self):
         """处理终止信号"""
         logger.info("收到终止信号，正在退出...")
+        self.dispatcher.stop()
+        self.contacts.stop()
+        PicMaker.shutdown_render_pool()
         self.wcf.cleanup()
         sys.exit(0)
+
+    def _handle_message(self, msg: WxMsg):
+        """在工作线程中执行消息处理"""
+        if msg.from_group():
+            self.msg_handler.process_room_message(self.safe_wcf, msg)
+        else:
+            self.msg_handler.process_person_message(self.safe_wcf, msg)
+
+    def _reply_text(self, msg: WxMsg, text: str):
+        """回复排队/繁忙等提示"""
+        if msg.from_group():
+            self.safe_wcf.send_text(f"@{self.contacts.get_alias(msg.sender, msg.roomid)} {text}", msg.roomid, msg.sender)
+        else:
+            self.safe_wcf.send_text(text, msg.sender)
     
 
     def run(self):
@@ -41,8 +65,13 @@ class QCBot:
                 logger.info("微信已登录，正在监听消息...")
             else:
                 logger.warning("微信未登录，请扫码登录...")
+
+            # 开始接收消息前预热渲染（启动浏览器、加载字体和图标），避免第一个请求承担冷启动耗时
+            PicMaker.warm_up()
   
+            self.contacts.start()
             self.wcf.enable_receiving_msg()
+            self.dispatcher.start()
 
             # 进入消息循环
             while self.wcf.is_receiving_msg():
@@ -51,20 +80,23 @@ class QCBot:
 
                     if msg.is_text() and not msg.from_group():
                         """回复私聊消息"""
-                        friends_list = self.wcf.get_friends()
-                        sender_name = next((friend['name'] for friend in friends_list if friend['wxid'] == msg.sender), "未知用户")
+                        sender_name = self.contacts.get_friend_name(msg.sender)
                         logger.info(f"收到私聊消息: {msg.content} - 来自好友[{sender_name}]")
 
-                        self.msg_handler.process_person_message(self.wcf, msg)
+                        if self.msg_handler.is_command(msg.content):
+                            self.dispatcher.dispatch(msg)
 
                     elif msg.is_text() and msg.from_group():
                         """回复群聊消息"""
-                        contacts_list = self.wcf.get_contacts()
-                        sender_room_name = next((contact['name'] for contact in contacts_list if contact['wxid'] == msg.roomid), "未知群组")
-                        logger.info(f"收到群聊消息: {msg.content} - 来自群[{sender_room_name}]中成员:[{self.wcf.get_alias_in_chatroom(msg.sender, msg.roomid)}]")
+                        sender_room_name = self.contacts.get_room_name(msg.roomid)
+                        logger.info(f"收到群聊消息: {msg.content} - 来自群[{sender_room_name}]中成员:[{self.contacts.get_alias(msg.sender, msg.roomid)}]")
+
+                        if sender_room_name == "测试群" and self.msg_handler.is_command(msg.content):
+                            self.dispatcher.dispatch(msg)
 
-                        if sender_room_name == "测试群":
-                            self.msg_handler.process_room_message(self.wcf, msg)
+                    elif msg.type == 10000:
+                        """群成员变动等系统消息"""
+                        self.contacts.handle_system_message(msg)
 
                     else:
                         logger.info("收到非文本消息,忽略")
@@ -0,0 +1,136 @@
+import os
+import time
+import logging
+import threading
+from typing import Dict, Optional, Tuple
+
+from wcferry import WxMsg
+
+logger = logging.getLogger(__name__)
+
+# 群成员变动、群改名等系统消息中的关键字，出现时需要刷新该群的缓存
+MEMBERSHIP_KEYWORDS = ("加入了群聊", "加入群聊", "移出了群聊", "退出了群聊", "修改群名为")
+
+
+class ContactDirectory:
+    """
+    联系人目录缓存，提供 wxid→昵称、roomid→群名、(roomid, wxid)→群昵称 的字典查询
+
+    好友和群名在启动时全量加载并由后台线程按 TTL 定期刷新；群昵称首次查询时
+    从 wcferry 获取一次，过期后由后台线程刷新，热路径上不再产生 RPC 调用。
+    """
+
+    def __init__(self, wcf, ttl: Optional[int] = None):
+        """
+        初始化联系人目录
+
+        Args:
+            wcf: Wcf 实例（或其线程安全代理）
+            ttl: 缓存有效期（秒），如果为None则从环境变量获取
+        """
+        self.wcf = wcf
+        self.ttl = ttl if ttl is not None else int(os.getenv('CONTACT_CACHE_TTL', 600))
+
+        self._friends: Dict[str, str] = {}
+        self._rooms: Dict[str, str] = {}
+        # roomid -> {wxid: (群昵称, 获取时间)}
+        self._aliases: Dict[str, Dict[str, Tuple[str, float]]] = {}
+        self._lock = threading.Lock()
+        self._refresh_now = threading.Event()
+        self._stopped = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        """加载联系人并启动后台刷新线程"""
+        self.refresh()
+        self._thread = threading.Thread(target=self._refresh_loop, name="ContactRefresher", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """停止后台刷新线程"""
+        self._stopped.set()
+        self._refresh_now.set()
+
+    def refresh(self):
+        """全量刷新好友和群名"""
+        try:
+            friends = {f['wxid']: f['name'] for f in self.wcf.get_friends()}
+            rooms = {c['wxid']: c['name'] for c in self.wcf.get_contacts() if c['wxid'].endswith('@chatroom')}
+        except Exception as e:
+            logger.error(f"刷新联系人失败: {e}")
+            return
+        with self._lock:
+            self._friends = friends
+            self._rooms = rooms
+        logger.info(f"联系人已刷新: 好友 {len(friends)} 个, 群聊 {len(rooms)} 个")
+
+    def _refresh_aliases(self):
+        """重新获取已过期的群昵称"""
+        now = time.time()
+        with self._lock:
+            stale = [(roomid, wxid) for roomid, members in self._aliases.items()
+                     for wxid, (_, fetched_at) in members.items() if now - fetched_at >= self.ttl]
+        for roomid, wxid in stale:
+            if self._stopped.is_set():
+                return
+            self._fetch_alias(wxid, roomid)
+
+    def _refresh_loop(self):
+        while not self._stopped.is_set():
+            self._refresh_now.wait(timeout=self.ttl)
+            self._refresh_now.clear()
+            if self._stopped.is_set():
+                return
+            self.refresh()
+            self._refresh_aliases()
+
+    def _fetch_alias(self, wxid: str, roomid: str) -> str:
+        try:
+            alias = self.wcf.get_alias_in_chatroom(wxid, roomid)
+        except Exception as e:
+            logger.error(f"获取群昵称失败: {e}")
+            alias = ""
+        alias = alias or self._friends.get(wxid, "")
+        with self._lock:
+            self._aliases.setdefault(roomid, {})[wxid] = (alias, time.time())
+        return alias
+
+    def get_friend_name(self, wxid: str, default: str = "未知用户") -> str:
+        """查询好友昵称"""
+        return self._friends.get(wxid, default)
+
+    def get_room_name(self, roomid: str, default: str = "未知群组") -> str:
+        """查询群名"""
+        return self._rooms.get(roomid, default)
+
+    def get_alias(self, wxid: str, roomid: str) -> str:
+        """
+        查询群成员的群昵称，缓存未命中时从 wcferry 获取一次
+
+        Args:
+            wxid: 成员的wxid
+            roomid: 群ID
+        """
+        entry = self._aliases.get(roomid, {}).get(wxid)
+        if entry is not None:
+            return entry[0]
+        return self._fetch_alias(wxid, roomid)
+
+    def invalidate_room(self, roomid: str):
+        """清除某个群的群昵称缓存，并触发一次后台全量刷新（更新群名）"""
+        with self._lock:
+            self._aliases.pop(roomid, None)
+        self._refresh_now.set()
+
+    def handle_system_message(self, msg: WxMsg) -> bool:
+        """
+        处理群系统消息，群成员变动或群改名时使缓存失效
+
+        Returns:
+            是否触发了缓存失效
+        """
+        if msg.from_group() and any(keyword in msg.content for keyword in MEMBERSHIP_KEYWORDS):
+            logger.info(f"群成员或群名变动，刷新缓存: {msg.roomid}")
+            self.invalidate_room(msg.roomid)
+            return True
+        return False
@@ -0,0 +1,171 @@
+import os
+import logging
+import threading
+from collections import deque
+from typing import Any, Callable, Deque, Dict, Optional
+
+from wcferry import Wcf, WxMsg
+
+logger = logging.getLogger(__name__)
+
+
+class SerializedWcf:
+    """
+    Wcf 的线程安全代理
+
+    wcferry 的指令通道是单个请求/应答套接字，多个工作线程同时调用会互相打断，
+    因此所有方法调用都在同一把锁内串行执行。
+    """
+
+    def __init__(self, wcf: Wcf):
+        self._wcf = wcf
+        self._lock = threading.RLock()
+
+    def __getattr__(self, name: str) -> Any:
+        attr = getattr(self._wcf, name)
+        if not callable(attr):
+            return attr
+
+        def locked(*args, **kwargs):
+            with self._lock:
+                return attr(*args, **kwargs)
+        return locked
+
+
+class MsgDispatcher:
+    """
+    消息分发器：接收循环只负责入队，由有限数量的工作线程执行指令处理
+
+    同一会话（群聊按 roomid，私聊按 sender）的消息按到达顺序串行处理，
+    不同会话之间并发，并在会话间轮转以避免单个群占满所有工作线程。
+    """
+
+    def __init__(self, handler: Callable[[WxMsg], None], reply: Callable[[WxMsg, str], None],
+                 workers: Optional[int] = None, max_queue: Optional[int] = None,
+                 max_room_queue: Optional[int] = None):
+        """
+        初始化消息分发器
+
+        Args:
+            handler: 消息处理函数，在工作线程中执行
+            reply: 发送排队/繁忙提示的函数
+            workers: 工作线程数量，如果为None则从环境变量获取
+            max_queue: 全局最多排队的消息数
+            max_room_queue: 单个会话最多排队的消息数
+        """
+        self.handler = handler
+        self.reply = reply
+        self.workers = workers if workers is not None else int(os.getenv('MSG_WORKERS', 4))
+        self.max_queue = max_queue if max_queue is not None else int(os.getenv('MSG_QUEUE_LIMIT', 50))
+        self.max_room_queue = max_room_queue if max_room_queue is not None else int(os.getenv('MSG_ROOM_QUEUE_LIMIT', 5))
+
+        self._cond = threading.Condition()
+        self._room_queues: Dict[str, Deque[WxMsg]] = {}
+        self._ready: Deque[str] = deque()    # 有待处理消息且当前无人处理的会话
+        self._active: set = set()            # 正在被工作线程处理的会话
+        self._pending = 0                    # 已入队但尚未开始处理的消息数
+        self._busy = 0                       # 正在处理消息的工作线程数
+        self._running = False
+        self._threads: list[threading.Thread] = []
+
+    @staticmethod
+    def _session_key(msg: WxMsg) -> str:
+        return msg.roomid if msg.from_group() else msg.sender
+
+    def start(self):
+        """启动工作线程"""
+        self._running = True
+        for i in range(self.workers):
+            t = threading.Thread(target=self._worker_loop, name=f"MsgWorker-{i}", daemon=True)
+            t.start()
+            self._threads.append(t)
+        logger.info(f"消息分发器已启动: {self.workers} 个工作线程")
+
+    def dispatch(self, msg: WxMsg) -> bool:
+        """
+        将消息放入对应会话的队列
+
+        Args:
+            msg: 收到的消息
+
+        Returns:
+            是否成功入队；队列已满时返回 False 并回复繁忙提示
+        """
+        key = self._session_key(msg)
+        with self._cond:
+            room_queue = self._room_queues.setdefault(key, deque())
+            if self._pending >= self.max_queue or len(room_queue) >= self.max_room_queue:
+                # 正在处理的会话保留其（空）队列，工作线程处理完后还要读取
+                if not room_queue and key not in self._active:
+                    del self._room_queues[key]
+                notice = "⏳ 当前请求过多，请稍后再试"
+                position = None
+            else:
+                room_queue.append(msg)
+                self._pending += 1
+                if key not in self._active and len(room_queue) == 1:
+                    self._ready.append(key)
+                self._cond.notify()
+                # 所有工作线程都在忙时告知排队位置
+                position = self._pending if self._busy >= self.workers else None
+                notice = None
+
+        if notice:
+            logger.warning(f"消息队列已满，丢弃消息: {msg.content}")
+            self._safe_reply(msg, notice)
+            return False
+        if position:
+            self._safe_reply(msg, f"排队中，第{position}位")
+        return True
+
+    def _safe_reply(self, msg: WxMsg, text: str):
+        try:
+            self.reply(msg, text)
+        except Exception as e:
+            logger.error(f"发送排队提示失败: {e}")
+
+    def _worker_loop(self):
+        while True:
+            with self._cond:
+                while self._running and not self._ready:
+                    self._cond.wait()
+                if not self._running:
+                    return
+                key = self._ready.popleft()
+                msg = self._room_queues[key].popleft()
+                self._active.add(key)
+                self._pending -= 1
+                self._busy += 1
+
+            try:
+                self.handler(msg)
+            except Exception as e:
+                logger.error(f"处理消息时发生错误: {e}", exc_info=True)
+            finally:
+                with self._cond:
+                    self._busy -= 1
+                    self._active.discard(key)
+                    if self._room_queues[key]:
+                        # 同一会话还有消息，排到队尾以便其他会话轮转
+                        self._ready.append(key)
+                        self._cond.notify()
+                    else:
+                        del self._room_queues[key]
+
+    def stats(self) -> Dict[str, int]:
+        """获取队列运行状态"""
+        with self._cond:
+            return {
+                'pending': self._pending,
+                'busy': self._busy,
+                'sessions': len(self._room_queues),
+            }
+
+    def stop(self, timeout: float = 5):
+        """停止工作线程，未处理的消息会被丢弃"""
+        with self._cond:
+            self._running = False
+            self._cond.notify_all()
+        for t in self._threads:
+            t.join(timeout=timeout)
+        self._threads = []
@@ -2,7 +2,9 @@ import re
 from typing import Optional
 import time
 import requests
-from services import APIRouter, SignSystem, PicMaker
+from wcferry import Wcf, WxMsg
+from services import AsyncAPIRouter, SignSystem, PicMaker
+from services.pic_maker import RenderDeadlineExceeded
 import logging
 
 logging.basicConfig(
@@ -12,10 +14,34 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 class MsgHandler:
-    def __init__(self):
-        self._api = APIRouter()
+    # 需要处理的指令：完全匹配的指令和前缀匹配的指令
+    EXACT_COMMANDS = ("菜单", "功能", "签到")
+    PREFIX_COMMANDS = ("查村庄", "查玩家", "查冲杯", "搜玩家", "查实力", "查待办", "查部落", "查对战", "查突袭")
+
+    def __init__(self, contacts=None):
+        self._api = AsyncAPIRouter()
         self._ss = SignSystem()
-        self.params = { 'tag': "", 'name': "", 'season': ""}
+        # 联系人目录缓存（ContactDirectory），未提供时直接调用 wcf 查询群昵称
+        self._contacts = contacts
+
+    def _alias(self, wcf: Wcf, msg: WxMsg) -> str:
+        """获取消息发送者的群昵称"""
+        if self._contacts is not None:
+            return self._contacts.get_alias(msg.sender, msg.roomid)
+        return wcf.get_alias_in_chatroom(msg.sender, msg.roomid)
+
+    @classmethod
+    def is_command(cls, content: str) -> bool:
+        """判断消息内容是否为机器人指令，用于在入队前过滤普通聊天消息"""
+        content = content.strip()
+        return content in cls.EXACT_COMMANDS or content.startswith(cls.PREFIX_COMMANDS)
+
+    @staticmethod
+    def _new_params(**kwargs) -> dict:
+        """为每次请求创建独立的参数字典（消息会被多个工作线程并发处理，不能共享）"""
+        params = {'tag': "", 'name': "", 'season': ""}
+        params.update(kwargs)
+        return params
 
     def process_room_message(self, message: dict) -> dict:
         """处理接收到的群聊消息"""
@@ -86,11 +112,11 @@ class MsgHandler:
                 "room_id": room_id
             }
 
-        self.params['tag'] = match.group(1)
+        params = self._new_params(tag=match.group(1))
         timestamp = int(time.time())
-        filename = f"player_info_{self.params['tag']}_{timestamp}.png"
+        filename = f"player_info_{params['tag']}_{timestamp}.png"
 
-        res = self._api.get_data('player_info', self.params)
+        res = self._api.get_data('player_info', params)
         status_code = res.get('status_code')
         content_type = res.get('content_type')
         data = res.get('content')
@@ -98,7 +124,7 @@ class MsgHandler:
 
         if status_code == 200 and content_type == 'json' and data:
             try:
-                pm = PicMaker("player_info", data)
+                pm = PicMaker("player_info", data, room=room_id or sender)
                 img_path = pm.generate(filename)
                 if img_path:
                     return {
@@ -112,6 +138,13 @@ class MsgHandler:
                         "content": f"@{sender} ✅ 查询成功，但图片生成失败。",
                         "room_id": room_id
                     }
+            except RenderDeadlineExceeded:
+                # 渲染排队超时，改为回复文字版结果
+                return {
+                    "type": "text",
+                    "content": f"@{sender} {pm.text_fallback()}",
+                    "room_id": room_id
+                }
             except Exception as e:
                 logger.error(f"PicMaker failed for player_info: {e}")
                 return {
@@ -161,17 +194,17 @@ class MsgHandler:
                 "room_id": room_id
             }
 
-        self.params['tag'] = match.group(1)
+        params = self._new_params(tag=match.group(1))
         timestamp = int(time.time())
-        filename = f"player_legend_{self.params['tag']}_{timestamp}.png"
+        filename = f"player_legend_{params['tag']}_{timestamp}.png"
 
         # 获取当前赛季
-        res = self._api.get_data("list_season", self.params)
+        res = self._api.get_data("list_season", params)
         data = res.get('content')
         current_season = data[0] if data else ""
-        self.params['season'] = current_season
+        params['season'] = current_season
 
-        res = self._api.get_data('player_legend', self.params)
+        res = self._api.get_data('player_legend', params)
         status_code = res.get('status_code')
         content_type = res.get('content_type')
         data = res.get('content')
@@ -179,7 +212,7 @@ class MsgHandler:
 
         if status_code == 200 and content_type == 'json' and data:
             try:
-                pm = PicMaker("player_legend", data)
+                pm = PicMaker("player_legend", data, room=room_id or sender)
                 img_path = pm.generate(filename)
                 if img_path:
                     return {
@@ -193,6 +226,13 @@ class MsgHandler:
                         "content": f"@{sender} ✅ 查询成功，但图片生成失败。",
                         "room_id": room_id
                     }
+            except RenderDeadlineExceeded:
+                # 渲染排队超时，改为回复文字版结果
+                return {
+                    "type": "text",
+                    "content": f"@{sender} {pm.text_fallback()}",
+                    "room_id": room_id
+                }
             except Exception as e:
                 logger.error(f"PicMaker failed for player_legend: {e}")
                 return {
@@ -233,7 +273,7 @@ class MsgHandler:
         # 移除 "查玩家 " 前缀
         query_content = content[len("查玩家 "):].strip()
         if not query_content:
-            wcf.send_text(f"@{wcf.get_alias_in_chatroom(msg.sender, msg.roomid)} ❌ 请提供玩家名称。", msg.roomid, msg.sender)
+            wcf.send_text(f"@{self._alias(wcf, msg)} ❌ 请提供玩家名称。", msg.roomid, msg.sender)
             return
 
         # 使用局部 params 字典
@@ -307,15 +347,15 @@ class MsgHandler:
                 else:
                     errors.append(f"❌ {keyword} 参数值 '{value}' 格式无效或无法识别。")
                     # 可以选择 return 或继续处理其他参数
-                    # return wcf.send_text(f"@{wcf.get_alias_in_chatroom(msg.sender, msg.roomid)} {errors[-1]}", msg.roomid, msg.sender)
+                    # return wcf.send_text(f"@{self._alias(wcf, msg)} {errors[-1]}", msg.roomid, msg.sender)
 
         # 如果在参数提取过程中发现错误，发送错误信息并返回
         if errors:
             error_message = "\n".join(errors)
-            wcf.send_text(f"@{wcf.get_alias_in_chatroom(msg.sender, msg.roomid)} \n{error_message}", msg.roomid, msg.sender)
+            wcf.send_text(f"@{self._alias(wcf, msg)} \n{error_message}", msg.roomid, msg.sender)
             return
 
-        wcf.send_text(f"@{wcf.get_alias_in_chatroom(msg.sender, msg.roomid)} 正在查询玩家 '{player_name}' 的信息，请稍候...", msg.roomid, msg.sender)
+        wcf.send_text(f"@{self._alias(wcf, msg)} 正在查询玩家 '{player_name}' 的信息，请稍候...", msg.roomid, msg.sender)
 
         # 使用局部 params 调用 API
         res = self._api.get_data('player_search', params)
@@ -330,7 +370,7 @@ class MsgHandler:
             if isinstance(data, dict) and 'items' in data and isinstance(data['items'], list):
                 player_list = data['items']
                 if not player_list:
-                    wcf.send_text(f"@{wcf.get_alias_in_chatroom(msg.sender, msg.roomid)} ✅ 查询成功，但未找到符合条件的玩家。", msg.roomid, msg.sender)
+                    wcf.send_text(f"@{self._alias(wcf, msg)} ✅ 查询成功，但未找到符合条件的玩家。", msg.roomid, msg.sender)
                 else:
                     # 提取名称和标签，格式化为文本
                     output_lines = []
@@ -341,18 +381,18 @@ class MsgHandler:
                         output_lines.append(f"名称: {player_name}, 标签: {player_tag}")
 
                     output_text = "\n".join(output_lines)
-                    wcf.send_text(f"@{wcf.get_alias_in_chatroom(msg.sender, msg.roomid)} ✅ 查询结果如下：\n{output_text}", msg.roomid, msg.sender)
+                    wcf.send_text(f"@{self._alias(wcf, msg)} ✅ 查询结果如下：\n{output_text}", msg.roomid, msg.sender)
             else:
                 # 如果返回的数据结构不符合预期
                 logger.warning(f"Player search API returned unexpected data structure: {data}")
-                wcf.send_text(f"@{wcf.get_alias_in_chatroom(msg.sender, msg.roomid)} ❌ 查询成功，但返回的数据格式不符合预期（非字典或缺少items列表）。", msg.roomid, msg.sender)
+                wcf.send_text(f"@{self._alias(wcf, msg)} ❌ 查询成功，但返回的数据格式不符合预期（非字典或缺少items列表）。", msg.roomid, msg.sender)
         elif status_code == 403:
-                wcf.send_text(f"@{wcf.get_alias_in_chatroom(msg.sender, msg.roomid)} ❌ API认证失败，请联系管理员。", msg.roomid, msg.sender)
+                wcf.send_text(f"@{self._alias(wcf, msg)} ❌ API认证失败，请联系管理员。", msg.roomid, msg.sender)
         elif status_code == 503 and content_type == 'json' and data and data.get('reason') == 'inMaintenance':
                 maintenance_message = data.get('message', "API正在维护中，请稍后再试。") # 获取维护信息
-                wcf.send_text(f"@{wcf.get_alias_in_chatroom(msg.sender, msg.roomid)} 🚧 {maintenance_message}", msg.roomid, msg.sender)
+                wcf.send_text(f"@{self._alias(wcf, msg)} 🚧 {maintenance_message}", msg.roomid, msg.sender)
         elif status_code == 555:
-                wcf.send_text(f"@{wcf.get_alias_in_chatroom(msg.sender, msg.roomid)} ❌ 查询成功，但无法解析返回的数据格式。", msg.roomid, msg.sender)
+                wcf.send_text(f"@{self._alias(wcf, msg)} ❌ 查询成功，但无法解析返回的数据格式。", msg.roomid, msg.sender)
         else:
             # 其他所有错误情况
             error_detail = f"状态码: {status_code}" if status_code else ""
@@ -366,49 +406,52 @@ class MsgHandler:
             if api_error_message:
                 error_detail += f", 信息: {api_error_message}"
 
-            wcf.send_text(f"@{wcf.get_alias_in_chatroom(msg.sender, msg.roomid)} ❌ 请求失败。{error_detail}", msg.roomid, msg.sender)
+            wcf.send_text(f"@{self._alias(wcf, msg)} ❌ 请求失败。{error_detail}", msg.roomid, msg.sender)
 
     def player_warhits_mode(self, wcf: Wcf, msg: WxMsg, content: str) -> Optional[str]:
         """查询玩家实力模式"""
         # 从content中提取出村庄标签，以#开头，为数字或字母
         match = re.search(r'(#[a-zA-Z0-9]+)', content)  # 使用正则表达式匹配
         if match:
-            wcf.send_text(f"@{wcf.get_alias_in_chatroom(msg.sender, msg.roomid)} 正在查询玩家实力信息并生成图片，请稍候...", msg.roomid, msg.sender)
-            self.params['tag'] = match.group(1)  # 提取匹配的村庄标签
+            wcf.send_text(f"@{self._alias(wcf, msg)} 正在查询玩家实力信息并生成图片，请稍候...", msg.roomid, msg.sender)
+            params = self._new_params(tag=match.group(1))  # 提取匹配的村庄标签
             # 生成唯一的文件名
             timestamp = int(time.time())
-            filename = f"player_warhits_{self.params['tag']}_{timestamp}.png"
-            res = self._api.get_data('player_warhits', self.params)
+            filename = f"player_warhits_{params['tag']}_{timestamp}.png"
+            res = self._api.get_data('player_warhits', params)
             status_code = res.get('status_code')
             content_type = res.get('content_type')
             data = res.get('content')
             error_msg = res.get('error')
             if status_code == 200 and content_type == 'json' and data:
                 try:
-                    pm = PicMaker("player_warhits", data) # 使用正确的 PicMaker 类型
+                    pm = PicMaker("player_warhits", data, room=msg.roomid or msg.sender) # 使用正确的 PicMaker 类型
                     img_path = pm.generate(filename)
                     if img_path:
                         wcf.send_image(img_path, msg.roomid)
                     else:
-                            wcf.send_text(f"@{wcf.get_alias_in_chatroom(msg.sender, msg.roomid)} ✅ 查询成功，但图片生成失败。", msg.roomid, msg.sender)
+                            wcf.send_text(f"@{self._alias(wcf, msg)} ✅ 查询成功，但图片生成失败。", msg.roomid, msg.sender)
+                except RenderDeadlineExceeded:
+                    # 渲染排队超时，改为回复文字版结果
+                    wcf.send_text(f"@{self._alias(wcf, msg)} {pm.text_fallback()}", msg.roomid, msg.sender)
                 except Exception as e:
                     logger.error(f"PicMaker failed for player_warhits: {e}")
-                    wcf.send_text(f"@{wcf.get_alias_in_chatroom(msg.sender, msg.roomid)} ❌ 图片生成过程中出错，请联系管理员。", msg.roomid, msg.sender)
+                    wcf.send_text(f"@{self._alias(wcf, msg)} ❌ 图片生成过程中出错，请联系管理员。", msg.roomid, msg.sender)
             elif status_code == 403:
-                wcf.send_text(f"@{wcf.get_alias_in_chatroom(msg.sender, msg.roomid)} ❌ API认证失败，请联系管理员。", msg.roomid, msg.sender)
+                wcf.send_text(f"@{self._alias(wcf, msg)} ❌ API认证失败，请联系管理员。", msg.roomid, msg.sender)
             elif status_code == 503 and content_type == 'json' and data and data.get('reason') == 'inMaintenance':
                     maintenance_message = "服务器正在维护中，请稍后再试..."
-                    wcf.send_text(f"@{wcf.get_alias_in_chatroom(msg.sender, msg.roomid)} 🚧 {maintenance_message}", msg.roomid, msg.sender)
+                    wcf.send_text(f"@{self._alias(wcf, msg)} 🚧 {maintenance_message}", msg.roomid, msg.sender)
             elif status_code == 555:
-                wcf.send_text(f"@{wcf.get_alias_in_chatroom(msg.sender, msg.roomid)} ❌ 查询成功，但无法解析返回的数据格式。", msg.roomid, msg.sender)
+                wcf.send_text(f"@{self._alias(wcf, msg)} ❌ 查询成功，但无法解析返回的数据格式。", msg.roomid, msg.sender)
             else:
                 # 其他所有错误情况
                 error_detail = f"状态码: {status_code}" if status_code else ""
                 if error_msg:
                     error_detail += f", 错误: {error_msg}"
-                wcf.send_text(f"@{wcf.get_alias_in_chatroom(msg.sender, msg.roomid)} ❌ 请求失败。{error_detail}", msg.roomid, msg.sender)
+                wcf.send_text(f"@{self._alias(wcf, msg)} ❌ 请求失败。{error_detail}", msg.roomid, msg.sender)
         else:
-            wcf.send_text(f"@{wcf.get_alias_in_chatroom(msg.sender, msg.roomid)} ❌ 请提供正确的村庄标签（#开头）。", msg.roomid, msg.sender)
+            wcf.send_text(f"@{self._alias(wcf, msg)} ❌ 请提供正确的村庄标签（#开头）。", msg.roomid, msg.sender)
 
     def player_todo_mode(self, wcf: Wcf, msg: WxMsg, content: str) -> Optional[str]:
         """查询玩家待办事项模式"""
@@ -416,12 +459,12 @@ class MsgHandler:
         # 从content中提取出村庄标签，以#开头，为数字或字母
         match = re.search(r'(#[a-zA-Z0-9]+)', content)  # 使用正则表达式匹配
         if match:
-            wcf.send_text(f"@{wcf.get_alias_in_chatroom(msg.sender, msg.roomid)} 正在查询玩家待办信息并生成图片，请稍候...", msg.roomid, msg.sender)
-            self.params['tag'] = match.group(1)  # 提取匹配的村庄标签
+            wcf.send_text(f"@{self._alias(wcf, msg)} 正在查询玩家待办信息并生成图片，请稍候...", msg.roomid, msg.sender)
+            params = self._new_params(tag=match.group(1))  # 提取匹配的村庄标签
             # 生成唯一的文件名
             timestamp = int(time.time())
-            filename = f"player_todo_{self.params['tag']}_{timestamp}.png"
-            res = self._api.get_data('player_todo', self.params)
+            filename = f"player_todo_{params['tag']}_{timestamp}.png"
+            res = self._api.get_data('player_todo', params)
             status_code = res.get('status_code')
             content_type = res.get('content_type')
             data = res.get('content')
@@ -433,25 +476,25 @@ class MsgHandler:
                     if img_path:
                         wcf.send_image(img_path, msg.roomid)
                     else:
-                            wcf.send_text(f"@{wcf.get_alias_in_chatroom(msg.sender, msg.roomid)} ✅ 查询成功，但图片生成失败。", msg.roomid, msg.sender)
+                            wcf.send_text(f"@{self._alias(wcf, msg)} ✅ 查询成功，但图片生成失败。", msg.roomid, msg.sender)
                 except Exception as e:
                     logger.error(f"PicMaker failed for player_warhits: {e}")
-                    wcf.send_text(f"@{wcf.get_alias_in_chatroom(msg.sender, msg.roomid)} ❌ 图片生成过程中出错，请联系管理员。", msg.roomid, msg.sender)
+                    wcf.send_text(f"@{self._alias(wcf, msg)} ❌ 图片生成过程中出错，请联系管理员。", msg.roomid, msg.sender)
             elif status_code == 403:
-                wcf.send_text(f"@{wcf.get_alias_in_chatroom(msg.sender, msg.roomid)} ❌ API认证失败，请联系管理员。", msg.roomid, msg.sender)
+                wcf.send_text(f"@{self._alias(wcf, msg)} ❌ API认证失败，请联系管理员。", msg.roomid, msg.sender)
             elif status_code == 503 and content_type == 'json' and data and data.get('reason') == 'inMaintenance':
                     maintenance_message = "服务器正在维护中，请稍后再试..."
-                    wcf.send_text(f"@{wcf.get_alias_in_chatroom(msg.sender, msg.roomid)} 🚧 {maintenance_message}", msg.roomid, msg.sender)
+                    wcf.send_text(f"@{self._alias(wcf, msg)} 🚧 {maintenance_message}", msg.roomid, msg.sender)
             elif status_code == 555:
-                wcf.send_text(f"@{wcf.get_alias_in_chatroom(msg.sender, msg.roomid)} ❌ 查询成功，但无法解析返回的数据格式。", msg.roomid, msg.sender)
+                wcf.send_text(f"@{self._alias(wcf, msg)} ❌ 查询成功，但无法解析返回的数据格式。", msg.roomid, msg.sender)
             else:
                 # 其他所有错误情况
                 error_detail = f"状态码: {status_code}" if status_code else ""
                 if error_msg:
                     error_detail += f", 错误: {error_msg}"
-                wcf.send_text(f"@{wcf.get_alias_in_chatroom(msg.sender, msg.roomid)} ❌ 请求失败。{error_detail}", msg.roomid, msg.sender)
+                wcf.send_text(f"@{self._alias(wcf, msg)} ❌ 请求失败。{error_detail}", msg.roomid, msg.sender)
         else:
-            wcf.send_text(f"@{wcf.get_alias_in_chatroom(msg.sender, msg.roomid)} ❌ 请提供正确的村庄标签（#开头）。", msg.roomid, msg.sender)
+            wcf.send_text(f"@{self._alias(wcf, msg)} ❌ 请提供正确的村庄标签（#开头）。", msg.roomid, msg.sender)
     
 
     def clan_info_mode(self, wcf: Wcf, msg: WxMsg, content: str) -> Optional[str]:
@@ -459,12 +502,12 @@ class MsgHandler:
         # 从content中提取出部落标签，以#开头，为数字或字母
         match = re.search(r'(#[a-zA-Z0-9]+)', content)  # 使用正则表达式匹配
         if match:
-            wcf.send_text(f"@{wcf.get_alias_in_chatroom(msg.sender, msg.roomid)} 正在查询部落信息并生成图片，请稍候...", msg.roomid, msg.sender)
-            self.params['tag'] = match.group(1)  # 提取匹配的部落标签
+            wcf.send_text(f"@{self._alias(wcf, msg)} 正在查询部落信息并生成图片，请稍候...", msg.roomid, msg.sender)
+            params = self._new_params(tag=match.group(1))  # 提取匹配的部落标签
             # 生成唯一的文件名
             timestamp = int(time.time())
-            filename = f"clan_info_{self.params['tag']}_{timestamp}.png"
-            res = self._api.get_data('clan_info', self.params) # 修正API模式为 clan_info
+            filename = f"clan_info_{params['tag']}_{timestamp}.png"
+            res = self._api.get_data('clan_info', params) # 修正API模式为 clan_info
 
             status_code = res.get('status_code')
             content_type = res.get('content_type')
@@ -473,39 +516,44 @@ class MsgHandler:
 
             if status_code == 200 and content_type == 'json' and data:
                 try:
-                    pm = PicMaker("clan_info", data) # 修正 PicMaker 类型
-                    img_path = pm.generate(filename)
-                    if img_path:
-                        wcf.send_image(img_path, msg.roomid)
+                    pm = PicMaker("clan_info", data, room=msg.roomid or msg.sender) # 修正 PicMaker 类型
+                    # 成员较多时分页生成，按页码顺序发送
+                    img_paths = pm.generate_tiles(filename)
+                    if img_paths:
+                        for img_path in img_paths:
+                            wcf.send_image(img_path, msg.roomid)
                     else:
-                        wcf.send_text(f"@{wcf.get_alias_in_chatroom(msg.sender, msg.roomid)} ✅ 查询成功，但图片生成失败。", msg.roomid, msg.sender)
+                        wcf.send_text(f"@{self._alias(wcf, msg)} ✅ 查询成功，但图片生成失败。", msg.roomid, msg.sender)
+                except RenderDeadlineExceeded:
+                    # 渲染排队超时，改为回复文字版结果
+                    wcf.send_text(f"@{self._alias(wcf, msg)} {pm.text_fallback()}", msg.roomid, msg.sender)
                 except Exception as e:
                     logger.error(f"PicMaker failed for clan_info: {e}")
-                    wcf.send_text(f"@{wcf.get_alias_in_chatroom(msg.sender, msg.roomid)} ❌ 图片生成过程中出错，请联系管理员。", msg.roomid, msg.sender)
+                    wcf.send_text(f"@{self._alias(wcf, msg)} ❌ 图片生成过程中出错，请联系管理员。", msg.roomid, msg.sender)
             elif status_code == 403:
-                wcf.send_text(f"@{wcf.get_alias_in_chatroom(msg.sender, msg.roomid)} ❌ API认证失败，请联系管理员。", msg.roomid, msg.sender)
+                wcf.send_text(f"@{self._alias(wcf, msg)} ❌ API认证失败，请联系管理员。", msg.roomid, msg.sender)
             elif status_code == 503 and content_type == 'json' and data and data.get('reason') == 'inMaintenance':
                     maintenance_message = data.get('message', "API正在维护中，请稍后再试。") # 获取维护信息
-                    wcf.send_text(f"@{wcf.get_alias_in_chatroom(msg.sender, msg.roomid)} 🚧 {maintenance_message}", msg.roomid, msg.sender)
+                    wcf.send_text(f"@{self._alias(wcf, msg)} 🚧 {maintenance_message}", msg.roomid, msg.sender)
             elif status_code == 555:
-                wcf.send_text(f"@{wcf.get_alias_in_chatroom(msg.sender, msg.roomid)} ❌ 查询成功，但无法解析返回的数据格式。", msg.roomid, msg.sender)
+                wcf.send_text(f"@{self._alias(wcf, msg)} ❌ 查询成功，但无法解析返回的数据格式。", msg.roomid, msg.sender)
             else:
                 # 其他所有错误情况
                 error_detail = f"状态码: {status_code}" if status_code else ""
                 if error_msg:
                     error_detail += f", 错误: {error_msg}"
-                wcf.send_text(f"@{wcf.get_alias_in_chatroom(msg.sender, msg.roomid)} ❌ 请求失败。{error_detail}", msg.roomid, msg.sender)
+                wcf.send_text(f"@{self._alias(wcf, msg)} ❌ 请求失败。{error_detail}", msg.roomid, msg.sender)
         else:
-            wcf.send_text(f"@{wcf.get_alias_in_chatroom(msg.sender, msg.roomid)} ❌ 请提供正确的部落标签（#开头）。", msg.roomid, msg.sender)
+            wcf.send_text(f"@{self._alias(wcf, msg)} ❌ 请提供正确的部落标签（#开头）。", msg.roomid, msg.sender)
 
     def clan_war_mode(self, wcf: Wcf, msg: WxMsg, content: str) -> Optional[str]:
         """查询部落对战模式"""
         # 从content中提取出部落标签，以#开头，为数字或字母
         match = re.search(r'(#[a-zA-Z0-9]+)', content)  # 使用正则表达式匹配
         if match:
-            wcf.send_text(f"@{wcf.get_alias_in_chatroom(msg.sender, msg.roomid)} 正在查询部落对战信息并生成ipv6链接，请稍候...", msg.roomid, msg.sender)
-            self.params['tag'] = match.group(1)  # 提取匹配的部落标签
-            res = self._api.get_data('clan_war', self.params)
+            wcf.send_text(f"@{self._alias(wcf, msg)} 正在查询部落对战信息并生成ipv6链接，请稍候...", msg.roomid, msg.sender)
+            params = self._new_params(tag=match.group(1))  # 提取匹配的部落标签
+            res = self._api.get_data('clan_war', params)
             status_code = res.get('status_code')
             content_type = res.get('content_type')
             data = res.get('content')
@@ -518,38 +566,38 @@ class MsgHandler:
                     if img_path:
                         wcf.send_image(img_path, msg.roomid)
                     else:
-                        wcf.send_text(f"@{wcf.get_alias_in_chatroom(msg.sender, msg.roomid)} ✅ 查询成功，但图片生成失败。", msg.roomid, msg.sender)
+                        wcf.send_text(f"@{self._alias(wcf, msg)} ✅ 查询成功，但图片生成失败。", msg.roomid, msg.sender)
                 except Exception as e:
                     logger.error(f"PicMaker failed for clan_war: {e}")
-                    wcf.send_text(f"@{wcf.get_alias_in_chatroom(msg.sender, msg.roomid)} ❌ 图片生成过程中出错，请联系管理员。", msg.roomid, msg.sender)
+                    wcf.send_text(f"@{self._alias(wcf, msg)} ❌ 图片生成过程中出错，请联系管理员。", msg.roomid, msg.sender)
             elif status_code == 403:
-                wcf.send_text(f"@{wcf.get_alias_in_chatroom(msg.sender, msg.roomid)} ❌ API认证失败，请联系管理员。", msg.roomid, msg.sender)
+                wcf.send_text(f"@{self._alias(wcf, msg)} ❌ API认证失败，请联系管理员。", msg.roomid, msg.sender)
             elif status_code == 503 and content_type == 'json' and data and data.get('reason') == 'inMaintenance':
                     maintenance_message = data.get('message', "API正在维护中，请稍后再试。") # 获取维护信息
-                    wcf.send_text(f"@{wcf.get_alias_in_chatroom(msg.sender, msg.roomid)} 🚧 {maintenance_message}", msg.roomid, msg.sender)
+                    wcf.send_text(f"@{self._alias(wcf, msg)} 🚧 {maintenance_message}", msg.roomid, msg.sender)
             elif status_code == 555:
-                wcf.send_text(f"@{wcf.get_alias_in_chatroom(msg.sender, msg.roomid)} ❌ 查询成功，但无法解析返回的数据格式。", msg.roomid, msg.sender)
+                wcf.send_text(f"@{self._alias(wcf, msg)} ❌ 查询成功，但无法解析返回的数据格式。", msg.roomid, msg.sender)
             else:
                 # 其他所有错误情况
                 error_detail = f"状态码: {status_code}" if status_code else ""
                 if error_msg:
                     error_detail += f", 错误: {error_msg}"
-                wcf.send_text(f"@{wcf.get_alias_in_chatroom(msg.sender, msg.roomid)} ❌ 请求失败。{error_detail}", msg.roomid, msg.sender)
+                wcf.send_text(f"@{self._alias(wcf, msg)} ❌ 请求失败。{error_detail}", msg.roomid, msg.sender)
         else:
-            wcf.send_text(f"@{wcf.get_alias_in_chatroom(msg.sender, msg.roomid)} ❌ 请提供正确的部落标签（#开头）。", msg.roomid, msg.sender)
+            wcf.send_text(f"@{self._alias(wcf, msg)} ❌ 请提供正确的部落标签（#开头）。", msg.roomid, msg.sender)
 
     def clan_raids_mode(self, wcf: Wcf, msg: WxMsg, content: str) -> Optional[str]:
         """查询部落突袭模式"""
         # 从content中提取出部落标签，以#开头，为数字或字母
         match = re.search(r'(#[a-zA-Z0-9]+)', content)  # 使用正则表达式匹配
         if match:
-            wcf.send_text(f"@{wcf.get_alias_in_chatroom(msg.sender, msg.roomid)} 正在查询部落突袭信息并生成图片，请稍候...", msg.roomid, msg.sender)
-            self.params['tag'] = match.group(1)  # 提取匹配的部落标签
+            wcf.send_text(f"@{self._alias(wcf, msg)} 正在查询部落突袭信息并生成图片，请稍候...", msg.roomid, msg.sender)
+            params = self._new_params(tag=match.group(1))  # 提取匹配的部落标签
             # 生成唯一的文件名
             timestamp = int(time.time())
-            filename = f"clan_raids_{self.params['tag']}_{timestamp}.png"
-            res_raids = self._api.get_data('clan_raids', self.params) 
-            res_members = self._api.get_data('clan_members', self.params)
+            filename = f"clan_raids_{params['tag']}_{timestamp}.png"
+            # 突袭和成员数据并发请求
+            res_raids, res_members = self._api.gather_data([('clan_raids', params), ('clan_members', params)])
 
             status_code = res_raids.get('status_code')
             content_type = res_raids.get('content_type')
@@ -563,27 +611,32 @@ class MsgHandler:
 
             if status_code == 200 and content_type == 'json' and data:
                 try:
-                    pm = PicMaker("clan_raids", data) # 修正 PicMaker 类型
-                    img_path = pm.generate(filename)
-                    if img_path:
-                        wcf.send_image(img_path, msg.roomid)
+                    pm = PicMaker("clan_raids", data, room=msg.roomid or msg.sender) # 修正 PicMaker 类型
+                    # 成员较多时分页生成，按页码顺序发送
+                    img_paths = pm.generate_tiles(filename)
+                    if img_paths:
+                        for img_path in img_paths:
+                            wcf.send_image(img_path, msg.roomid)
                     else:
-                        wcf.send_text(f"@{wcf.get_alias_in_chatroom(msg.sender, msg.roomid)} ✅ 查询成功，但图片生成失败。", msg.roomid, msg.sender)
+                        wcf.send_text(f"@{self._alias(wcf, msg)} ✅ 查询成功，但图片生成失败。", msg.roomid, msg.sender)
+                except RenderDeadlineExceeded:
+                    # 渲染排队超时，改为回复文字版结果
+                    wcf.send_text(f"@{self._alias(wcf, msg)} {pm.text_fallback()}", msg.roomid, msg.sender)
                 except Exception as e:
                     logger.error(f"PicMaker failed for clan_raids: {e}")
-                    wcf.send_text(f"@{wcf.get_alias_in_chatroom(msg.sender, msg.roomid)} ❌ 图片生成过程中出错，请联系管理员。", msg.roomid, msg.sender)    
+                    wcf.send_text(f"@{self._alias(wcf, msg)} ❌ 图片生成过程中出错，请联系管理员。", msg.roomid, msg.sender)    
             elif status_code == 403:
-                wcf.send_text(f"@{wcf.get_alias_in_chatroom(msg.sender, msg.roomid)} ❌ API认证失败，请联系管理员。", msg.roomid, msg.sender)
+                wcf.send_text(f"@{self._alias(wcf, msg)} ❌ API认证失败，请联系管理员。", msg.roomid, msg.sender)
             elif status_code == 503 and content_type == 'json' and data_raids and data_raids.get('reason') == 'inMaintenance':
                     maintenance_message = data_raids.get('message', "API正在维护中，请稍后再试。") # 获取维护信息
-                    wcf.send_text(f"@{wcf.get_alias_in_chatroom(msg.sender, msg.roomid)} 🚧 {maintenance_message}", msg.roomid, msg.sender) 
+                    wcf.send_text(f"@{self._alias(wcf, msg)} 🚧 {maintenance_message}", msg.roomid, msg.sender) 
             elif status_code == 555:
-                wcf.send_text(f"@{wcf.get_alias_in_chatroom(msg.sender, msg.roomid)} ❌ 查询成功，但无法解析返回的数据格式。", msg.roomid, msg.sender)
+                wcf.send_text(f"@{self._alias(wcf, msg)} ❌ 查询成功，但无法解析返回的数据格式。", msg.roomid, msg.sender)
             else:
                 # 其他所有错误情况
                 error_detail = f"状态码: {status_code}" if status_code else ""
                 if error_msg:
                     error_detail += f", 错误: {error_msg}"
-                wcf.send_text(f"@{wcf.get_alias_in_chatroom(msg.sender, msg.roomid)} ❌ 请求失败。{error_detail}", msg.roomid, msg.sender)
+                wcf.send_text(f"@{self._alias(wcf, msg)} ❌ 请求失败。{error_detail}", msg.roomid, msg.sender)
         else:
-            wcf.send_text(f"@{wcf.get_alias_in_chatroom(msg.sender, msg.roomid)} ❌ 请提供正确的部落标签（#开头）。", msg.roomid, msg.sender)
+            wcf.send_text(f"@{self._alias(wcf, msg)} ❌ 请提供正确的部落标签（#开头）。", msg.roomid, msg.sender)
@@ -1,10 +1,12 @@
 from .api_router import APIRouter
+from .api_router.async_router import AsyncAPIRouter
 from .sign_system import SignSystem
 from .pic_maker import PicMaker
 from .link_maker import LinkMaker
 
 __all__ = [
     'APIRouter',
+    'AsyncAPIRouter',
     'SignSystem',
     'PicMaker',
     'LinkMaker'
@@ -1,11 +1,15 @@
 import requests
-from typing import Dict, Any, Optional
+from typing import Dict, Any, Optional, Tuple
 from urllib.parse import quote
+import copy
 import json
 import logging
 import os
+import re
 from dotenv import load_dotenv
 import chardet
+from .cache import ResponseCache
+from .single_flight import SingleFlight
 
 # 加载.env文件中的环境变量
 load_dotenv()
@@ -18,6 +22,21 @@ class APIRouter:
     BASE_URL_CK = "https://api.clashk.ing"
     BASE_URL_COC = "https://api.clashofclans.com/v1"
 
+    # 各请求模式的缓存有效期（秒），0 表示不缓存
+    CACHE_TTLS = {
+        'player_info': 60,
+        'player_legend': 30,
+        'player_search': 300,
+        'player_warhits': 300,
+        'player_todo': 60,
+        'clan_info': 60,
+        'clan_members': 60,
+        'clan_war': 60,
+        'clan_leagues': 600,
+        'clan_raids': 120,
+        'list_season': 6 * 3600,
+    }
+
     def __init__(self, timeout: Optional[int] = None):
         """
         初始化 API Router 客户端
@@ -36,6 +55,11 @@ class APIRouter:
         self.session = requests.Session()
         self.logger = logging.getLogger('APIRouter')
         self.logger.setLevel(logging.INFO)
+
+        # 响应缓存，以完整URL为键
+        self.cache = ResponseCache(max_entries=int(os.getenv('API_CACHE_SIZE', 256)))
+        # 合并相同URL的并发请求
+        self._inflight = SingleFlight()
         
     
     def _build_url(self, mode:str, params: Optional[Dict[str, Any]] = None) -> tuple[str, str] :
@@ -94,6 +118,138 @@ class APIRouter:
                 raise ValueError("Invalid request mode.")
 
     
+    def _headers(self, target: str) -> Dict[str, str]:
+        """
+        构建请求头
+
+        Args:
+            target: 目标接口，'ck' 为 ClashKing，'coc' 为官方接口（需要认证）
+        """
+        if target == 'ck':
+            return {
+                'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
+                'Accept': 'application/json, text/plain, */*',
+                'Connection': 'keep-alive',
+            }
+        return {
+            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
+            'Accept': '*/*',
+            'Connection': 'keep-alive',
+            'Authorization': f'Bearer {self.token}'
+        }
+
+    def _parse_response(self, url: str, status_code: int, reason: str, headers, content: bytes,
+                        text: str) -> Tuple[Dict[str, Any], Optional[int]]:
+        """
+        将HTTP响应转换为统一的结果字典（同步和异步客户端共用）
+
+        Args:
+            url: 请求URL
+            status_code: HTTP状态码
+            reason: HTTP状态描述
+            headers: 响应头
+            content: 原始响应体
+            text: 解码后的响应文本
+
+        Returns:
+            (结果字典, 响应头中的 max-age)：结果字典包含 content_type、content、status_code，失败时包含 error；
+            max-age 只对成功的 JSON 响应解析，其余为None
+        """
+        result = self._parse_result(url, status_code, reason, headers, content, text)
+        max_age = None
+        if result['status_code'] < 400 and result['content_type'] == 'json' and result['content'] is not None:
+            max_age = self._parse_max_age(headers.get('Cache-Control', ''))
+        return result, max_age
+
+    def _parse_result(self, url: str, status_code: int, reason: str, headers, content: bytes, text: str) -> Dict[str, Any]:
+        """按状态码和 Content-Type 将HTTP响应转换为结果字典"""
+        content_type = headers.get('Content-Type', '')
+
+        # 特别处理 503 Maintenance 且返回 JSON 的情况
+        if status_code == 503 and 'application/json' in content_type:
+            self.logger.warning(f"API处于维护状态: {url} - 状态码: {status_code}")
+            try:
+                json_data = json.loads(text)
+                self.logger.debug(f"维护模式响应数据: {str(json_data)[:200]}...")
+                return {
+                    'content_type': 'json',
+                    'content': json_data,
+                    'status_code': status_code
+                }
+            except json.JSONDecodeError as e:
+                self.logger.error(f"维护模式JSON解析失败: {url} - 响应内容: {text[:200]}...")
+                # 即使解析失败，也返回原始文本和503状态码，而不是None
+                return {
+                    'content_type': 'text', # 或者 'json_decode_error'
+                    'content': text,
+                    'status_code': 503,
+                    'error': f"JSONDecodeError: {str(e)}"
+                }
+
+        # 其他非成功状态码按请求失败处理
+        if status_code >= 400:
+            kind = 'Client' if status_code < 500 else 'Server'
+            error = f"{status_code} {kind} Error: {reason} for url: {url}"
+            self.logger.error(f"请求失败: {url} - 错误: {error}")
+            return {
+                'content_type': None,
+                'content': None,
+                'error': error,
+                'status_code': status_code
+            }
+
+        # 记录成功响应 (现在只记录 2xx)
+        self.logger.info(f"请求成功: {url} - 状态码: {status_code}")
+
+        # 处理成功的 JSON 响应
+        if 'application/json' in content_type:
+            try:
+                json_data = json.loads(text)
+                # 可选: 记录响应数据摘要
+                self.logger.debug(f"响应数据: {str(json_data)[:200]}...")
+                return {
+                    'content_type': 'json',
+                    'content': json_data,
+                    'status_code': status_code
+                }
+
+            except json.JSONDecodeError as e:
+                self.logger.error(f"JSON解析失败: {url} - 响应内容: {text[:200]}...")
+                # 成功状态码但JSON解析失败，返回 None 内容和 555 状态码
+                return {
+                    'content_type': 'json',
+                    'content': None,
+                    'status_code': 555, # 使用特定状态码表示解析错误
+                    'error': f"JSONDecodeError: {str(e)}"
+                }
+        elif 'text/html' in content_type:
+            self.logger.debug(f"收到HTML响应: {url}")
+            # 手动处理响应内容编码
+            try:
+                # 尝试直接解码为utf-8
+                html_content = content.decode('utf-8')
+            except UnicodeDecodeError:
+                # 如果失败，尝试检测编码
+                encoding = chardet.detect(content)['encoding']
+                try:
+                    html_content = content.decode(encoding if encoding else 'utf-8')
+                except:
+                    # 如果仍然失败，使用replace模式
+                    html_content = content.decode('utf-8', errors='replace')
+
+            return {
+                'content_type': 'html',
+                'content': html_content,
+                'status_code': status_code
+            }
+        else:
+            self.logger.warning(f"未知的Content-Type: {content_type}")
+            return {
+                'content_type': 'unknown',
+                'content': text,
+                'status_code': status_code
+            }
+
     def _make_request(self, mode: str, params: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
         """
         发送 GET 请求到指定的 API 端点
@@ -105,104 +261,24 @@ class APIRouter:
         Returns:
             API 返回的 JSON 数据
         """
+        return self._request(mode, params)[0]
+
+    def _request(self, mode: str, params: Optional[Dict[str, Any]] = None) -> Tuple[Dict[str, Any], Optional[int]]:
+        """
+        发送 GET 请求，同时返回响应头中的 max-age（不放入结果字典，调用方拿到的数据与缓存中的数据都不包含它）
+
+        Returns:
+            (结果字典, max-age)，格式同 _parse_response
+        """
         url, target = self._build_url(mode, params)
         
         # 记录请求开始
         self.logger.info(f"开始请求: {url}")
         
         try:
-            if target == 'ck':
-                headers = {
-                    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
-                    'Accept': 'application/json, text/plain, */*',
-                    'Connection': 'keep-alive',
-                }   
-            else:
-                headers = {
-                    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
-                    'Accept': '*/*',
-                    'Connection': 'keep-alive',
-                    'Authorization': f'Bearer {self.token}'
-                }
-            response = self.session.get(url, timeout=self.timeout, headers=headers, verify=True)
-            content_type = response.headers.get('Content-Type', '')
-
-            # 特别处理 503 Maintenance 且返回 JSON 的情况
-            if response.status_code == 503 and 'application/json' in content_type:
-                self.logger.warning(f"API处于维护状态: {url} - 状态码: {response.status_code}")
-                try:
-                    json_data = response.json()
-                    self.logger.debug(f"维护模式响应数据: {str(json_data)[:200]}...")
-                    return {
-                        'content_type': 'json',
-                        'content': json_data,
-                        'status_code': response.status_code
-                    }
-                except json.JSONDecodeError as e:
-                    self.logger.error(f"维护模式JSON解析失败: {url} - 响应内容: {response.text[:200]}...")
-                    # 即使解析失败，也返回原始文本和503状态码，而不是None
-                    return {
-                        'content_type': 'text', # 或者 'json_decode_error'
-                        'content': response.text,
-                        'status_code': 503,
-                        'error': f"JSONDecodeError: {str(e)}"
-                    }
-
-            # 对其他非成功状态码抛出异常
-            response.raise_for_status()
-            
-            # 记录成功响应 (现在只记录 2xx)
-            self.logger.info(f"请求成功: {url} - 状态码: {response.status_code}")
-
-            # 处理成功的 JSON 响应
-            if 'application/json' in content_type:
-                try:
-                    json_data = response.json()
-                    # 可选: 记录响应数据摘要
-                    self.logger.debug(f"响应数据: {str(json_data)[:200]}...")
-                    return {
-                        'content_type': 'json',
-                        'content': json_data,
-                        'status_code': response.status_code
-                    }
-                
-                except json.JSONDecodeError as e:
-                    self.logger.error(f"JSON解析失败: {url} - 响应内容: {response.text[:200]}...")
-                    # 成功状态码但JSON解析失败，返回 None 内容和 555 状态码
-                    return {
-                        'content_type': 'json',
-                        'content': None,
-                        'status_code': 555, # 使用特定状态码表示解析错误
-                        'error': f"JSONDecodeError: {str(e)}"
-                    }
-            elif 'text/html' in content_type:
-                self.logger.debug(f"收到HTML响应: {url}")
-                # 手动处理响应内容编码
-                content = response.content
-                try:
-                    # 尝试直接解码为utf-8
-                    html_content = content.decode('utf-8')
-                except UnicodeDecodeError:
-                    # 如果失败，尝试检测编码
-                    encoding = chardet.detect(content)['encoding']
-                    try:
-                        html_content = content.decode(encoding if encoding else 'utf-8')
-                    except:
-                        # 如果仍然失败，使用replace模式
-                        html_content = content.decode('utf-8', errors='replace')
-                
-                return {
-                    'content_type': 'html',
-                    'content': html_content,
-                    'status_code': response.status_code
-                }
-            else:
-                self.logger.warning(f"未知的Content-Type: {content_type}")
-                return {
-                    'content_type': 'unknown',
-                    'content': response.text,
-                    'status_code': response.status_code
-                }
+            response = self.session.get(url, timeout=self.timeout, headers=self._headers(target), verify=True)
+            return self._parse_response(url, response.status_code, response.reason, response.headers,
+                                        response.content, response.text)
                 
         except requests.exceptions.RequestException as e:
             self.logger.error(f"请求失败: {url} - 错误: {str(e)}")
@@ -213,20 +289,60 @@ class APIRouter:
                 'content': None,
                 'error': str(e), 
                 'status_code': status_code
-            }
+            }, None
     
+    @staticmethod
+    def _parse_max_age(cache_control: str) -> Optional[int]:
+        """
+        解析 Cache-Control 响应头中的 max-age
+
+        Returns:
+            max-age 秒数；响应头要求不缓存时返回0，未指定时返回None
+        """
+        if re.search(r'no-store|no-cache', cache_control):
+            return 0
+        match = re.search(r'max-age=(\d+)', cache_control)
+        return int(match.group(1)) if match else None
+
+    def _cache_ttl(self, mode: str, res: Dict[str, Any], max_age: Optional[int]) -> int:
+        """
+        计算响应的缓存有效期：只缓存成功的 JSON 响应，取模式 TTL 与服务端 max-age 的较小值
+        """
+        if res.get('status_code') != 200 or res.get('content_type') != 'json' or res.get('content') is None:
+            return 0
+        ttl = self.CACHE_TTLS.get(mode, 0)
+        if max_age is not None:
+            ttl = min(ttl, max_age)
+        return ttl
+
+    def _fetch_and_cache(self, mode: str, params: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+        """发送请求并写入缓存（在请求合并的领头调用中执行）"""
+        url, _ = self._build_url(mode, params)
+        res, max_age = self._request(mode, params)
+        self.cache.set(url, res, self._cache_ttl(mode, res, max_age))
+        return res
+
     def get_data(self, mode: str, params: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
         """
-        获取指定端点的数据
+        获取指定端点的数据，优先使用未过期的缓存；
+        相同URL的请求正在进行时不会重复请求，而是等待并共享其结果
         
         Args:
-            endpoint: API 端点路径
-            **params: 请求参数
+            mode: API 请求模式
+            params: 请求参数
             
         Returns:
             API 返回的数据
         """
-        return self._make_request(mode, params)
+        url, _ = self._build_url(mode, params)
+        cached = self.cache.get(url)
+        if cached is not None:
+            self.logger.info(f"命中缓存: {url}")
+            return cached
+
+        res = self._inflight.do(url, lambda: self._fetch_and_cache(mode, params))
+        # 合并的请求共享同一个结果，每个调用者拿到独立的副本，避免互相修改
+        return copy.deepcopy(res)
     
     def close(self):
         """
@@ -0,0 +1,183 @@
+import os
+import copy
+import asyncio
+import threading
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import aiohttp
+
+from . import APIRouter
+
+
+class AsyncAPIRouter(APIRouter):
+    """
+    基于 aiohttp 的异步 API 路由器
+
+    与 APIRouter 使用相同的请求模式和缓存，所有请求共享一个按主机限制并发、
+    保持长连接的连接池；多个模式可以通过 gather_data 并发请求，总耗时取决于最慢的请求。
+    协程在私有事件循环线程中执行，同步代码（如消息处理工作线程）可以直接调用。
+    """
+
+    def __init__(self, timeout: Optional[int] = None, limit_per_host: Optional[int] = None,
+                 keepalive_timeout: Optional[int] = None):
+        """
+        初始化异步 API 路由器
+
+        Args:
+            timeout: 请求超时时间（秒），如果为None则从环境变量获取
+            limit_per_host: 每个主机的最大连接数，如果为None则从环境变量获取
+            keepalive_timeout: 空闲长连接的保持时间（秒），如果为None则从环境变量获取
+        """
+        super().__init__(timeout)
+        self.limit_per_host = limit_per_host if limit_per_host is not None else int(os.getenv('API_POOL_PER_HOST', 10))
+        self.keepalive_timeout = keepalive_timeout if keepalive_timeout is not None else int(os.getenv('API_KEEPALIVE', 30))
+
+        self._client: Optional[aiohttp.ClientSession] = None
+        # 合并相同URL的并发请求（只在事件循环线程中访问）
+        self._pending: Dict[str, asyncio.Task] = {}
+        self.coalesced = 0
+
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._loop_thread: Optional[threading.Thread] = None
+        self._loop_lock = threading.Lock()
+
+    def _get_loop(self) -> asyncio.AbstractEventLoop:
+        """获取私有事件循环，首次调用时启动事件循环线程"""
+        if self._loop is None:
+            with self._loop_lock:
+                if self._loop is None:
+                    loop = asyncio.new_event_loop()
+                    self._loop_thread = threading.Thread(target=loop.run_forever, name="AsyncAPIRouter", daemon=True)
+                    self._loop_thread.start()
+                    self._loop = loop
+        return self._loop
+
+    def _run(self, coro):
+        """在私有事件循环中执行协程并等待结果"""
+        return asyncio.run_coroutine_threadsafe(coro, self._get_loop()).result()
+
+    def _get_client(self) -> aiohttp.ClientSession:
+        """获取 aiohttp 会话，需在事件循环中调用"""
+        if self._client is None or self._client.closed:
+            connector = aiohttp.TCPConnector(
+                limit=self.limit_per_host * 2,
+                limit_per_host=self.limit_per_host,
+                keepalive_timeout=self.keepalive_timeout,
+                ttl_dns_cache=300,
+            )
+            self._client = aiohttp.ClientSession(
+                connector=connector,
+                timeout=aiohttp.ClientTimeout(total=self.timeout),
+            )
+        return self._client
+
+    async def _request_async(self, mode: str, params: Optional[Dict[str, Any]] = None) -> Tuple[Dict[str, Any], Optional[int]]:
+        """
+        异步发送 GET 请求到指定的 API 端点
+
+        Args:
+            mode: API 请求模式
+            params: 请求参数
+
+        Returns:
+            (结果字典, max-age)，与 APIRouter._request 格式相同
+        """
+        url, target = self._build_url(mode, params)
+        self.logger.info(f"开始请求: {url}")
+
+        try:
+            async with self._get_client().get(url, headers=self._headers(target)) as response:
+                content = await response.read()
+                text = content.decode(response.get_encoding(), errors='replace')
+                return self._parse_response(url, response.status, response.reason or '', response.headers, content, text)
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            error = str(e) or e.__class__.__name__
+            self.logger.error(f"请求失败: {url} - 错误: {error}")
+            return {
+                'content_type': None,
+                'content': None,
+                'error': error,
+                'status_code': 500
+            }, None
+
+    async def _fetch_and_cache_async(self, mode: str, params: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+        url, _ = self._build_url(mode, params)
+        res, max_age = await self._request_async(mode, params)
+        self.cache.set(url, res, self._cache_ttl(mode, res, max_age))
+        return res
+
+    async def get_data_async(self, mode: str, params: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """
+        异步获取指定端点的数据，优先使用缓存，相同URL的并发请求只发送一次
+
+        Args:
+            mode: API 请求模式
+            params: 请求参数
+
+        Returns:
+            API 返回的数据
+        """
+        url, _ = self._build_url(mode, params)
+        cached = self.cache.get(url)
+        if cached is not None:
+            self.logger.info(f"命中缓存: {url}")
+            return cached
+
+        task = self._pending.get(url)
+        if task is None:
+            task = asyncio.ensure_future(self._fetch_and_cache_async(mode, params))
+            self._pending[url] = task
+            task.add_done_callback(lambda _: self._pending.pop(url, None))
+        else:
+            self.coalesced += 1
+        # shield 防止某个调用者被取消时连带取消共享的请求
+        res = await asyncio.shield(task)
+        return copy.deepcopy(res)
+
+    async def gather_data_async(self, requests: Sequence[Tuple[str, Optional[Dict[str, Any]]]]) -> List[Dict[str, Any]]:
+        """
+        并发请求多个模式
+
+        Args:
+            requests: (mode, params) 列表
+
+        Returns:
+            与 requests 顺序一致的结果列表
+        """
+        return list(await asyncio.gather(*(self.get_data_async(mode, params) for mode, params in requests)))
+
+    def get_data(self, mode: str, params: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """
+        同步获取指定端点的数据（在私有事件循环中执行，共用同一个连接池）
+        """
+        return self._run(self.get_data_async(mode, params))
+
+    def gather_data(self, requests: Sequence[Tuple[str, Optional[Dict[str, Any]]]]) -> List[Dict[str, Any]]:
+        """
+        同步并发请求多个模式，耗时取决于最慢的一个请求
+
+        Args:
+            requests: (mode, params) 列表
+
+        Returns:
+            与 requests 顺序一致的结果列表
+        """
+        return self._run(self.gather_data_async(requests))
+
+    async def _close_client(self):
+        if self._client is not None and not self._client.closed:
+            await self._client.close()
+
+    def close(self):
+        """
+        关闭连接池和事件循环线程
+        """
+        super().close()
+        with self._loop_lock:
+            if self._loop is None:
+                return
+            loop, self._loop = self._loop, None
+        asyncio.run_coroutine_threadsafe(self._close_client(), loop).result()
+        loop.call_soon_threadsafe(loop.stop)
+        self._loop_thread.join(timeout=5)
+        loop.close()
@@ -0,0 +1,81 @@
+import copy
+import time
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional
+
+
+class ResponseCache:
+    """
+    API 响应缓存，每个条目有独立的过期时间，超出容量时按最近最少使用淘汰
+    """
+
+    def __init__(self, max_entries: int = 256):
+        """
+        初始化响应缓存
+
+        Args:
+            max_entries: 最多缓存的条目数
+        """
+        self.max_entries = max_entries
+        self._entries: 'OrderedDict[Hashable, tuple[float, Dict[str, Any]]]' = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: Hashable) -> Optional[Dict[str, Any]]:
+        """
+        读取缓存，过期条目视为未命中
+
+        Returns:
+            缓存的响应字典的深拷贝（调用方修改不影响缓存），未命中时返回None
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            expires_at, value = entry
+            if expires_at <= time.monotonic():
+                del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return copy.deepcopy(value)
+
+    def set(self, key: Hashable, value: Dict[str, Any], ttl: float) -> None:
+        """
+        写入缓存
+
+        Args:
+            key: 缓存键
+            value: 响应字典
+            ttl: 有效期（秒）
+        """
+        if ttl <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl, copy.deepcopy(value))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self) -> None:
+        """清空缓存"""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """获取缓存命中统计"""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'size': len(self._entries),
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': (self.hits / total) if total else 0.0,
+            }
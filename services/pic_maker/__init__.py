@@ -3,26 +3,65 @@ from pathlib import Path
 import json
 import time
 import logging
-from typing import Dict, Any, Union
+import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Dict, Any, List, Union, Callable, Optional, Iterable, Iterator, Tuple
+
+from .output_profiles import OUTPUT_OPTION_ENV, apply_output_profile, get_output_profile
+from .scheduler import JobSchedule, RenderDeadlineExceeded, PRIORITY_INTERACTIVE, PRIORITY_BACKGROUND
+from .tiling import Tile, plan_tiles
 
 class PicMaker:
     """
     图片生成类，用于根据不同需求绘制图片
     """
+
+    # 所有 PicMaker 实例共享的常驻浏览器池
+    _render_pool = None
+    _render_pool_lock = threading.Lock()
+
+    # 渲染结果缓存及各模式渲染器版本（渲染器源码的哈希）
+    _result_cache = None
+    # 渲染结果缓存与缓存目录管理器的创建锁（浏览器池启动较慢，不与其共用锁）
+    _cache_lock = threading.Lock()
+    _renderer_versions: Dict[str, str] = {}
+    # 修改渲染器之外的公共渲染逻辑时递增，使所有已缓存的图片失效
+    RENDER_CACHE_VERSION = 1
+    # 各模式共用的渲染模块（页面加载与截图、图标、模板、远程图片、Pillow 绘制、输出编码），其源码计入每个模式的渲染器版本
+    SHARED_RENDER_MODULES = ('render_pool.py', 'sprites.py', 'templates.py', 'asset_store.py',
+                             'pillow_engine.py', 'output_profiles.py')
+    # 影响渲染结果的配置项，其取值计入渲染结果缓存键
+    RENDER_OPTION_ENV = {
+        'player_legend': ('LEGEND_CHART_BACKEND',),
+        'player_warhits': ('HTML_SPRITE_SHEETS',),
+    }
+
+    # 缓存目录的容量/存活时间管理及后台清理线程
+    _cache_manager = None
     
-    def __init__(self, mode: str, data: Union[Dict[str, Any], str]):
+    def __init__(self, mode: str, data: Union[Dict[str, Any], str], tile: Optional[Tile] = None,
+                 room: str = '', priority: int = PRIORITY_INTERACTIVE):
         """
         初始化图片生成器
         
         Args:
             mode: 生成模式，决定如何处理和绘制图片
             data: JSON数据，可以是字典或JSON字符串
+            tile: 分页时要生成的页（只渲染该页的成员），为None时生成完整图片
+            room: 发起请求的群（私聊为发送者），渲染任务在同一优先级内按群轮转
+            priority: 渲染优先级（交互式指令 / 后台批量任务）
         """
         self.logger = logging.getLogger('PicMaker')
         self.logger.setLevel(logging.INFO)
         
         
         self.mode = mode
+        self.tile = tile
+        self.room = room
+        self.priority = priority
+        # 本次生成的调度信息（截止时间从 generate 开始计算）
+        self._schedule: Optional[JobSchedule] = None
         
         # 确保data是字典类型
         if isinstance(data, str):
@@ -39,18 +78,173 @@ class PicMaker:
         os.makedirs(self.cache_dir, exist_ok=True)
         
         self.logger.info(f"PicMaker初始化完成: 模式={mode}")
+
+    @classmethod
+    def get_render_pool(cls):
+        """
+        获取共享的渲染池，首次调用时启动
+
+        RENDER_ISOLATION 为 process 时浏览器运行在独立的渲染进程中（卡死、崩溃不影响机器人进程），
+        否则浏览器运行在本进程的工作线程中。
+        
+        Returns:
+            RenderPool 或 ProcessRenderPool 实例
+        """
+        if cls._render_pool is None:
+            with cls._render_pool_lock:
+                if cls._render_pool is None:
+                    # 每个浏览器启动后先用示例数据渲染一遍各模板
+                    warm_up_enabled = os.getenv('RENDER_WARM_UP', '1') == '1'
+                    if os.getenv('RENDER_ISOLATION', 'thread') == 'process':
+                        from .process_pool import ProcessRenderPool
+                        pool = ProcessRenderPool(warm_up=warm_up_enabled)
+                    else:
+                        from .render_pool import RenderPool
+                        from .warmup import warm_up_page
+                        pool = RenderPool(warm_up=warm_up_page if warm_up_enabled else None)
+                    pool.start()
+                    cls._render_pool = pool
+        return cls._render_pool
+
+    @classmethod
+    def warm_up(cls) -> Dict[str, Dict[str, float]]:
+        """
+        启动时预热：启动浏览器池（每个浏览器用示例数据渲染一遍各模板），并预热已启用的 Pillow 渲染器
+
+        预热失败只记录日志，不影响机器人启动；浏览器池会在第一次渲染时再次尝试启动。
+
+        Returns:
+            预热耗时：浏览器 worker 名称（Pillow 渲染器为 'pillow'）-> 模式 -> 毫秒
+        """
+        from .warmup import warm_up_pillow, format_timings
+
+        logger = logging.getLogger('PicMaker')
+        start = time.perf_counter()
+        report = {}
+        try:
+            report.update(cls.get_render_pool().warm_up_report())
+        except Exception as e:
+            logger.error(f"浏览器池预热失败: {str(e)}")
+        report['pillow'] = warm_up_pillow()
+        for name, timings in report.items():
+            logger.info(f"预热 {name}: {format_timings(timings)}")
+        logger.info(f"渲染预热完成，总耗时 {(time.perf_counter() - start) * 1000:.0f}ms")
+        return report
+
+    @classmethod
+    def shutdown_render_pool(cls) -> None:
+        """
+        关闭共享的浏览器池，并写入尚未保存的渲染结果索引
+        """
+        with cls._render_pool_lock:
+            if cls._render_pool is not None:
+                cls._render_pool.close()
+                cls._render_pool = None
+        if cls._result_cache is not None:
+            cls._result_cache.flush()
+
+    def _render(self, render_func: Callable[..., Optional[str]], filepath: str) -> Optional[str]:
+        """
+        在浏览器池（或渲染进程）中执行渲染函数
+        
+        Args:
+            render_func: 模块级渲染函数，签名为 (data, output_path, page)
+            filepath: 图片保存路径
+        """
+        if self.tile is not None:
+            return self.get_render_pool().render(render_func, self.data, filepath, schedule=self._schedule, tile=self.tile)
+        return self.get_render_pool().render(render_func, self.data, filepath, schedule=self._schedule)
+
+    def _use_pillow(self) -> bool:
+        """当前模式是否使用 Pillow 直接绘制（不经过浏览器），由 PILLOW_RENDER_MODES 配置；找不到中文字体时使用浏览器"""
+        from .pillow_engine import pillow_render_modes
+        return self.mode in pillow_render_modes()
+
+    @classmethod
+    def _get_result_cache(cls, cache_dir: Path):
+        """获取共享的渲染结果缓存"""
+        if cls._result_cache is None:
+            with cls._cache_lock:
+                if cls._result_cache is None:
+                    from .result_cache import RenderResultCache
+                    cls._result_cache = RenderResultCache(cache_dir)
+        return cls._result_cache
+
+    @classmethod
+    def get_cache_manager(cls, cache_dir: Path):
+        """获取共享的缓存目录管理器，首次调用时启动后台清理线程"""
+        if cls._cache_manager is None:
+            with cls._cache_lock:
+                if cls._cache_manager is None:
+                    from .cache_manager import CacheManager
+                    manager = CacheManager(cache_dir)
+                    manager.add_removal_listener(cls._forget_cached_results)
+                    manager.start()
+                    cls._cache_manager = manager
+        return cls._cache_manager
+
+    @classmethod
+    def _forget_cached_results(cls, filenames: List[str]) -> None:
+        """缓存清理线程删除图片后，移除渲染结果缓存中指向这些图片的索引项"""
+        if cls._result_cache is not None:
+            cls._result_cache.forget(filenames)
+
+    @classmethod
+    def _renderer_version(cls, mode: str) -> str:
+        """
+        获取渲染器版本：渲染器源码（含 {mode}_*.py 辅助模块）、静态脚本及共用渲染模块的哈希，
+        修改模板或公共渲染逻辑后旧的缓存图片自动失效
+        """
+        version = cls._renderer_versions.get(mode)
+        if version is None:
+            module_dir = Path(__file__).parent
+            digest = hashlib.sha1(str(cls.RENDER_CACHE_VERSION).encode('utf-8'))
+            for source_path in sorted(module_dir.glob(f"{mode}*.py")):
+                digest.update(source_path.read_bytes())
+            for name in cls.SHARED_RENDER_MODULES:
+                digest.update((module_dir / name).read_bytes())
+            for static_path in sorted((module_dir / "static").glob(f"{mode}*")):
+                digest.update(static_path.read_bytes())
+            version = cls._renderer_versions[mode] = digest.hexdigest()
+        return version
     
-    def generate(self, filename: str) -> str:
+    def generate(self, filename: str, schedule: Optional[JobSchedule] = None) -> str:
         """
         根据指定的模式和数据生成图片
         
+        Args:
+            filename: 图片文件名
+            schedule: 调度信息，为None时按 room / priority 创建（截止时间从现在开始计算）
+
         Returns:
             生成的图片路径
+
+        Raises:
+            RenderDeadlineExceeded: 渲染任务排队超过截止时间，调用方可改为回复 text_fallback()
         """
         self.logger.info(f"开始生成图片, 模式: {self.mode}")
+        self._schedule = schedule or JobSchedule.create(self.priority, self.room)
         
         # 生成唯一的文件名
         filepath = os.path.join(self.cache_dir, filename)
+        cache_manager = self.get_cache_manager(self.cache_dir)
+
+        # 数据和渲染器均未变化时直接复用已生成的图片
+        use_cache = os.getenv('RENDER_RESULT_CACHE', '1') == '1'
+        if use_cache:
+            result_cache = self._get_result_cache(self.cache_dir)
+            options = ",".join(os.getenv(name, '') for name in self.RENDER_OPTION_ENV.get(self.mode, ()) + OUTPUT_OPTION_ENV)
+            if self._use_pillow():
+                # 同一模式的 Pillow 渲染与浏览器渲染结果不同，其他模式的配置不影响本模式
+                options += ":pillow"
+            if self.tile is not None:
+                options += f":{self.tile.start}-{self.tile.stop}/{self.tile.count}"
+            cache_key = result_cache.make_key(self.mode, self.data, f"{self._renderer_version(self.mode)}:{options}")
+            cached_path = result_cache.lookup(cache_key)
+            if cached_path:
+                self.logger.info(f"复用已生成的图片: {cached_path}")
+                cache_manager.touch(cached_path)
+                return cached_path
         
         try:
             # 根据不同模式生成图片
@@ -70,13 +264,108 @@ class PicMaker:
                 self.logger.warning(f"未知的生成模式: {self.mode}，使用默认模式")
                 pass
             
-            self.logger.info(f"图片生成成功: {filename}")
+            if os.path.exists(filepath):
+                # 按模式的输出配置重新编码（调色板 PNG / JPEG / WebP、限制尺寸）
+                filepath = apply_output_profile(filepath, get_output_profile(self.mode))
+            self.logger.info(f"图片生成成功: {os.path.basename(filepath)}")
+            if os.path.exists(filepath):
+                cache_manager.touch(filepath)
+                if use_cache:
+                    result_cache.store(cache_key, filepath)
             return filepath
         
+        except RenderDeadlineExceeded as e:
+            self.logger.warning(f"图片生成已放弃: {str(e)}")
+            raise
         except Exception as e:
             self.logger.error(f"图片生成失败: {str(e)}")
             raise RuntimeError(f"图片生成失败: {str(e)}")
     
+    def generate_tiles(self, filename: str) -> List[str]:
+        """
+        分页生成图片：成员较多时按 TILED_MODES / TILE_ROWS 配置拆成多张固定行数的图片
+
+        页数在渲染前按数据计算，各页并行提交给浏览器池渲染，返回时按页码排序。
+        模式未启用分页、使用 Pillow 渲染或成员不超过一页时，与 generate 相同只生成一张图片。
+
+        Args:
+            filename: 图片文件名，分页时各页文件名追加 _p1、_p2 ...
+
+        Returns:
+            按页码排序的图片路径
+        """
+        tiles = [] if self._use_pillow() else plan_tiles(self.mode, self.data)
+        if len(tiles) <= 1:
+            filepath = self.generate(filename)
+            return [filepath] if filepath else []
+
+        self.logger.info(f"分页生成图片, 模式: {self.mode}, 共 {len(tiles)} 页")
+        stem, suffix = os.path.splitext(filename)
+        # 各页共用同一个截止时间
+        schedule = JobSchedule.create(self.priority, self.room)
+
+        def render(tile: Tile) -> Optional[str]:
+            page_maker = type(self)(self.mode, self.data, tile, self.room, self.priority)
+            return page_maker.generate(f"{stem}_p{tile.index + 1}{suffix}", schedule)
+
+        workers = min(len(tiles), int(os.getenv('RENDER_POOL_SIZE', 2)))
+        with ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix='PicMakerTile') as executor:
+            paths = list(executor.map(render, tiles))
+        return [path for path in paths if path]
+
+    def text_fallback(self) -> str:
+        """
+        图片生成被放弃（排队超过截止时间）时回复的文字版结果
+
+        Returns:
+            按模式整理的文字摘要
+        """
+        from .text_fallback import summarize
+        return summarize(self.mode, self.data)
+
+    @classmethod
+    def generate_many(cls, jobs: Iterable[Tuple[str, Union[Dict[str, Any], str], str]],
+                      max_workers: Optional[int] = None, room: str = '',
+                      priority: int = PRIORITY_BACKGROUND) -> Iterator[Tuple[str, Optional[str]]]:
+        """
+        批量生成图片（定时报告、一次查询多个标签等场景）
+
+        各图片并行提交给浏览器池，由池中常驻的页面渲染（页面已加载的字体、图标在多次渲染间复用），
+        每张图片完成后立即返回，不必等待整批结束。单张图片失败不影响其他图片。
+        批量任务默认为后台优先级，交互式指令的渲染任务总是先执行。
+
+        Args:
+            jobs: (模式, 数据, 文件名) 列表
+            max_workers: 同时进行的渲染数量，如果为None则与浏览器池大小（RENDER_POOL_SIZE）一致
+            room: 发起批量任务的群
+            priority: 渲染优先级
+
+        Yields:
+            (文件名, 图片路径)，按完成顺序；生成失败时图片路径为None
+        """
+        jobs = list(jobs)
+        if not jobs:
+            return
+        logger = logging.getLogger('PicMaker')
+        workers = max_workers or int(os.getenv('RENDER_POOL_SIZE', 2))
+
+        def render(mode: str, data: Union[Dict[str, Any], str], filename: str) -> str:
+            return cls(mode, data, room=room, priority=priority).generate(filename)
+
+        executor = ThreadPoolExecutor(max_workers=max(1, min(workers, len(jobs))), thread_name_prefix='PicMakerBatch')
+        try:
+            futures = {executor.submit(render, mode, data, filename): filename for mode, data, filename in jobs}
+            for future in as_completed(futures):
+                filename = futures[future]
+                try:
+                    yield filename, future.result()
+                except Exception as e:
+                    logger.error(f"批量生成图片失败: {filename}: {str(e)}")
+                    yield filename, None
+        finally:
+            # 调用方提前停止迭代时，取消尚未开始的渲染
+            executor.shutdown(wait=False, cancel_futures=True)
+
     def _generate_player_info(self, filepath: str) -> None:
         """
         生成玩家统计图片
@@ -86,7 +375,7 @@ class PicMaker:
         """
         from .player_info import generate_player_info_image
         # 调用player_info.py中的函数生成图片
-        generate_player_info_image(self.data, filepath)
+        self._render(generate_player_info_image, filepath)
     
     def _generate_player_legend(self, filepath: str) -> None:
         """
@@ -97,7 +386,7 @@ class PicMaker:
         """
         from .player_legend import generate_player_legend_image
         # 调用player_legend.py中的函数生成图片
-        generate_player_legend_image(self.data, filepath)
+        self._render(generate_player_legend_image, filepath)
 
     def _generate_player_warhits(self, filepath: str) -> None:
         """
@@ -106,9 +395,13 @@ class PicMaker:
         Args:
             filepath: 图片保存路径
         """
+        if self._use_pillow():
+            from .player_warhits_pillow import render_player_warhits_image
+            render_player_warhits_image(self.data, filepath)
+            return
         from.player_warhits import generate_player_warhits_image
         # 调用player_warhits.py中的函数生成图片
-        generate_player_warhits_image(self.data, filepath)
+        self._render(generate_player_warhits_image, filepath)
 
     def _generate_player_todo(self, filepath: str) -> None:
         """
@@ -127,12 +420,16 @@ class PicMaker:
         """
         from .clan_info import generate_clan_info_image
         # 调用clan_info.py中的函数生成图片
-        generate_clan_info_image(self.data, filepath)
+        self._render(generate_clan_info_image, filepath)
 
     def _generate_clan_raids(self, filepath: str) -> None:
         """
         生成部落突袭图片
         """
+        if self._use_pillow():
+            from .clan_raids_pillow import render_clan_raids_image
+            render_clan_raids_image(self.data, filepath)
+            return
         from .clan_raids import generate_clan_raids_image
         # 调用clan_raids.py中的函数生成图片
-        generate_clan_raids_image(self.data, filepath)
\ No newline at end of file
+        self._render(generate_clan_raids_image, filepath)
\ No newline at end of file
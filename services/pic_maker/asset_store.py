@@ -0,0 +1,248 @@
+import os
+import re
+import json
+import base64
+import hashlib
+import logging
+import mimetypes
+import threading
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from typing import Any, Dict, Iterable, Optional
+from urllib.parse import urlparse
+
+import requests
+import urllib3
+from requests.adapters import HTTPAdapter
+
+# 与原先 urlopen 的行为保持一致：不校验证书
+urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
+
+# 远程图片的本地存储目录
+ASSET_STORE_DIR = Path(__file__).parent.parent.parent / "storage/pic_src/remote"
+
+# HTML 中引用的远程图片：src="..." 属性和 CSS url(...)；{local} 处排除渲染页面虚拟站点
+REMOTE_IMAGE_TEMPLATE = r'''(?P<prefix>src=["']|url\(["']?)(?P<url>https?://{local}[^"')\s]+?\.(?:png|jpe?g|gif|webp|svg)(?:\?[^"')\s]*)?)'''
+
+
+@lru_cache(maxsize=None)
+def remote_image_pattern() -> re.Pattern:
+    """
+    匹配 HTML 中远程图片的正则
+
+    渲染页面虚拟站点（render_pool.RENDER_ORIGIN）下的本地图标由请求拦截从内存提供，不属于远程图片。
+    render_pool 经 sprites 间接导入本模块，因此在首次使用时才读取 RENDER_ORIGIN。
+    """
+    from .render_pool import RENDER_ORIGIN
+    local = f"(?!{re.escape(urlparse(RENDER_ORIGIN).netloc)}/)"
+    return re.compile(REMOTE_IMAGE_TEMPLATE.format(local=local), re.IGNORECASE)
+
+
+class AssetStore:
+    """
+    远程图片的本地内容寻址存储
+
+    每个 URL 只下载一次，文件按内容的 sha256 命名保存（相同内容的不同 URL 共用一个文件），
+    索引文件记录 URL 到内容哈希的映射。渲染前将 HTML 中的远程图片改写为 data URI，
+    浏览器渲染时不再产生网络请求。
+    """
+
+    INDEX_FILE = "index.json"
+
+    def __init__(self, store_dir: Path = ASSET_STORE_DIR, workers: Optional[int] = None, timeout: Optional[int] = None):
+        """
+        初始化图片存储
+
+        Args:
+            store_dir: 存储目录
+            workers: 并发下载线程数，如果为None则从环境变量获取
+            timeout: 单个图片下载超时时间（秒），如果为None则从环境变量获取
+        """
+        self.logger = logging.getLogger('AssetStore')
+        self.logger.setLevel(logging.INFO)
+
+        self.store_dir = Path(store_dir)
+        os.makedirs(self.store_dir, exist_ok=True)
+        self.index_path = self.store_dir / self.INDEX_FILE
+        self.workers = workers if workers is not None else int(os.getenv('ICON_FETCH_WORKERS', 8))
+        self.timeout = timeout if timeout is not None else int(os.getenv('ICON_FETCH_TIMEOUT', 10))
+
+        self.session = requests.Session()
+        self.session.verify = False
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=self.workers)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+        self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="AssetFetcher")
+
+        self._lock = threading.Lock()
+        # url -> {'file': 内容哈希文件名, 'mime': MIME类型}
+        self._index: Dict[str, Dict[str, str]] = self._load_index()
+        self.hits = 0
+        self.downloads = 0
+        self.failures = 0
+
+    def _load_index(self) -> Dict[str, Dict[str, str]]:
+        if not self.index_path.exists():
+            return {}
+        try:
+            with open(self.index_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except Exception as e:
+            self.logger.error(f"加载图片索引失败: {str(e)}")
+            return {}
+
+    def _save_index(self) -> None:
+        """原子地写入索引文件，调用方需持有锁"""
+        tmp_path = self.index_path.with_suffix('.tmp')
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(self._index, f)
+            os.replace(tmp_path, self.index_path)
+        except Exception as e:
+            self.logger.error(f"保存图片索引失败: {str(e)}")
+
+    @staticmethod
+    def _guess_mime(url: str, content_type: str = '') -> str:
+        mime = content_type.split(';')[0].strip()
+        if mime.startswith('image/'):
+            return mime
+        return mimetypes.guess_type(urlparse(url).path)[0] or 'image/png'
+
+    def _lookup(self, url: str) -> Optional[Dict[str, str]]:
+        with self._lock:
+            entry = self._index.get(url)
+        if entry is not None and (self.store_dir / entry['file']).exists():
+            return entry
+        return None
+
+    def _download(self, url: str) -> Optional[Dict[str, str]]:
+        try:
+            response = self.session.get(url, timeout=self.timeout)
+            response.raise_for_status()
+        except requests.exceptions.RequestException as e:
+            with self._lock:
+                self.failures += 1
+            self.logger.error(f"图片下载失败: {url} - 错误: {str(e)}")
+            return None
+
+        content = response.content
+        mime = self._guess_mime(url, response.headers.get('Content-Type', ''))
+        suffix = mimetypes.guess_extension(mime) or '.bin'
+        filename = f"{hashlib.sha256(content).hexdigest()}{suffix}"
+        path = self.store_dir / filename
+        if not path.exists():
+            tmp_path = path.with_name(f"{filename}.{threading.get_ident()}.tmp")
+            with open(tmp_path, 'wb') as f:
+                f.write(content)
+            os.replace(tmp_path, path)
+
+        entry = {'file': filename, 'mime': mime}
+        with self._lock:
+            self._index[url] = entry
+            self.downloads += 1
+            self._save_index()
+        return entry
+
+    def _resolve(self, url: str) -> Optional[Dict[str, str]]:
+        """获取 URL 对应的存储项，本地没有时下载"""
+        entry = self._lookup(url)
+        if entry is not None:
+            with self._lock:
+                self.hits += 1
+            return entry
+        return self._download(url)
+
+    def _resolve_many(self, urls: Iterable[str]) -> Dict[str, Optional[Dict[str, str]]]:
+        unique = list(dict.fromkeys(url for url in urls if url))
+        return dict(zip(unique, self._executor.map(self._resolve, unique)))
+
+    def get(self, url: str) -> Optional[bytes]:
+        """
+        获取图片内容，本地没有时下载并保存
+
+        Returns:
+            图片字节内容，下载失败时返回None
+        """
+        entry = self._resolve(url)
+        return (self.store_dir / entry['file']).read_bytes() if entry else None
+
+    def fetch_many(self, urls: Iterable[str]) -> Dict[str, Optional[bytes]]:
+        """
+        并发获取多个图片
+
+        Args:
+            urls: 图片 URL 列表（重复的 URL 只获取一次）
+
+        Returns:
+            URL 到图片内容的映射，下载失败的为None
+        """
+        return {url: (self.store_dir / entry['file']).read_bytes() if entry else None
+                for url, entry in self._resolve_many(urls).items()}
+
+    def data_uris(self, urls: Iterable[str]) -> Dict[str, Optional[str]]:
+        """
+        并发获取多个图片并转换为 data URI
+
+        Returns:
+            URL 到 data URI 的映射，下载失败的为None
+        """
+        result = {}
+        for url, entry in self._resolve_many(urls).items():
+            if entry is None:
+                result[url] = None
+            else:
+                result[url] = to_data_uri((self.store_dir / entry['file']).read_bytes(), entry['mime'])
+        return result
+
+    def rewrite_html(self, html_content: str) -> str:
+        """
+        将 HTML 中引用的远程图片改写为 data URI；下载失败的图片保留原 URL
+
+        Args:
+            html_content: 待渲染的HTML
+
+        Returns:
+            改写后的HTML
+        """
+        urls = [match.group('url') for match in remote_image_pattern().finditer(html_content)]
+        if not urls:
+            return html_content
+        uris = self.data_uris(urls)
+
+        def replace(match):
+            uri = uris.get(match.group('url'))
+            return f"{match.group('prefix')}{uri}" if uri else match.group(0)
+
+        return remote_image_pattern().sub(replace, html_content)
+
+    def stats(self) -> Dict[str, Any]:
+        """获取命中率与下载统计"""
+        with self._lock:
+            total = self.hits + self.downloads + self.failures
+            return {
+                'entries': len(self._index),
+                'hits': self.hits,
+                'downloads': self.downloads,
+                'failures': self.failures,
+                'hit_rate': (self.hits / total) if total else 0.0,
+            }
+
+
+_asset_store: Optional[AssetStore] = None
+_asset_store_lock = threading.Lock()
+
+
+def get_asset_store() -> AssetStore:
+    """获取共享的远程图片存储"""
+    global _asset_store
+    if _asset_store is None:
+        with _asset_store_lock:
+            if _asset_store is None:
+                _asset_store = AssetStore()
+    return _asset_store
+
+
+def to_data_uri(content: bytes, mime: str = "image/png") -> str:
+    """将图片内容转换为 data URI"""
+    return f"data:{mime};base64,{base64.b64encode(content).decode('utf-8')}"
@@ -0,0 +1,276 @@
+"""
+图片渲染性能基准测试
+
+用法:
+    python -m services.pic_maker.benchmark legend_chart -n 10
+    python -m services.pic_maker.benchmark html
+    BENCH_UPLINK_KBPS=2000 python -m services.pic_maker.benchmark output
+"""
+import os
+import re
+import time
+import json
+import argparse
+import tempfile
+import statistics
+from pathlib import Path
+from html.parser import HTMLParser
+from typing import Any, Callable, Dict, Optional
+
+from .warmup import sample_legend_data
+
+# HTML 中内联的 data URI
+DATA_URI_PATTERN = re.compile(r'data:[\w/+.-]+;base64,[A-Za-z0-9+/=]+')
+
+
+def measure(fn: Callable[[], Any], repeat: int = 10, warmup: int = 1) -> Dict[str, float]:
+    """
+    多次执行函数并统计耗时
+
+    Args:
+        fn: 被测函数
+        repeat: 计时的执行次数
+        warmup: 预热次数（不计时）
+
+    Returns:
+        耗时统计（毫秒）：min、median、mean、max
+    """
+    for _ in range(warmup):
+        fn()
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return {
+        'min': min(samples),
+        'median': statistics.median(samples),
+        'mean': statistics.mean(samples),
+        'max': max(samples),
+    }
+
+
+def print_report(title: str, results: Dict[str, Dict[str, float]]) -> None:
+    """以表格形式输出测试结果"""
+    print(f"\n== {title} ==")
+    width = max((len(name) for name in results), default=10)
+    print(f"{'case'.ljust(width)}  {'min':>9}  {'median':>9}  {'mean':>9}  {'max':>9}")
+    for name, stats in results.items():
+        print(f"{name.ljust(width)}  " + "  ".join(f"{stats[key]:>7.1f}ms" for key in ('min', 'median', 'mean', 'max')))
+
+
+def bench_legend_chart(repeat: int) -> Dict[str, Dict[str, float]]:
+    """对比冲杯图片奖杯曲线的两种绘制方式：页面脚本 (canvas) 与服务端 matplotlib"""
+    from .player_legend import generate_player_legend_html, generate_player_legend_image
+    from .player_legend_chart import render_trophy_chart
+    from .render_pool import standalone_page
+
+    data = sample_legend_data()
+    results = {}
+
+    # 只生成HTML（不含浏览器渲染）
+    results['html/canvas'] = measure(lambda: generate_player_legend_html(data, 'canvas'), repeat)
+
+    def html_matplotlib_uncached():
+        render_trophy_chart.cache_clear()
+        generate_player_legend_html(data, 'matplotlib')
+
+    results['html/matplotlib (uncached)'] = measure(html_matplotlib_uncached, repeat)
+    results['html/matplotlib (cached)'] = measure(lambda: generate_player_legend_html(data, 'matplotlib'), repeat)
+
+    # 完整渲染为图片（需要浏览器）
+    try:
+        with standalone_page() as page, tempfile.TemporaryDirectory() as tmp_dir:
+            output_path = str(Path(tmp_dir) / "legend.png")
+            for backend in ('canvas', 'matplotlib'):
+                render_trophy_chart.cache_clear()
+                results[f'image/{backend}'] = measure(
+                    lambda: generate_player_legend_image(data, output_path, page, backend), repeat)
+    except Exception as e:
+        print(f"跳过截图测试（无法启动浏览器）: {e}")
+
+    return results
+
+
+def html_stats(html: str) -> Dict[str, float]:
+    """
+    统计页面 HTML 的体积及其中内联图片的占比
+
+    Returns:
+        size_kb: HTML 总大小；data_uris: 内联图片数量；data_uri_kb: 内联图片总大小；
+        duplicate_kb: 重复出现的内联图片占用的大小（去重后可以节省的部分）
+    """
+    uris = DATA_URI_PATTERN.findall(html)
+    unique = set(uris)
+    return {
+        'size_kb': len(html.encode('utf-8')) / 1024,
+        'data_uris': len(uris),
+        'data_uri_kb': sum(map(len, uris)) / 1024,
+        'duplicate_kb': (sum(map(len, uris)) - sum(map(len, unique))) / 1024,
+    }
+
+
+def sample_pages() -> Dict[str, Callable[[], str]]:
+    """各模式使用示例数据生成页面 HTML 的函数"""
+    from .clan_raids import generate_clan_raids_html, process_raid_data
+    from .player_legend import generate_player_legend_html
+    from .player_warhits import generate_player_warhits_html
+
+    module_dir = Path(__file__).parent
+    pages = {'player_legend': lambda: generate_player_legend_html(sample_legend_data(), 'canvas')}
+    capital_path = module_dir / "capital.json"
+    if capital_path.is_file():
+        members, _ = process_raid_data(json.loads(capital_path.read_text(encoding='utf-8')))
+        pages['clan_raids'] = lambda: generate_clan_raids_html(members)
+    warhits_path = module_dir / "test.json"
+    if warhits_path.is_file():
+        warhits = json.loads(warhits_path.read_text(encoding='utf-8'))
+        pages['player_warhits'] = lambda: generate_player_warhits_html(warhits, sprite_sheets=True)
+        pages['player_warhits (no sprites)'] = lambda: generate_player_warhits_html(warhits, sprite_sheets=False)
+    return pages
+
+
+def bench_html(repeat: int) -> Dict[str, Dict[str, float]]:
+    """
+    各模式页面 HTML 的体积、生成耗时和解析耗时
+
+    解析耗时优先使用浏览器 set_content 测量，无法启动浏览器时使用 Python 的 HTMLParser 作为参考。
+    """
+    from .render_pool import standalone_page
+
+    pages = {name: build() for name, build in sample_pages().items()}
+    print("\n== html size ==")
+    width = max(len(name) for name in pages)
+    print(f"{'mode'.ljust(width)}  {'size':>10}  {'data URIs':>9}  {'inline':>10}  {'duplicate':>10}")
+    for name, html in pages.items():
+        stats = html_stats(html)
+        print(f"{name.ljust(width)}  {stats['size_kb']:>8.1f}KB  {stats['data_uris']:>9}  "
+              f"{stats['data_uri_kb']:>8.1f}KB  {stats['duplicate_kb']:>8.1f}KB")
+
+    results = {}
+    for name, build in sample_pages().items():
+        results[f'{name}/build'] = measure(build, repeat)
+    try:
+        with standalone_page() as page:
+            for name, html in pages.items():
+                results[f'{name}/set_content'] = measure(lambda: page.set_content(html), repeat)
+    except Exception as e:
+        print(f"浏览器解析测试跳过（无法启动浏览器），使用 HTMLParser: {e}")
+        for name, html in pages.items():
+            results[f'{name}/parse (python)'] = measure(lambda: HTMLParser().feed(html), repeat)
+    return results
+
+
+def bench_pillow(repeat: int) -> Dict[str, Dict[str, float]]:
+    """对比 clan_raids / player_warhits 的 Pillow 绘制与浏览器截图"""
+    from .clan_raids import generate_clan_raids_image
+    from .clan_raids_pillow import render_clan_raids_image
+    from .player_warhits import generate_player_warhits_image
+    from .player_warhits_pillow import render_player_warhits_image
+    from .render_pool import standalone_page
+
+    module_dir = Path(__file__).parent
+    cases = {
+        'clan_raids': (module_dir / "capital.json", render_clan_raids_image, generate_clan_raids_image),
+        'player_warhits': (module_dir / "test.json", render_player_warhits_image, generate_player_warhits_image),
+    }
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        output_path = str(Path(tmp_dir) / "output.png")
+        samples = {}
+        for name, (data_path, pillow_render, _) in cases.items():
+            if not data_path.is_file():
+                print(f"跳过 {name}（缺少测试数据 {data_path.name}）")
+                continue
+            samples[name] = json.loads(data_path.read_text(encoding='utf-8'))
+            results[f'{name}/pillow'] = measure(lambda: pillow_render(samples[name], output_path), repeat)
+
+        try:
+            with standalone_page() as page:
+                for name, data in samples.items():
+                    browser_render = cases[name][2]
+                    results[f'{name}/browser'] = measure(lambda: browser_render(data, output_path, page), repeat)
+        except Exception as e:
+            print(f"跳过截图测试（无法启动浏览器）: {e}")
+
+    return results
+
+
+def sample_images(tmp_dir: Path) -> Dict[str, Path]:
+    """输出编码测试使用的图片：缓存目录中已生成的图片，以及 Pillow 绘制的示例图片"""
+    images = {}
+    cache_dir = Path(__file__).parent.parent.parent / "storage/cache"
+    for path in sorted(cache_dir.glob("*.png"))[:3]:
+        images[path.stem] = path
+
+    from .clan_raids_pillow import render_clan_raids_image
+    from .player_warhits_pillow import render_player_warhits_image
+    module_dir = Path(__file__).parent
+    for name, data_path, render in (('clan_raids', module_dir / "capital.json", render_clan_raids_image),
+                                    ('player_warhits', module_dir / "test.json", render_player_warhits_image)):
+        if data_path.is_file():
+            output_path = tmp_dir / f"{name}.png"
+            render(json.loads(data_path.read_text(encoding='utf-8')), output_path)
+            images[name] = output_path
+    return images
+
+
+def bench_output(repeat: int) -> Dict[str, Dict[str, float]]:
+    """
+    各输出配置的文件体积、编码耗时及按上行带宽估算的发送耗时
+
+    上行带宽通过环境变量 BENCH_UPLINK_KBPS 指定（默认 1000 kbps）。
+    """
+    from PIL import Image
+    from .output_profiles import PROFILES, encode_image
+
+    uplink_kbps = float(os.getenv('BENCH_UPLINK_KBPS', 1000))
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        tmp_dir = Path(tmp_dir)
+        images = sample_images(tmp_dir)
+        if not images:
+            print("跳过输出编码测试（没有可用的示例图片）")
+            return results
+
+        print(f"\n== output size (uplink {uplink_kbps:g} kbps) ==")
+        width = max(len(name) for name in images) + 6
+        print(f"{'image/profile'.ljust(width)}  {'size':>10}  {'pixels':>11}  {'send':>9}")
+        for name, path in images.items():
+            with Image.open(path) as image:
+                image.load()
+            for profile in PROFILES.values():
+                output_path = tmp_dir / f"out{profile.extension}"
+                timing = measure(lambda: encode_image(image, profile, output_path), repeat)
+                size = output_path.stat().st_size
+                with Image.open(output_path) as encoded:
+                    pixels = f"{encoded.width}x{encoded.height}"
+                send_ms = size * 8 / uplink_kbps
+                print(f"{f'{name}/{profile.name}'.ljust(width)}  {size / 1024:>8.1f}KB  {pixels:>11}  {send_ms:>7.0f}ms")
+                results[f'{name}/{profile.name}/encode'] = timing
+    return results
+
+
+BENCHMARKS: Dict[str, Callable[[int], Dict[str, Dict[str, float]]]] = {
+    'html': bench_html,
+    'legend_chart': bench_legend_chart,
+    'output': bench_output,
+    'pillow': bench_pillow,
+}
+
+
+def main(argv: Optional[list] = None) -> None:
+    parser = argparse.ArgumentParser(description="图片渲染性能基准测试")
+    parser.add_argument('names', nargs='*', help=f"要运行的测试（{', '.join(sorted(BENCHMARKS))}），默认全部")
+    parser.add_argument('-n', '--repeat', type=int, default=10, help="每个测试的计时次数")
+    args = parser.parse_args(argv)
+    unknown = [name for name in args.names if name not in BENCHMARKS]
+    if unknown:
+        parser.error(f"未知的测试: {', '.join(unknown)}")
+
+    for name in args.names or sorted(BENCHMARKS):
+        print_report(name, BENCHMARKS[name](args.repeat))
+
+
+if __name__ == "__main__":
+    main()
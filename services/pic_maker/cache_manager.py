@@ -0,0 +1,181 @@
+import os
+import json
+import time
+import logging
+import threading
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+
+class CacheManager:
+    """
+    图片缓存目录管理：按存活时间和总大小淘汰图片
+
+    每次生成或复用图片时记录访问时间，后台清理线程定期删除超过最大存活时间的图片，
+    并在总大小超限时按最近最少访问的顺序淘汰。删除图片后通知已注册的回调（如渲染结果缓存移除对应的索引项）。
+    """
+
+    ACCESS_INDEX_FILE = "access_index.json"
+    # 缓存目录中由程序维护的索引文件，不参与淘汰
+    RESERVED_FILES = {"access_index.json", "render_index.json"}
+
+    def __init__(self, cache_dir: Path, max_bytes: Optional[int] = None, max_age: Optional[int] = None,
+                 interval: Optional[int] = None, min_keep: Optional[int] = None):
+        """
+        初始化缓存管理器
+
+        Args:
+            cache_dir: 图片缓存目录
+            max_bytes: 缓存目录最大字节数，如果为None则从环境变量获取
+            max_age: 图片最长保留时间（秒），以最后访问时间计
+            interval: 后台清理间隔（秒）
+            min_keep: 最近访问的图片至少保留的时间（秒），防止删除正在发送的图片
+        """
+        self.logger = logging.getLogger('CacheManager')
+        self.logger.setLevel(logging.INFO)
+
+        self.cache_dir = Path(cache_dir)
+        self.max_bytes = max_bytes if max_bytes is not None else int(os.getenv('PIC_CACHE_MAX_MB', 500)) * 1024 * 1024
+        self.max_age = max_age if max_age is not None else int(os.getenv('PIC_CACHE_MAX_AGE', 3 * 24 * 3600))
+        self.interval = interval if interval is not None else int(os.getenv('PIC_CACHE_JANITOR_INTERVAL', 600))
+        self.min_keep = min_keep if min_keep is not None else 60
+
+        self.index_path = self.cache_dir / self.ACCESS_INDEX_FILE
+        self._lock = threading.Lock()
+        self._access: Dict[str, float] = self._load_index()
+        self._stopped = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._removal_listeners: List[Callable[[List[str]], Any]] = []
+        self._metrics = {
+            'runs': 0,
+            'files_removed': 0,
+            'bytes_reclaimed': 0,
+        }
+
+    def _load_index(self) -> Dict[str, float]:
+        if not self.index_path.exists():
+            return {}
+        try:
+            with open(self.index_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except Exception as e:
+            self.logger.error(f"加载访问索引失败: {str(e)}")
+            return {}
+
+    def _save_index(self) -> None:
+        """原子地写入访问索引，调用方需持有锁"""
+        tmp_path = self.index_path.with_suffix('.tmp')
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(self._access, f)
+            os.replace(tmp_path, self.index_path)
+        except Exception as e:
+            self.logger.error(f"保存访问索引失败: {str(e)}")
+
+    def touch(self, filepath: str) -> None:
+        """记录图片被生成或复用"""
+        with self._lock:
+            self._access[Path(filepath).name] = time.time()
+
+    def add_removal_listener(self, listener: Callable[[List[str]], Any]) -> None:
+        """
+        注册图片删除回调
+
+        Args:
+            listener: 每次清理删除图片后以被删除的文件名列表调用
+        """
+        self._removal_listeners.append(listener)
+
+    def start(self) -> None:
+        """启动后台清理线程"""
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._janitor_loop, name="CacheJanitor", daemon=True)
+        self._thread.start()
+        self.logger.info(f"缓存清理线程已启动: 上限 {self.max_bytes // (1024 * 1024)}MB, 保留 {self.max_age} 秒")
+
+    def stop(self) -> None:
+        """停止后台清理线程"""
+        self._stopped.set()
+
+    def _janitor_loop(self):
+        while not self._stopped.wait(timeout=self.interval):
+            try:
+                self.cleanup()
+            except Exception as e:
+                self.logger.error(f"缓存清理失败: {str(e)}")
+
+    def cleanup(self) -> Dict[str, int]:
+        """
+        执行一次清理：先删除过期图片，再按最近最少访问淘汰直到总大小低于上限
+
+        Returns:
+            本次删除的文件数和回收的字节数
+        """
+        now = time.time()
+        files = []
+        for entry in os.scandir(self.cache_dir):
+            if not entry.is_file() or entry.name in self.RESERVED_FILES or entry.name.endswith('.tmp'):
+                continue
+            stat = entry.stat()
+            with self._lock:
+                last_access = self._access.get(entry.name, stat.st_mtime)
+            files.append((last_access, entry.name, stat.st_size))
+
+        # 最久未访问的排在前面
+        files.sort()
+        total_bytes = sum(size for _, _, size in files)
+        removed_names = []
+        reclaimed = 0
+
+        for last_access, name, size in files:
+            idle = now - last_access
+            if idle < self.min_keep:
+                break
+            if idle < self.max_age and total_bytes <= self.max_bytes:
+                break
+            with self._lock:
+                touched = self._access.get(name, last_access) > last_access
+            if touched:
+                # 扫描之后刚被复用，不再是最久未访问的图片
+                continue
+            try:
+                os.remove(self.cache_dir / name)
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                self.logger.warning(f"删除缓存文件失败: {name} - {str(e)}")
+                continue
+            total_bytes -= size
+            removed_names.append(name)
+            reclaimed += size
+        removed = len(removed_names)
+
+        with self._lock:
+            # 在现有访问记录上原地删除，保留扫描期间 touch() 记录的较新时间
+            for name in removed_names:
+                self._access.pop(name, None)
+            for name in [name for name in self._access if not (self.cache_dir / name).exists()]:
+                del self._access[name]
+            self._save_index()
+            self._metrics['runs'] += 1
+            self._metrics['files_removed'] += removed
+            self._metrics['bytes_reclaimed'] += reclaimed
+
+        if removed_names:
+            for listener in self._removal_listeners:
+                try:
+                    listener(removed_names)
+                except Exception as e:
+                    self.logger.error(f"删除回调执行失败: {str(e)}")
+
+        if removed:
+            self.logger.info(f"缓存清理完成: 删除 {removed} 个文件, 回收 {reclaimed / 1024:.1f}KB, 剩余 {total_bytes / 1024:.1f}KB")
+        return {'files_removed': removed, 'bytes_reclaimed': reclaimed}
+
+    def stats(self) -> Dict[str, Any]:
+        """获取清理统计"""
+        with self._lock:
+            stats = dict(self._metrics)
+            stats['tracked_files'] = len(self._access)
+        return stats
@@ -1,8 +1,9 @@
 import json
 import os
 from pathlib import Path
-from playwright.sync_api import sync_playwright
-# import asyncio # No longer needed for sync version
+from .render_pool import standalone_page, capture_html, asset_url, PhaseTimer
+from .asset_store import get_asset_store
+from .templates import Template
 
 # --- 配置 ---
 # 使用绝对路径，基于脚本位置
@@ -11,6 +12,19 @@ PROJECT_ROOT = SCRIPT_DIR.parent.parent
 # 图片资源目录
 PIC_SRC_DIR = PROJECT_ROOT / 'storage' / 'pic_src'
 
+# 截图前需要满足的页面就绪条件
+PAGE_READY = ('fonts', 'images')
+
+# 页面布局（与 CSS 对应，单位为像素），用于按成员数预估内容高度
+VIEWPORT_WIDTH = 740
+# 部落信息头部、标签及积分区域
+LAYOUT_HEADER_HEIGHT = 510
+# 分页时只有成员列表的页面：容器内边距及成员列表标题
+LAYOUT_MEMBERS_TITLE_HEIGHT = 70
+# 成员卡片每行 4 个，每行高度（含间距）
+LAYOUT_MEMBER_COLUMNS = 4
+LAYOUT_MEMBER_ROW_HEIGHT = 76
+
 # 简单的翻译和映射
 LOCATIONS = {
     "International": "全球",
@@ -154,13 +168,13 @@ def format_location(location_data):
     return name
 
 def get_resource_path(filename):
-    """获取资源文件的绝对路径"""
+    """获取资源文件在渲染页面中的地址"""
     resource_path = PIC_SRC_DIR / filename
     if not resource_path.exists():
         print(f"警告: 资源文件不存在 - {resource_path}")
         # 如果找不到文件，可以返回一个默认图片路径
-        return f"file://{PIC_SRC_DIR}/default.png"
-    return f"file://{resource_path.absolute()}"
+        return asset_url("default.png")
+    return asset_url(resource_path)
 
 def get_role_class(role):
     """获取角色对应的CSS类名"""
@@ -173,38 +187,8 @@ def get_role_class(role):
         return "admin"
     return ""
 
-# --- HTML 生成 ---
-def generate_html(data):
-    """根据部落数据生成 HTML 字符串"""
-    clan_name = get_value(data, 'name')
-    clan_tag = get_value(data, 'tag')
-    clan_badge_url = get_value(data, 'badgeUrls.large')
-    clan_labels = get_value(data, 'labels', [])
-    clan_members_count = get_value(data, 'members')
-    clan_league = translate_league(get_value(data, 'warLeague.name'))
-    clan_location = format_location(get_value(data, 'location', "未设置"))
-    clan_language = get_value(data, 'chatLanguage.name', "未设置")
-    clan_frequency = translate_frequency(get_value(data, 'warFrequency'))
-    clan_log_public = format_bool(get_value(data, 'isWarLogPublic'), "公开", "不公开")
-    clan_win_streak = get_value(data, 'warWinStreak')
-    clan_wins = get_value(data, 'warWins')
-    clan_ties = get_value(data, 'warTies')
-    clan_losses = get_value(data, 'warLosses')
-    clan_type = translate_type(get_value(data, 'type'))
-    clan_req_th = get_value(data, 'requiredTownhallLevel', '无')
-    clan_req_trophies = get_value(data, 'requiredTrophies', '无')
-    clan_req_builder_trophies = get_value(data, 'requiredBuilderBaseTrophies', '无')
-    clan_family_friendly = format_bool(get_value(data, 'isFamilyFriendly'))
-    clan_description = get_value(data, 'description', '').replace('\n', '<br>') # 替换换行符
-    member_list = get_value(data, 'memberList', [])
-    
-    # 奖杯数据
-    clan_points = get_value(data, 'clanPoints', 0)
-    clan_builder_points = get_value(data, 'clanBuilderBasePoints', 0)
-    clan_capital_points = get_value(data, 'clanCapitalPoints', 0)
-
-    # --- CSS 样式 ---
-    css = """
+# --- HTML 模板（导入时编译一次） ---
+CLAN_INFO_CSS = """
     body {
         font-family: 'HarmonyOS Sans SC', Tahoma, Geneva, Verdana, sans-serif;
         background-color: #f0f2f5;
@@ -900,8 +884,7 @@ def generate_html(data):
     }
     """
 
-    # --- HTML 结构 ---
-    html_content = f"""
+PAGE_TEMPLATE = Template("""
     <!DOCTYPE html>
     <html lang="zh-CN">
     <head>
@@ -962,38 +945,38 @@ def generate_html(data):
                                 <div class="clan-name-container">
                                     <h1>{clan_name}</h1>
                                     <img 
-                                        src="{get_resource_path('clan/family_friendly_' + ('yes' if clan_family_friendly == '是' else 'no') + '.png')}" 
-                                        alt="{'全年龄' if clan_family_friendly == '是' else '非全年龄'}" 
-                                        title="{'全年龄' if clan_family_friendly == '是' else '非全年龄'}"
+                                        src="{family_friendly_icon}" 
+                                        alt="{family_friendly_text}" 
+                                        title="{family_friendly_text}"
                                         class="family-friendly-icon">
                                 </div>
                                 <span class="tag">{clan_tag}</span>
                                 
                             </div>
                             <div class="labels">
-                                {''.join([f'<img src="{get_value(label, "iconUrls.small")}" alt="{get_value(label, "name")}">' for label in clan_labels])}
+                                {labels_html}
                             </div>
                         </div>
                     </div>
                     
                     <div class="trophy-showcase">
                         <div class="trophy-item">
-                            <img src="{get_resource_path('clan/clan_points.png')}" alt="主世界奖杯" class="trophy-icon">
+                            <img src="{clan_points_icon}" alt="主世界奖杯" class="trophy-icon">
                             <span class="trophy-count">{clan_points}</span>
                         </div>
                         <div class="trophy-item">
-                            <img src="{get_resource_path('clan/builder_points.png')}" alt="夜世界奖杯" class="trophy-icon">
+                            <img src="{builder_points_icon}" alt="夜世界奖杯" class="trophy-icon">
                             <span class="trophy-count">{clan_builder_points}</span>
                         </div>
                         <div class="trophy-item">
-                            <img src="{get_resource_path('clan/capital_points.png')}" alt="部落首都" class="trophy-icon">
+                            <img src="{capital_points_icon}" alt="部落首都" class="trophy-icon">
                             <span class="trophy-count">{clan_capital_points}</span>
                         </div>
                     </div>
                     
                     <div class="clan-description">
                         <strong>描述</strong>
-                        {clan_description if clan_description else '无'}
+                        {clan_description}
                     </div>
                 </div>
                 <div class="right-section">
@@ -1093,104 +1076,222 @@ def generate_html(data):
             </div>
 
             <div class="members-section">
-                <h2>成员列表</h2>
+                <h2>成员列表{page_label}</h2>
                 <div class="member-list">
-    """
+    {members_html}
+                </div>
+            </div>
+        </div>
+    </body>
+    </html>
+    """, css=CLAN_INFO_CSS)
 
-    # 添加成员列表
-    for member in sorted(member_list, key=lambda m: get_value(m, 'clanRank', 99)): # 按排名排序
-        rank = get_value(member, 'clanRank')
-        name = get_value(member, 'name')
-        tag = get_value(member, 'tag')
-        exp_level = get_value(member, 'expLevel')
-        th_level = get_value(member, 'townHallLevel')
-        trophies = get_value(member, 'trophies')
-        league_icon = get_value(member, 'league.iconUrls.tiny', '') # 使用 tiny 图标
-        role = get_value(member, 'role', '')
-        role_display = translate_role(role)
-        
-        # 获取角色对应的CSS类
-        role_class = get_role_class(role)
+# 分页时第 2 页起只显示成员列表
+MEMBER_PAGE_TEMPLATE = Template("""
+    <!DOCTYPE html>
+    <html lang="zh-CN">
+    <head>
+        <meta charset="UTF-8">
+        <meta name="viewport" content="width=device-width, initial-scale=1.0">
+        <title>部落信息: {clan_name}</title>
+        <style>{css}</style>
+    </head>
+    <body>
+        <div class="container">
+            <div class="members-section">
+                <h2>{clan_name} 成员列表{page_label}</h2>
+                <div class="member-list">
+    {members_html}
+                </div>
+            </div>
+        </div>
+    </body>
+    </html>
+    """, css=CLAN_INFO_CSS)
 
-        html_content += f"""
+MEMBER_CARD_TEMPLATE = Template("""
                     <div class="member-card {role_class}">
                         <div class="member-header">
                             <div class="member-info-container">
                                 <div class="rank-display">{rank}</div>
-                                <img class="th_icon" src = "{get_resource_path('member/' + str(th_level) + '.png')}">
+                                <img class="th_icon" src = "{th_icon}">
                                 <div class="member-name">{name}</div>
                             </div>
-                            {f'<span class="role {role_class}">{role_display}</span>' if role.lower() != "member" else ''}
+                            {role_badge}
                         </div>
                         <div class="details">
                             <div class="left-details">
                                 <div class="exp-level">
-                                    <img class="exp-icon" src="{get_resource_path('member/exp.png')}">
+                                    <img class="exp-icon" src="{exp_icon}">
                                     <span class="exp-level-text">{exp_level}</span>
                                 </div>
                                 <div class="member-tag">{tag}</div>
                             </div>
                             <div class="right-details">
                                 <span class="trophies">
-                                    {f'<img src="{league_icon}" alt="奖杯图标">' if league_icon else ''}
+                                    {league_icon_html}
                                     {trophies}
                                 </span>
                             </div>
                         </div>
                     </div>
-        """
+        """)
 
-    html_content += """
-                </div>
-            </div>
-        </div>
-    </body>
-    </html>
+# --- HTML 生成 ---
+def render_member_cards(member_list):
+    """渲染已按排名排序的成员卡片"""
+    member_cards = []
+    for member in member_list:
+        rank = get_value(member, 'clanRank')
+        name = get_value(member, 'name')
+        tag = get_value(member, 'tag')
+        exp_level = get_value(member, 'expLevel')
+        th_level = get_value(member, 'townHallLevel')
+        trophies = get_value(member, 'trophies')
+        league_icon = get_value(member, 'league.iconUrls.tiny', '') # 使用 tiny 图标
+        role = get_value(member, 'role', '')
+        role_display = translate_role(role)
+        
+        # 获取角色对应的CSS类
+        role_class = get_role_class(role)
+
+        member_cards.append(MEMBER_CARD_TEMPLATE.render(
+            role_class=role_class,
+            rank=rank,
+            th_icon=get_resource_path('member/' + str(th_level) + '.png'),
+            name=name,
+            role_badge=f'<span class="role {role_class}">{role_display}</span>' if role.lower() != "member" else '',
+            exp_icon=get_resource_path('member/exp.png'),
+            exp_level=exp_level,
+            tag=tag,
+            league_icon_html=f'<img src="{league_icon}" alt="奖杯图标">' if league_icon else '',
+            trophies=trophies,
+        ))
+    return "".join(member_cards)
+
+def generate_html(data, tile=None):
     """
-    return html_content
+    根据部落数据生成 HTML 字符串
+
+    Args:
+        data: 部落数据
+        tile: 分页时本页的成员范围（tiling.Tile），为None时渲染全部成员；第 2 页起只显示成员列表
 
-def generate_clan_info_image(data, output_path=None):
+    Returns:
+        HTML 字符串
+    """
+    member_list = sorted(get_value(data, 'memberList', []), key=lambda m: get_value(m, 'clanRank', 99)) # 按排名排序
+    page_label = ''
+    if tile is not None:
+        member_list = tile.slice(member_list)
+        page_label = f' {tile.label}'
+        if tile.index > 0:
+            return MEMBER_PAGE_TEMPLATE.render(
+                clan_name=get_value(data, 'name'),
+                page_label=page_label,
+                members_html=render_member_cards(member_list),
+            )
+
+    clan_name = get_value(data, 'name')
+    clan_tag = get_value(data, 'tag')
+    clan_badge_url = get_value(data, 'badgeUrls.large')
+    clan_labels = get_value(data, 'labels', [])
+    clan_members_count = get_value(data, 'members')
+    clan_league = translate_league(get_value(data, 'warLeague.name'))
+    clan_location = format_location(get_value(data, 'location', "未设置"))
+    clan_language = get_value(data, 'chatLanguage.name', "未设置")
+    clan_frequency = translate_frequency(get_value(data, 'warFrequency'))
+    clan_log_public = format_bool(get_value(data, 'isWarLogPublic'), "公开", "不公开")
+    clan_win_streak = get_value(data, 'warWinStreak')
+    clan_wins = get_value(data, 'warWins')
+    clan_ties = get_value(data, 'warTies')
+    clan_losses = get_value(data, 'warLosses')
+    clan_type = translate_type(get_value(data, 'type'))
+    clan_req_th = get_value(data, 'requiredTownhallLevel', '无')
+    clan_req_trophies = get_value(data, 'requiredTrophies', '无')
+    clan_req_builder_trophies = get_value(data, 'requiredBuilderBaseTrophies', '无')
+    clan_family_friendly = format_bool(get_value(data, 'isFamilyFriendly'))
+    clan_description = get_value(data, 'description', '').replace('\n', '<br>') # 替换换行符
+    
+    # 奖杯数据
+    clan_points = get_value(data, 'clanPoints', 0)
+    clan_builder_points = get_value(data, 'clanBuilderBasePoints', 0)
+    clan_capital_points = get_value(data, 'clanCapitalPoints', 0)
+
+    family_friendly = clan_family_friendly == '是'
+    return PAGE_TEMPLATE.render(
+        clan_name=clan_name,
+        clan_tag=clan_tag,
+        clan_badge_url=clan_badge_url,
+        family_friendly_icon=get_resource_path('clan/family_friendly_' + ('yes' if family_friendly else 'no') + '.png'),
+        family_friendly_text='全年龄' if family_friendly else '非全年龄',
+        labels_html=''.join([f'<img src="{get_value(label, "iconUrls.small")}" alt="{get_value(label, "name")}">' for label in clan_labels]),
+        clan_points_icon=get_resource_path('clan/clan_points.png'),
+        builder_points_icon=get_resource_path('clan/builder_points.png'),
+        capital_points_icon=get_resource_path('clan/capital_points.png'),
+        clan_points=clan_points,
+        clan_builder_points=clan_builder_points,
+        clan_capital_points=clan_capital_points,
+        clan_description=clan_description if clan_description else '无',
+        clan_location=clan_location,
+        clan_language=clan_language,
+        clan_league=clan_league,
+        clan_members_count=clan_members_count,
+        clan_frequency=clan_frequency,
+        clan_log_public=clan_log_public,
+        clan_win_streak=clan_win_streak,
+        clan_wins=clan_wins,
+        clan_ties=clan_ties,
+        clan_losses=clan_losses,
+        clan_type=clan_type,
+        clan_req_th=clan_req_th,
+        clan_req_trophies=clan_req_trophies,
+        clan_req_builder_trophies=clan_req_builder_trophies,
+        page_label=page_label,
+        # 添加成员列表（每个成员渲染为一个片段，最后一次性拼接）
+        members_html=render_member_cards(member_list),
+    )
+
+def estimate_content_height(member_count, header=True):
+    """按成员数预估页面内容高度（header 为 False 时为只有成员列表的分页）"""
+    rows_height = -(-member_count // LAYOUT_MEMBER_COLUMNS) * LAYOUT_MEMBER_ROW_HEIGHT
+    return (LAYOUT_HEADER_HEIGHT if header else LAYOUT_MEMBERS_TITLE_HEIGHT) + rows_height
+
+def generate_clan_info_image(data, output_path=None, page=None, tile=None):
     """
     生成部落信息图片
     
     Args:
         data: 部落数据字典
         output_path: 输出图片路径，如果为None则使用默认路径
+        page: 浏览器池提供的页面，如果为None则临时启动浏览器
+        tile: 分页时本页的成员范围（tiling.Tile），为None时渲染全部成员
         
     Returns:
         生成的图片路径
     """
-    # 生成HTML内容
-    html_content = generate_html(data)
-    
-    # 创建临时HTML文件
-    temp_html_path = Path('temp_clan.html')
-    with open(temp_html_path, 'w', encoding='utf-8') as f:
-        f.write(html_content)
+    if page is None:
+        with standalone_page() as page:
+            return generate_clan_info_image(data, output_path, page, tile)
+
+    timer = PhaseTimer('clan_info')
+    # 生成HTML内容，远程图片改写为本地存储的 data URI
+    with timer.phase('html'):
+        html_content = get_asset_store().rewrite_html(generate_html(data, tile))
     
     # 如果未指定输出路径，使用默认路径
     if output_path is None:
         output_path = Path('clan_info.png')
+
+    if tile is not None:
+        height = estimate_content_height(tile.stop - tile.start, header=tile.index == 0)
+    else:
+        height = estimate_content_height(len(get_value(data, 'memberList', [])))
     
-    # 使用Playwright截图
-    with sync_playwright() as p:
-        browser = p.chromium.launch()
-        page = browser.new_page(viewport={"width": 740, "height": 600})
-        page.goto(f'file://{temp_html_path.absolute()}')
-        
-        # 等待页面加载完成
-        page.wait_for_load_state('networkidle')
-        
-        # 获取内容区域
-        container = page.locator('.container')
-        
-        # 截取内容区域
-        container.screenshot(path=output_path)
-        
-        browser.close()
-    
-    # 删除临时HTML文件
-    temp_html_path.unlink()
+    # 视口按预估的内容高度只设置一次，等待字体和图片加载完成后截取一次内容区域
+    # （HTML 和本地图标直接从内存提供，不写临时文件）
+    capture_html(page, html_content, output_path, '.container', VIEWPORT_WIDTH, height, PAGE_READY, timer)
+    timer.finish()
     
     return output_path
 
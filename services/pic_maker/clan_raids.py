@@ -1,7 +1,8 @@
 import json
+import math
 import os
-import base64 # 添加 base64 模块
-from playwright.sync_api import sync_playwright
+from .render_pool import standalone_page, capture_html, PhaseTimer
+from .sprites import sprite_data_uri
 from pathlib import Path # Import Path
 
 # --- 配置 ---
@@ -30,32 +31,19 @@ def get_resource_path(filename):
         return f"file://{PIC_SRC_DIR}/default.png"
     return f"file://{resource_path.absolute()}"
 
-# --- 图片转 Base64 编码函数 ---
-def _image_to_base64(image_path: Path) -> str | None:
-    """将图片文件读取并转换为 Base64 data URI 格式"""
-    if not image_path.is_file():
-        print(f"警告: 图片文件不存在 - {image_path}")
-        return None
-    try:
-        with open(image_path, "rb") as image_file:
-            encoded_string = base64.b64encode(image_file.read()).decode('utf-8')
-        # 根据文件扩展名确定 MIME 类型
-        mime_type = "image/png"  # 默认使用 PNG
-        if image_path.suffix.lower() == '.jpg' or image_path.suffix.lower() == '.jpeg':
-            mime_type = "image/jpeg"
-        elif image_path.suffix.lower() == '.gif':
-            mime_type = "image/gif"
-        elif image_path.suffix.lower() == '.svg':
-            mime_type = "image/svg+xml"
-        return f"data:{mime_type};base64,{encoded_string}"
-    except Exception as e:
-        print(f"编码图片 {image_path} 时出错: {e}")
-        return None
+# 截图前需要满足的页面就绪条件（图标为 CSS 背景图，随样式表一起解码）
+PAGE_READY = ('fonts',)
+
+# 页面布局（与下方 CSS 对应，单位为像素），用于按成员数预估内容高度
+VIEWPORT_WIDTH = 850
+LAYOUT_COLUMNS = 5
+LAYOUT_CARD_HEIGHT = 87
+LAYOUT_GAP = 15
+# 页面边距、容器内边距、标题及成员列表上边距
+LAYOUT_CHROME_HEIGHT = 20 + 20 + 18 + 33 + 10 + 2 + 20 + 15 + 20 + 20
 
-# 预先加载并编码图片
-BONUS_RAID_BASE64 = _image_to_base64(BONUS_RAID_IMG_PATH)
-NOBONUS_RAID_BASE64 = _image_to_base64(NOBONUS_RAID_IMG_PATH)
-CAPITAL_RESOURCE_BASE64 = _image_to_base64(CAPITAL_RESOURCE_IMG_PATH)
+# 图片缺失时的占位图
+EMPTY_IMG = "data:image/svg+xml,%3Csvg xmlns='http://www.w3.org/2000/svg'%3E%3C/svg%3E"
 
 # --- HTML 模板 ---
 HTML_TEMPLATE = """
@@ -178,10 +166,23 @@ HTML_TEMPLATE = """
             white-space: nowrap;
         }}
         .stat-icon {{
+            display: inline-block;
             width: 14px; /* 减小图标尺寸 */
             height: 14px;
             margin-left: 4px;
             vertical-align: middle;
+            background-size: 100% 100%;
+            background-repeat: no-repeat;
+        }}
+        /* 每个图标的图片数据只在这里出现一次，卡片中通过类名引用 */
+        .icon-bonus-raid {{
+            background-image: url("{bonus_raid_img}");
+        }}
+        .icon-nobonus-raid {{
+            background-image: url("{nobonus_raid_img}");
+        }}
+        .icon-capital-resource {{
+            background-image: url("{capital_resource_img}");
         }}
         .zero-attack {{
             opacity: 0.8;
@@ -194,7 +195,7 @@ HTML_TEMPLATE = """
 </head>
 <body>
     <div id="container">
-        <h1>突袭详情</h1>
+        <h1>{title}</h1>
         <div id="member-list">
             {member_cards}
         </div>
@@ -211,11 +212,11 @@ CARD_TEMPLATE = """
         <div class="member-stats-row">
             <div class="stat-item">
                 <span>{attacks}/{max_attacks}</span>
-                <img src="{attack_icon_b64}" alt="攻击" class="stat-icon">
+                <span class="stat-icon {attack_icon_class}" role="img" aria-label="攻击"></span>
             </div>
             <div class="stat-item">
                 <span>{loot}</span>
-                <img src="{capital_resource_b64}" alt="紫币" class="stat-icon">
+                <span class="stat-icon icon-capital-resource" role="img" aria-label="紫币"></span>
             </div>
         </div>
     </div>
@@ -378,16 +379,17 @@ def get_incomplete_raid_attackers_tags(data):
         return []
 
 # --- HTML 生成函数 ---
-def generate_clan_raids_html(members):
-    """根据成员数据生成 HTML 卡片"""
+def generate_clan_raids_html(members, rank=1, title="突袭详情"):
+    """
+    根据成员数据生成 HTML 卡片
+
+    参数:
+        members: 排序后的成员数据
+        rank: 第一个成员的排名（分页时为本页在完整列表中的起始排名）
+        title: 页面标题
+    """
     member_cards = ""
-    rank = 1
     
-    # 检查 Base64 图像数据是否成功加载
-    bonus_raid_img = BONUS_RAID_BASE64 or "data:image/svg+xml,%3Csvg xmlns='http://www.w3.org/2000/svg'%3E%3C/svg%3E"
-    nobonus_raid_img = NOBONUS_RAID_BASE64 or "data:image/svg+xml,%3Csvg xmlns='http://www.w3.org/2000/svg'%3E%3C/svg%3E"
-    capital_resource_img = CAPITAL_RESOURCE_BASE64 or "data:image/svg+xml,%3Csvg xmlns='http://www.w3.org/2000/svg'%3E%3C/svg%3E"
-
     for member in members:
         attacks = member.get('attacks', 0)
         max_attacks = member.get('max_attacks', 6)
@@ -411,7 +413,7 @@ def generate_clan_raids_html(members):
         elif rank == 3: rank_class = "top3"
 
         # 根据 max_attacks 选择正确的图标
-        attack_icon_b64 = bonus_raid_img if max_attacks == 6 else nobonus_raid_img
+        attack_icon_class = "icon-bonus-raid" if max_attacks == 6 else "icon-nobonus-raid"
 
         member_cards += CARD_TEMPLATE.format(
             rank=rank,
@@ -421,67 +423,73 @@ def generate_clan_raids_html(members):
             loot=f"{loot}",
             card_class=card_class,
             rank_class=rank_class,
-            attack_icon_b64=attack_icon_b64,
-            capital_resource_b64=capital_resource_img
+            attack_icon_class=attack_icon_class
         )
         rank += 1
-    return HTML_TEMPLATE.format(member_cards=member_cards)
+    # 图片的 data URI 来自共享的图标缓存（只编码一次，文件修改后自动重新加载）
+    return HTML_TEMPLATE.format(
+        title=title,
+        member_cards=member_cards,
+        bonus_raid_img=sprite_data_uri(BONUS_RAID_IMG_PATH, EMPTY_IMG),
+        nobonus_raid_img=sprite_data_uri(NOBONUS_RAID_IMG_PATH, EMPTY_IMG),
+        capital_resource_img=sprite_data_uri(CAPITAL_RESOURCE_IMG_PATH, EMPTY_IMG),
+    )
 
 # --- Playwright 截图函数 ---
-def generate_clan_raids_image(json_data, output_path):
+def generate_clan_raids_image(json_data, output_path, page=None, tile=None):
     """
     直接从JSON数据生成部落突袭详情图片
     
     参数:
         json_data: JSON数据（字典格式），包含部落及突袭信息
         output_path: 输出图片路径
+        page: 浏览器池提供的页面，为None时临时启动浏览器
+        tile: 分页时本页的成员范围（tiling.Tile），为None时渲染全部成员
     
     返回:
         成功时返回输出路径，失败时返回None
     """
     try:
-        # 1. 处理数据
-        sorted_members, _ = process_raid_data(json_data)
-        if not sorted_members:
-            print("未能处理成员数据。")
-            return None
-            
-        # 2. 生成 HTML
-        html_content = generate_clan_raids_html(sorted_members)
+        timer = PhaseTimer('clan_raids')
+        with timer.phase('html'):
+            # 1. 处理数据
+            sorted_members, _ = process_raid_data(json_data)
+            if not sorted_members:
+                print("未能处理成员数据。")
+                return None
+                
+            # 2. 生成 HTML（分页时只渲染本页的成员，排名接续完整列表）
+            if tile is not None:
+                sorted_members = tile.slice(sorted_members)
+                html_content = generate_clan_raids_html(sorted_members, tile.start + 1, f"突袭详情 {tile.label}")
+            else:
+                html_content = generate_clan_raids_html(sorted_members)
         
         # 3. 使用 Playwright 截图
-        with sync_playwright() as p:
-            browser = p.chromium.launch()
-            page = browser.new_page()
-            # 减小视口宽度，适合手机观看
-            page.set_viewport_size({"width": 850, "height": 1000})
-            page.set_content(html_content)
-
-            # 定位到包含内容的容器
-            container = page.locator('#container')
-            if not container.is_visible():
-                print("错误：无法找到 #container 元素或元素不可见。")
-                browser.close()
-                return None
-
-            # 动态调整高度以适应内容
-            bounding_box = container.bounding_box()
-            if bounding_box:
-                # 增加一点额外的padding
-                new_height = bounding_box['height'] + 50
-                # 检查高度是否合理，防止过大或过小
-                new_height = max(600, min(new_height, 8000)) # 设置最小和最大高度
-                page.set_viewport_size({"width": 850, "height": int(new_height)}) # 保持宽度一致
-
-            # 截取特定元素的截图
-            container.screenshot(path=output_path)
-            browser.close()
-            return output_path
+        height = estimate_content_height(len(sorted_members))
+        if page is None:
+            with standalone_page() as page:
+                return _screenshot_clan_raids(page, html_content, output_path, height, timer)
+        return _screenshot_clan_raids(page, html_content, output_path, height, timer)
             
     except Exception as e:
         print(f"生成突袭详情图片时出错: {e}")
         return None
 
+def estimate_content_height(member_count):
+    """按成员数预估页面内容高度（5 列成员卡片）"""
+    rows = max(1, math.ceil(member_count / LAYOUT_COLUMNS))
+    return LAYOUT_CHROME_HEIGHT + rows * LAYOUT_CARD_HEIGHT + (rows - 1) * LAYOUT_GAP
+
+
+def _screenshot_clan_raids(page, html_content, output_path, height, timer=None):
+    """在给定页面中加载 HTML 并截取突袭详情容器（视口按预估高度只设置一次，截图一次）"""
+    timer = timer or PhaseTimer('clan_raids')
+    # 减小视口宽度，适合手机观看
+    capture_html(page, html_content, output_path, '#container', VIEWPORT_WIDTH, height, PAGE_READY, timer)
+    timer.finish()
+    return output_path
+
 # --- 主函数 ---
 def main():
     # 1. 读取 JSON 文件
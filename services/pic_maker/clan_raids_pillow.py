@@ -0,0 +1,143 @@
+"""
+部落突袭详情图片的 Pillow 渲染器
+
+与 clan_raids.py 的 HTML 版本布局一致（5 列成员卡片），不需要浏览器。
+"""
+import math
+from typing import Optional
+
+from PIL import Image, ImageDraw
+
+from .clan_raids import process_raid_data, BONUS_RAID_IMG_PATH, NOBONUS_RAID_IMG_PATH, CAPITAL_RESOURCE_IMG_PATH
+from .pillow_engine import get_font, load_icon, rounded_box, blend, hex_color, text_width, fit_text, paste, save_png
+
+# --- 布局（与 HTML 版本的 CSS 对应，单位为像素） ---
+PAGE_BG = hex_color('#f0f2f5')
+CONTAINER_WIDTH = 770
+CONTAINER_PADDING = 20
+CONTAINER_RADIUS = 12
+TITLE_SIZE = 27
+TITLE_TOP = 18
+TITLE_LINE = 33
+TITLE_PADDING_BOTTOM = 10
+TITLE_BORDER = 2
+TITLE_MARGIN_BOTTOM = 20
+COLUMNS = 5
+GAP = 15
+CARD_HEIGHT = 87
+CARD_RADIUS = 8
+CARD_PADDING = 10
+TEXT_SIZE = 13.6
+NAME_TOP = CARD_PADDING + 1 + 15
+NAME_LINE = 17
+STATS_TOP = NAME_TOP + NAME_LINE + 8 + 4
+ICON_SIZE = 14
+BADGE_TEXT_SIZE = 12.8
+
+# 卡片底色和边框（CSS 中的半透明颜色与白色背景混合）
+CARD_STYLES = {
+    'full': (blend((200, 250, 200, 0.4)), blend((76, 175, 80, 0.5))),
+    'partial': (blend((255, 243, 200, 0.4)), blend((255, 193, 7, 0.5))),
+    'zero': (blend((255, 200, 200, 0.4)), blend((239, 83, 80, 0.5))),
+}
+RANK_COLORS = {1: hex_color('#e74c3c'), 2: hex_color('#f39c12'), 3: hex_color('#f1c40f')}
+DEFAULT_RANK_COLOR = hex_color('#3498db')
+NAME_COLOR = hex_color('#333333')
+STATS_COLOR = hex_color('#555555')
+TITLE_COLOR = hex_color('#2c3e50')
+TITLE_BORDER_COLOR = hex_color('#e0e0e0')
+
+
+def _draw_card(member: dict, rank: int, card_width: int) -> Image.Image:
+    """绘制单个成员卡片"""
+    attacks = member.get('attacks', 0)
+    max_attacks = member.get('max_attacks', 6)
+    loot = member.get('capitalResourcesLooted', 0)
+
+    if attacks == 0:
+        style = 'zero'
+    elif attacks == max_attacks:
+        style = 'full'
+    else:
+        style = 'partial'
+    fill, outline = CARD_STYLES[style]
+
+    card = rounded_box((card_width, CARD_HEIGHT), CARD_RADIUS, fill, outline).copy()
+    draw = ImageDraw.Draw(card)
+
+    # 排名徽章（左上角，左上和右下为圆角）
+    badge_font = get_font(BADGE_TEXT_SIZE, bold=True)
+    badge_text = str(rank)
+    badge_size = (round(text_width(badge_font, badge_text)) + 16, round(BADGE_TEXT_SIZE) + 6)
+    badge = rounded_box(badge_size, CARD_RADIUS, RANK_COLORS.get(rank, DEFAULT_RANK_COLOR),
+                        corners=(True, False, True, False))
+    paste(card, badge, (0, 0))
+    draw.text((badge_size[0] / 2, badge_size[1] / 2), badge_text, font=badge_font, fill=(255, 255, 255), anchor='mm')
+
+    # 成员名称（超出宽度时显示省略号）
+    name_font = get_font(TEXT_SIZE, bold=True)
+    name = fit_text(member['name'], name_font, card_width - 2 * CARD_PADDING - 6)
+    draw.text((card_width / 2, NAME_TOP + NAME_LINE / 2), name, font=name_font, fill=NAME_COLOR, anchor='mm')
+
+    # 进攻次数和战利品
+    stats_font = get_font(TEXT_SIZE)
+    attack_icon = load_icon(str(BONUS_RAID_IMG_PATH if max_attacks == 6 else NOBONUS_RAID_IMG_PATH), ICON_SIZE)
+    loot_icon = load_icon(str(CAPITAL_RESOURCE_IMG_PATH), ICON_SIZE)
+    items = [(f"{attacks}/{max_attacks}", attack_icon), (f"{loot}", loot_icon)]
+    widths = [text_width(stats_font, text) + 4 + (icon.width if icon else 0) for text, icon in items]
+    x = (card_width - sum(widths) - 10) / 2
+    center_y = STATS_TOP + NAME_LINE / 2
+    for (text, icon), width in zip(items, widths):
+        draw.text((x, center_y), text, font=stats_font, fill=STATS_COLOR, anchor='lm')
+        if icon:
+            paste(card, icon, (x + width - icon.width, center_y - icon.height / 2))
+        x += width + 10
+
+    # 未进攻成员降低显示优先级（opacity: 0.8）
+    if attacks == 0 and loot == 0:
+        card.putalpha(card.getchannel('A').point(lambda value: value * 4 // 5))
+    return card
+
+
+def render_clan_raids_image(json_data: dict, output_path) -> Optional[str]:
+    """
+    使用 Pillow 生成部落突袭详情图片
+
+    Args:
+        json_data: 包含 raids 和 members 的数据
+        output_path: 输出图片路径
+
+    Returns:
+        成功时返回输出路径，成员数据为空时返回None
+    """
+    sorted_members, _ = process_raid_data(json_data)
+    if not sorted_members:
+        print("未能处理成员数据。")
+        return None
+
+    inner_width = CONTAINER_WIDTH - 2 * CONTAINER_PADDING
+    card_width = (inner_width - GAP * (COLUMNS - 1)) // COLUMNS
+    rows = math.ceil(len(sorted_members) / COLUMNS)
+    grid_top = CONTAINER_PADDING + TITLE_TOP + TITLE_LINE + TITLE_PADDING_BOTTOM + TITLE_BORDER + TITLE_MARGIN_BOTTOM
+    height = grid_top + rows * CARD_HEIGHT + (rows - 1) * GAP + CONTAINER_PADDING
+
+    canvas = Image.new('RGBA', (CONTAINER_WIDTH, height), PAGE_BG + (255,))
+    paste(canvas, rounded_box((CONTAINER_WIDTH, height), CONTAINER_RADIUS, (255, 255, 255)), (0, 0))
+    draw = ImageDraw.Draw(canvas)
+
+    # 标题及下划线
+    title_y = CONTAINER_PADDING + TITLE_TOP
+    draw.text((CONTAINER_WIDTH / 2, title_y + TITLE_LINE / 2), "突袭详情", font=get_font(TITLE_SIZE, bold=True),
+              fill=TITLE_COLOR, anchor='mm')
+    border_y = title_y + TITLE_LINE + TITLE_PADDING_BOTTOM
+    draw.rectangle((CONTAINER_PADDING, border_y, CONTAINER_WIDTH - CONTAINER_PADDING - 1, border_y + TITLE_BORDER - 1),
+                   fill=TITLE_BORDER_COLOR)
+
+    # 成员卡片
+    for index, member in enumerate(sorted_members):
+        row, column = divmod(index, COLUMNS)
+        x = CONTAINER_PADDING + column * (card_width + GAP)
+        y = grid_top + row * (CARD_HEIGHT + GAP)
+        paste(canvas, _draw_card(member, index + 1, card_width), (x, y))
+
+    return save_png(canvas, output_path)
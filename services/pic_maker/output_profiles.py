@@ -0,0 +1,148 @@
+"""
+输出图片的编码配置
+
+渲染器统一输出 PNG，生成后按模式对应的输出配置重新编码（调色板 PNG、JPEG、WebP）并限制最大尺寸，
+减小发送到微信的文件体积。配置项：
+    OUTPUT_PROFILE      默认输出配置（png / png8 / jpeg / webp）
+    OUTPUT_PROFILES     按模式指定输出配置，如 clan_info:png8,player_info:jpeg
+    OUTPUT_QUALITY      JPEG / WebP 的压缩质量
+    OUTPUT_MAX_WIDTH    最大宽度（像素），0 表示不限制
+    OUTPUT_MAX_HEIGHT   最大高度（像素），0 表示不限制
+
+浏览器截图的设备像素比由 RENDER_DEVICE_SCALE 配置。它在创建浏览器页面时设置，所有模式共用同一个值，
+不能按模式指定；需要减小个别模式的图片体积时在 OUTPUT_PROFILES 中为其指定输出配置。
+"""
+import os
+import logging
+from pathlib import Path
+from typing import Dict, NamedTuple, Union
+
+from PIL import Image
+
+logger = logging.getLogger('OutputProfile')
+
+# 影响输出图片的配置项（计入渲染结果缓存键）
+OUTPUT_OPTION_ENV = ('OUTPUT_PROFILE', 'OUTPUT_PROFILES', 'OUTPUT_QUALITY', 'OUTPUT_MAX_WIDTH', 'OUTPUT_MAX_HEIGHT',
+                     'RENDER_DEVICE_SCALE')
+
+
+class OutputProfile(NamedTuple):
+    """输出图片的编码方式"""
+    name: str
+    # Pillow 的图片格式：PNG / JPEG / WEBP
+    format: str
+    # 调色板颜色数（仅 PNG），0 表示保留真彩色
+    colors: int = 0
+    # 压缩质量（JPEG / WebP）
+    quality: int = 85
+    # 最大尺寸（像素），超出时等比缩小，0 表示不限制
+    max_width: int = 0
+    max_height: int = 0
+
+    @property
+    def extension(self) -> str:
+        """输出文件的扩展名"""
+        return FORMAT_EXTENSIONS[self.format]
+
+    @property
+    def is_passthrough(self) -> bool:
+        """是否直接使用渲染器输出的 PNG，不重新编码"""
+        return self.format == 'PNG' and not self.colors and not self.max_width and not self.max_height
+
+
+FORMAT_EXTENSIONS = {'PNG': '.png', 'JPEG': '.jpg', 'WEBP': '.webp'}
+
+# 可选的输出配置
+PROFILES: Dict[str, OutputProfile] = {
+    # 渲染器原始输出（无损真彩色）
+    'png': OutputProfile('png', 'PNG'),
+    # 256 色调色板 PNG：界面类图片（纯色卡片、文字）几乎无损，体积约为原来的 1/4
+    'png8': OutputProfile('png8', 'PNG', colors=256),
+    # 高质量 JPEG：适合渐变、图标较多的大图
+    'jpeg': OutputProfile('jpeg', 'JPEG'),
+    'webp': OutputProfile('webp', 'WEBP'),
+}
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return int(os.getenv(name, default))
+    except ValueError:
+        logger.warning(f"配置 {name} 不是有效的整数，使用默认值 {default}")
+        return default
+
+
+def get_output_profile(mode: str) -> OutputProfile:
+    """
+    获取模式对应的输出配置
+
+    Args:
+        mode: 图片模式
+
+    Returns:
+        输出配置，未配置或配置无效时为原始 PNG
+    """
+    name = os.getenv('OUTPUT_PROFILE', 'png').strip() or 'png'
+    for entry in os.getenv('OUTPUT_PROFILES', '').split(','):
+        entry_mode, _, entry_name = entry.partition(':')
+        if entry_mode.strip() == mode and entry_name.strip():
+            name = entry_name.strip()
+
+    profile = PROFILES.get(name)
+    if profile is None:
+        logger.warning(f"未知的输出配置: {name}，使用 png")
+        profile = PROFILES['png']
+    return profile._replace(
+        quality=_env_int('OUTPUT_QUALITY', profile.quality),
+        max_width=_env_int('OUTPUT_MAX_WIDTH', profile.max_width),
+        max_height=_env_int('OUTPUT_MAX_HEIGHT', profile.max_height),
+    )
+
+
+def encode_image(image: Image.Image, profile: OutputProfile, output_path: Union[str, Path]) -> None:
+    """
+    按输出配置缩放并编码图片
+
+    Args:
+        image: 待编码的图片
+        profile: 输出配置
+        output_path: 输出文件路径
+    """
+    image = image.convert('RGB')
+    if profile.max_width or profile.max_height:
+        bounds = (profile.max_width or image.width, profile.max_height or image.height)
+        if image.width > bounds[0] or image.height > bounds[1]:
+            image.thumbnail(bounds, Image.LANCZOS)
+
+    if profile.format == 'PNG':
+        if profile.colors:
+            image = image.quantize(profile.colors, method=Image.Quantize.FASTOCTREE)
+        image.save(output_path, format='PNG', optimize=True)
+    elif profile.format == 'JPEG':
+        image.save(output_path, format='JPEG', quality=profile.quality, optimize=True, progressive=True)
+    else:
+        image.save(output_path, format=profile.format, quality=profile.quality)
+
+
+def apply_output_profile(path: Union[str, Path], profile: OutputProfile) -> str:
+    """
+    将渲染器输出的 PNG 按输出配置重新编码，扩展名随格式变化时替换原文件
+
+    Args:
+        path: 渲染器输出的图片路径
+        profile: 输出配置
+
+    Returns:
+        最终图片路径
+    """
+    path = Path(path)
+    if profile.is_passthrough:
+        return str(path)
+
+    output_path = path.with_suffix(profile.extension)
+    with Image.open(path) as image:
+        image.load()
+    encode_image(image, profile, output_path)
+    if output_path != path:
+        path.unlink(missing_ok=True)
+    return str(output_path)
@@ -0,0 +1,169 @@
+import os
+import logging
+from pathlib import Path
+from functools import lru_cache
+from typing import Optional, Sequence, Set, Tuple
+
+from PIL import Image, ImageDraw, ImageFont
+
+logger = logging.getLogger('PillowEngine')
+
+# 中文字体候选路径（依次尝试），可通过环境变量 PIL_FONT_PATH / PIL_FONT_BOLD_PATH 指定
+FONT_CANDIDATES = {
+    'regular': (
+        "C:/Windows/Fonts/msyh.ttc",
+        "/usr/share/fonts/opentype/noto/NotoSansCJK-Regular.ttc",
+        "/usr/share/fonts/noto-cjk/NotoSansCJK-Regular.ttc",
+        "/System/Library/Fonts/PingFang.ttc",
+    ),
+    'bold': (
+        "C:/Windows/Fonts/msyhbd.ttc",
+        "/usr/share/fonts/opentype/noto/NotoSansCJK-Bold.ttc",
+        "/usr/share/fonts/noto-cjk/NotoSansCJK-Bold.ttc",
+        "/System/Library/Fonts/PingFang.ttc",
+    ),
+}
+
+# 提供 Pillow 渲染器的模式
+PILLOW_MODES = ('clan_raids', 'player_warhits')
+
+Color = Tuple[int, ...]
+
+
+@lru_cache(maxsize=None)
+def font_path(bold: bool = False) -> Optional[str]:
+    """
+    查找可用的字体文件
+
+    Args:
+        bold: 是否查找粗体，找不到粗体时使用常规字体
+
+    Returns:
+        字体文件路径，找不到时返回None
+    """
+    env_path = os.getenv('PIL_FONT_BOLD_PATH' if bold else 'PIL_FONT_PATH')
+    candidates = ([env_path] if env_path else []) + list(FONT_CANDIDATES['bold' if bold else 'regular'])
+    for candidate in candidates:
+        if candidate and Path(candidate).is_file():
+            return candidate
+    if bold:
+        return font_path(False)
+    logger.warning("未找到中文字体，请通过 PIL_FONT_PATH 指定字体文件")
+    return None
+
+
+@lru_cache(maxsize=None)
+def cjk_font_available() -> bool:
+    """是否找到了中文字体（ImageFont.load_default 的字体无法绘制中文）"""
+    if font_path() is None:
+        logger.warning("未找到中文字体，PILLOW_RENDER_MODES 中的模式改用浏览器渲染")
+        return False
+    return True
+
+
+def pillow_render_modes() -> Set[str]:
+    """
+    使用 Pillow 直接绘制的模式：PILLOW_RENDER_MODES 中配置的、提供 Pillow 渲染器的模式
+
+    Returns:
+        模式集合；找不到中文字体时为空集合，全部模式改用浏览器渲染
+    """
+    modes = {mode.strip() for mode in os.getenv('PILLOW_RENDER_MODES', '').split(',') if mode.strip()}
+    modes &= set(PILLOW_MODES)
+    if modes and not cjk_font_available():
+        return set()
+    return modes
+
+
+@lru_cache(maxsize=64)
+def get_font(size: float, bold: bool = False) -> ImageFont.FreeTypeFont:
+    """获取指定字号的字体（按字号缓存，只加载一次）"""
+    path = font_path(bold)
+    if path is None:
+        return ImageFont.load_default(size)
+    return ImageFont.truetype(path, round(size))
+
+
+@lru_cache(maxsize=64)
+def load_icon(path: str, height: int) -> Optional[Image.Image]:
+    """
+    加载并按高度缩放图标（解码后的图标按尺寸缓存）
+
+    Returns:
+        RGBA 图标，文件不存在时返回None
+    """
+    if not Path(path).is_file():
+        logger.warning(f"图标文件不存在: {path}")
+        return None
+    with Image.open(path) as image:
+        image = image.convert('RGBA')
+        width = max(1, round(image.width * height / image.height))
+        return image.resize((width, height), Image.LANCZOS)
+
+
+@lru_cache(maxsize=256)
+def rounded_box(size: Tuple[int, int], radius: int, fill: Color, outline: Optional[Color] = None,
+                width: int = 1, corners: Optional[Tuple[bool, bool, bool, bool]] = None) -> Image.Image:
+    """
+    绘制圆角矩形（相同尺寸和样式的卡片只绘制一次）
+
+    Args:
+        size: (宽, 高)
+        radius: 圆角半径
+        fill: 填充色
+        outline: 边框颜色
+        width: 边框宽度
+        corners: 哪些角为圆角 (左上, 右上, 右下, 左下)，默认全部
+    """
+    image = Image.new('RGBA', size, (0, 0, 0, 0))
+    draw = ImageDraw.Draw(image)
+    draw.rounded_rectangle((0, 0, size[0] - 1, size[1] - 1), radius=radius, fill=fill,
+                           outline=outline, width=width if outline else 0, corners=corners)
+    return image
+
+
+def blend(color: Sequence[float], background: Color = (255, 255, 255)) -> Color:
+    """将 CSS 的 rgba 颜色与背景色混合为不透明颜色"""
+    r, g, b, a = color if len(color) == 4 else (*color, 1.0)
+    return tuple(round(c * a + bg * (1 - a)) for c, bg in zip((r, g, b), background))
+
+
+def hex_color(value: str) -> Color:
+    """'#rrggbb' 转换为 RGB 元组"""
+    value = value.lstrip('#')
+    return tuple(int(value[i:i + 2], 16) for i in (0, 2, 4))
+
+
+def text_width(font: ImageFont.FreeTypeFont, text: str) -> float:
+    """文字宽度（像素）"""
+    return font.getlength(text)
+
+
+def fit_text(text: str, font: ImageFont.FreeTypeFont, max_width: float) -> str:
+    """文字超出宽度时截断并添加省略号"""
+    if text_width(font, text) <= max_width:
+        return text
+    while text and text_width(font, text + "…") > max_width:
+        text = text[:-1]
+    return text + "…"
+
+
+def paste(canvas: Image.Image, image: Optional[Image.Image], xy: Tuple[float, float]) -> None:
+    """按透明度把图片贴到画布上"""
+    if image is not None:
+        canvas.alpha_composite(image, (round(xy[0]), round(xy[1])))
+
+
+def dashed_line(draw: ImageDraw.ImageDraw, start: Tuple[float, float], end_x: float, color: Color,
+                dash: int = 3, width: int = 1) -> None:
+    """绘制水平虚线"""
+    x, y = start
+    while x < end_x:
+        draw.line((x, y, min(x + dash - 1, end_x), y), fill=color, width=width)
+        x += dash * 2
+
+
+def save_png(canvas: Image.Image, output_path) -> str:
+    """保存为 PNG（去掉透明通道）"""
+    canvas.convert('RGB').save(output_path, format='PNG')
+    return str(output_path)
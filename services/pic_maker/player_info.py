@@ -1,18 +1,33 @@
 from pathlib import Path
-from playwright.sync_api import sync_playwright
-import base64
-import ssl
-from urllib.request import urlopen
+from .render_pool import standalone_page, capture_html, asset_url, PhaseTimer
+from .asset_store import get_asset_store
+from .templates import Template
 from io import BytesIO
 
-# 创建不验证SSL的context
-ssl_context = ssl.create_default_context()
-ssl_context.check_hostname = False
-ssl_context.verify_mode = ssl.CERT_NONE
-
 # 定义图标路径 - 使用项目相对路径
 PIC_SRC_DIR = Path(__file__).parent.parent.parent / "storage/pic_src"
 
+# 截图前需要满足的页面就绪条件
+PAGE_READY = ('fonts', 'images')
+
+# 页面宽度
+VIEWPORT_WIDTH = 1360
+
+# 预估内容高度用的布局尺寸（像素，与页面样式一致）
+# 容器内边距 + 顶部信息栏（含下边距）
+LAYOUT_HEADER_HEIGHT = 300
+# 每个分区的外边距、内边距及标题
+LAYOUT_SECTION_HEIGHT = 117
+# 英雄一行（含一行装备）及每多一行装备增加的高度
+LAYOUT_HERO_ROW_HEIGHT = 122
+LAYOUT_EQUIPMENT_ROW_HEIGHT = 87
+# 单位网格：每行列数、每行高度（含间距）及网格内边距
+LAYOUT_GRID_COLUMNS = 15
+LAYOUT_GRID_ROW_HEIGHT = 87
+LAYOUT_GRID_PADDING = 15
+# 最后一个分区的下边距 + 容器内边距
+LAYOUT_FOOTER_HEIGHT = 45
+
 # 职位对应列表
 role_map = {
     'coLeader': '副首领',
@@ -78,8 +93,8 @@ def calculate_completion(items):
     max_total = sum(item['maxLevel'] for item in items)
     return int((total / max_total) * 100) if max_total > 0 else 0
 
-# 创建HTML模板
-html_template = '''<!DOCTYPE html>
+# 创建HTML模板（导入时编译一次）
+html_template = Template('''<!DOCTYPE html>
 <html>
 <head>
     <meta charset="UTF-8">
@@ -620,7 +635,87 @@ html_template = '''<!DOCTYPE html>
         </div>
     </div>
 </body>
-</html>'''
+</html>''')
+
+# 英雄及其装备
+HERO_TEMPLATE = Template('''
+            <div class="{item_class}">
+                <div class="{icon_class}">
+                    <img src="{icon}" style="width:100%;height:100%;object-fit:contain;">
+                    <div class="hero-level">{level}</div>
+                </div>
+                <div class="hero-divider"></div>
+                <div class="equipment-grid">
+                    {equipment_html}
+                </div>
+            </div>
+            ''')
+
+EQUIPMENT_TEMPLATE = Template('''
+                    <div class="{item_class}">
+                        <img class="equipment-icon" src="{icon}">
+                        <div class="equipment-level">{level}</div>
+                    </div>
+                    ''')
+
+# 战宠、部队、法术和攻城机器
+UNIT_TEMPLATE = Template('''
+            <div class="{item_class}">
+                <div class="unit-icon {unit_class}">
+                    <img src="{icon}" style="width:100%;height:100%;object-fit:contain;">
+                    <div class="unit-level">{level}</div>
+                </div>
+            </div>
+            ''')
+
+
+def render_units(names, player_units_map, icon_dir, unit_class):
+    """
+    按固定顺序生成单位（战宠、部队、法术、攻城机器）的HTML片段
+
+    Args:
+        names: 单位名称列表（决定显示顺序）
+        player_units_map: 玩家拥有的单位，名称 -> 单位数据
+        icon_dir: 图标目录
+        unit_class: 图标的样式类（troop 或 spell）
+
+    Returns:
+        拼接后的HTML
+    """
+    items = []
+    for unit_name in names:
+        unit = player_units_map.get(unit_name)
+        icon = asset_url(f"{icon_dir}/{unit_name}.png")
+        if unit:
+            max_level_class = "max-level" if unit['level'] == unit['maxLevel'] else ""
+            items.append(UNIT_TEMPLATE.render(item_class=f"grid-item {max_level_class}", unit_class=unit_class,
+                                              icon=icon, level=unit['level']))
+        else:
+            # 未解锁的单位
+            items.append(UNIT_TEMPLATE.render(item_class="grid-item locked-item", unit_class=unit_class,
+                                              icon=icon, level="?"))
+    return "".join(items)
+
+
+def estimate_content_height():
+    """
+    按各分区显示的英雄、装备和单位数量预估页面内容高度
+
+    页面总是列出全部英雄、装备和单位（未解锁的显示为灰色），高度随这些列表变化，与玩家的进度无关。
+    """
+    height = LAYOUT_HEADER_HEIGHT + LAYOUT_FOOTER_HEIGHT
+    # 英雄分区：每个英雄一行，装备按每行 7 个排列
+    height += LAYOUT_SECTION_HEIGHT
+    for hero_name in hero_order:
+        equipment_rows = max(1, -(-len(hero_equipment_map.get(hero_name, [])) // 7))
+        height += LAYOUT_HERO_ROW_HEIGHT + (equipment_rows - 1) * LAYOUT_EQUIPMENT_ROW_HEIGHT
+
+    troop_names = [name for name in troop_list
+                   if name not in excluded_troops and name not in pet_list and name not in machine_list]
+    for names in (pet_list, troop_names, spell_list, machine_list):
+        rows = max(1, -(-len(names) // LAYOUT_GRID_COLUMNS))
+        height += LAYOUT_SECTION_HEIGHT + LAYOUT_GRID_PADDING + rows * LAYOUT_GRID_ROW_HEIGHT
+    return height
 
 
 def generate_player_info(data):
@@ -646,239 +741,89 @@ def generate_player_info(data):
     spells = data['spells']
     troops = data['troops']
     
+    # 并发获取标签、部落徽章和联赛图标（已存储的图片直接从本地读取）
+    label_urls = [label['iconUrls']['small'] for label in labels]
+    clan_badge_url = clan['badgeUrls']['small'] if 'clan' in data else None
+    league_icon_url = data['league']['iconUrls']['small'] if 'league' in data else None
+    icons = get_asset_store().data_uris(label_urls + [clan_badge_url, league_icon_url])
+
     # 生成标签HTML
-    labels_html = ""
-    for label in labels:
-        response = urlopen(label['iconUrls']['small'], context=ssl_context)
-        img_data = response.read()
-        img_base64 = base64.b64encode(img_data).decode('utf-8')
-        labels_html += f'<img class="label" src="data:image/png;base64,{img_base64}" alt="Label">'
+    labels_html = "".join(f'<img class="label" src="{icons[url]}" alt="Label">' for url in label_urls if icons.get(url))
 
     # 获取部落徽章
-    if 'clan' in data:
-        response = urlopen(clan['badgeUrls']['small'], context=ssl_context)
-        clan_badge_data = response.read()
-        clan_badge = f"data:image/png;base64,{base64.b64encode(clan_badge_data).decode('utf-8')}"
-    else:
-        clan_badge = PIC_SRC_DIR / "default/noClan.png"
+    clan_badge = icons.get(clan_badge_url) or asset_url("default/noClan.png")
 
     # 获取奖杯图标
-    if 'league' in data:
-        response = urlopen(data['league']['iconUrls']['small'], context=ssl_context)
-        trophy_icon_data = response.read()
-        trophy_icon = f"data:image/png;base64,{base64.b64encode(trophy_icon_data).decode('utf-8')}"
-    else:
-        trophy_icon = PIC_SRC_DIR / "default/noLeague.png"
+    trophy_icon = icons.get(league_icon_url) or asset_url("default/noLeague.png")
         
     # 获取经验等级和大本营图标
-    exp_icon = PIC_SRC_DIR / "member/exp.png"
-    town_hall_icon = PIC_SRC_DIR / f"member/{town_hall_level}.png"
+    exp_icon = asset_url("member/exp.png")
+    town_hall_icon = asset_url(f"member/{town_hall_level}.png")
 
-    # 生成英雄HTML
-    heroes_html = ""
+    # 生成英雄HTML（片段先放入列表，最后一次性拼接）
+    hero_items = []
     player_heroes_map = {hero['name']: hero for hero in heroes if hero['village'] == 'home'}
+    player_equipment_map = {eq.get('name'): eq for eq in hero_equipment if eq.get('village') == 'home'}
 
     for hero_name in hero_order:
         # 查找匹配的英雄
         matched_hero = player_heroes_map.get(hero_name)
-        hero_icon_path = PIC_SRC_DIR / f"heroes/{hero_name}.png"
+        hero_icon_path = asset_url(f"heroes/{hero_name}.png")
+
+        # 生成装备HTML，未解锁英雄的装备全部显示为未解锁
+        equipment_items = []
+        for eq_name in hero_equipment_map.get(hero_name, []):
+            matched_equipment = player_equipment_map.get(eq_name) if matched_hero else None
+            eq_icon_path = asset_url(f"equipments/{eq_name}.png")
+
+            if matched_equipment:
+                eq_max_level_class = "max-level" if matched_equipment['level'] == matched_equipment['maxLevel'] else ""
+                equipment_class = "equipment-item "
+                if matched_equipment['maxLevel'] == 18:
+                    equipment_class += "common"
+                elif matched_equipment['maxLevel'] == 27:
+                    equipment_class += "epic"
+                equipment_items.append(EQUIPMENT_TEMPLATE.render(
+                    item_class=f"{equipment_class.strip()} {eq_max_level_class}",
+                    icon=eq_icon_path,
+                    level=matched_equipment['level'],
+                ))
+            else:
+                # 未解锁的装备
+                equipment_items.append(EQUIPMENT_TEMPLATE.render(item_class="equipment-item locked",
+                                                                 icon=eq_icon_path, level="?"))
 
         if matched_hero:
-            level_text = str(matched_hero['level'])
             max_level_class = "max-level" if matched_hero['level'] == matched_hero['maxLevel'] else ""
-            # 生成装备HTML
-            equipment_html = ""
-            hero_equipment_list = hero_equipment_map.get(hero_name, [])
-            player_equipment_map = {eq.get('name'): eq for eq in hero_equipment if eq.get('village') == 'home'}
-
-            for eq_name in hero_equipment_list:
-                matched_equipment = player_equipment_map.get(eq_name)
-                eq_icon_path = PIC_SRC_DIR / f"equipments/{eq_name}.png"
-
-                if matched_equipment:
-                    eq_level_text = str(matched_equipment['level'])
-                    eq_max_level_class = "max-level" if matched_equipment['level'] == matched_equipment['maxLevel'] else ""
-                    equipment_class = "equipment-item "
-                    if matched_equipment['maxLevel'] == 18:
-                        equipment_class += "common"
-                    elif matched_equipment['maxLevel'] == 27:
-                        equipment_class += "epic"
-                    
-                    equipment_html += f"""
-                    <div class="{equipment_class.strip()} {eq_max_level_class}">
-                        <img class="equipment-icon" src="{eq_icon_path}">
-                        <div class="equipment-level">{eq_level_text}</div>
-                    </div>
-                    """
-                else:
-                    # 未解锁的装备
-                    equipment_html += f"""
-                    <div class="equipment-item locked">
-                        <img class="equipment-icon" src="{eq_icon_path}">
-                        <div class="equipment-level">?</div>
-                    </div>
-                    """
-            
-            heroes_html += f"""
-            <div class="hero-item">
-                <div class="hero-icon {max_level_class}">
-                    <img src="{hero_icon_path}" style="width:100%;height:100%;object-fit:contain;">
-                    <div class="hero-level">{level_text}</div>
-                </div>
-                <div class="hero-divider"></div>
-                <div class="equipment-grid">
-                    {equipment_html}
-                </div>
-            </div>
-            """
+            hero_items.append(HERO_TEMPLATE.render(
+                item_class="hero-item",
+                icon_class=f"hero-icon {max_level_class}",
+                icon=hero_icon_path,
+                level=matched_hero['level'],
+                equipment_html="".join(equipment_items),
+            ))
         else:
-             # 未解锁的英雄
-            equipment_html = "" # Ensure equipment_html is defined even for locked heroes
-            hero_equipment_list = hero_equipment_map.get(hero_name, [])
-            for eq_name in hero_equipment_list:
-                 eq_icon_path = PIC_SRC_DIR / f"equipments/{eq_name}.png"
-                 equipment_html += f"""
-                 <div class="equipment-item locked">
-                    <img class="equipment-icon" src="{eq_icon_path}">
-                    <div class="equipment-level">?</div>
-                 </div>
-                 """
-
-            heroes_html += f"""
-            <div class="hero-item locked-item">
-                <div class="hero-icon">
-                    <img src="{hero_icon_path}" style="width:100%;height:100%;object-fit:contain;">
-                    <div class="hero-level">?</div>
-                </div>
-                <div class="hero-divider"></div>
-                <div class="equipment-grid">
-                    {equipment_html}
-                </div>
-            </div>
-            """
-
-    # 生成战宠HTML
-    pets_html = ""
-    # 优化：先将玩家部队数据转换为字典以便快速查找
+            # 未解锁的英雄
+            hero_items.append(HERO_TEMPLATE.render(
+                item_class="hero-item locked-item",
+                icon_class="hero-icon",
+                icon=hero_icon_path,
+                level="?",
+                equipment_html="".join(equipment_items),
+            ))
+
+    # 优化：先将玩家部队和法术数据转换为字典以便快速查找
     player_troops_map = {troop['name']: troop for troop in troops if troop['village'] == 'home'}
-
-    for pet_name in pet_list:
-        troop = player_troops_map.get(pet_name)
-        pet_icon_path = PIC_SRC_DIR / f"pets/{pet_name}.png"
-        if troop:
-            level_text = str(troop['level'])
-            max_level_class = "max-level" if troop['level'] == troop['maxLevel'] else ""
-            pets_html += f"""
-            <div class="grid-item {max_level_class}">
-                <div class="unit-icon troop">
-                    <img src="{pet_icon_path}" style="width:100%;height:100%;object-fit:contain;">
-                    <div class="unit-level">{level_text}</div>
-                </div>
-            </div>
-            """
-        else:
-             # 未解锁的战宠
-            pets_html += f"""
-            <div class="grid-item locked-item">
-                 <div class="unit-icon troop">
-                     <img src="{pet_icon_path}" style="width:100%;height:100%;object-fit:contain;">
-                     <div class="unit-level">?</div>
-                 </div>
-            </div>
-            """
-
-    # 生成法术HTML
-    spells_html = ""
-    # 优化：先将玩家法术数据转换为字典以便快速查找
     player_spells_map = {spell['name']: spell for spell in spells if spell['village'] == 'home'}
 
-    for spell_name in spell_list:
-        spell = player_spells_map.get(spell_name)
-        spell_icon_path = PIC_SRC_DIR / f"spells/{spell_name}.png"
-        if spell:
-            level_text = str(spell['level'])
-            max_level_class = "max-level" if spell['level'] == spell['maxLevel'] else ""
-            spells_html += f"""
-            <div class="grid-item {max_level_class}">
-                <div class="unit-icon spell">
-                    <img src="{spell_icon_path}" style="width:100%;height:100%;object-fit:contain;">
-                    <div class="unit-level">{level_text}</div>
-                </div>
-            </div>
-            """
-        else:
-            # 未解锁的法术
-             spells_html += f"""
-             <div class="grid-item locked-item">
-                 <div class="unit-icon spell">
-                     <img src="{spell_icon_path}" style="width:100%;height:100%;object-fit:contain;">
-                     <div class="unit-level">?</div>
-                 </div>
-             </div>
-             """
-
-    # 生成部队HTML
-    troops_html = ""
-    # 优化：player_troops_map 已在战宠部分创建
-
-    for troop_name in troop_list:
-        # 跳过超级兵种和战宠，因为它们不在 `troop_list` 中，或单独处理
-        # 但为了保险起见，保留检查
-        if troop_name in excluded_troops or troop_name in pet_list or troop_name in machine_list:
-             continue
-
-        troop = player_troops_map.get(troop_name)
-        troop_icon_path = PIC_SRC_DIR / f"troops/{troop_name}.png"
-        if troop:
-            level_text = str(troop['level'])
-            max_level_class = "max-level" if troop['level'] == troop['maxLevel'] else ""
-            troops_html += f"""
-            <div class="grid-item {max_level_class}">
-                <div class="unit-icon troop">
-                    <img src="{troop_icon_path}" style="width:100%;height:100%;object-fit:contain;">
-                    <div class="unit-level">{level_text}</div>
-                </div>
-            </div>
-            """
-        else:
-             # 未解锁的部队
-             troops_html += f"""
-             <div class="grid-item locked-item">
-                 <div class="unit-icon troop">
-                     <img src="{troop_icon_path}" style="width:100%;height:100%;object-fit:contain;">
-                     <div class="unit-level">?</div>
-                 </div>
-             </div>
-             """
-
-    # 生成攻城机器HTML
-    machines_html = ""
-    # 优化：player_troops_map 已在战宠部分创建
-
-    for machine_name in machine_list:
-         troop = player_troops_map.get(machine_name)
-         machine_icon_path = PIC_SRC_DIR / f"machines/{machine_name}.png"
-         if troop:
-             level_text = str(troop['level'])
-             max_level_class = "max-level" if troop['level'] == troop['maxLevel'] else ""
-             machines_html += f"""
-             <div class="grid-item {max_level_class}">
-                 <div class="unit-icon troop">
-                     <img src="{machine_icon_path}" style="width:100%;height:100%;object-fit:contain;">
-                     <div class="unit-level">{level_text}</div>
-                 </div>
-             </div>
-             """
-         else:
-             # 未解锁的攻城机器
-             machines_html += f"""
-             <div class="grid-item locked-item">
-                 <div class="unit-icon troop">
-                     <img src="{machine_icon_path}" style="width:100%;height:100%;object-fit:contain;">
-                     <div class="unit-level">?</div>
-                 </div>
-             </div>
-             """
+    # 生成战宠、部队、法术和攻城机器HTML
+    # 跳过超级兵种、战宠和攻城机器，因为它们不在 `troop_list` 中，或单独处理，但为了保险起见，保留检查
+    troop_names = [name for name in troop_list
+                   if name not in excluded_troops and name not in pet_list and name not in machine_list]
+    pets_html = render_units(pet_list, player_troops_map, "pets", "troop")
+    troops_html = render_units(troop_names, player_troops_map, "troops", "troop")
+    spells_html = render_units(spell_list, player_spells_map, "spells", "spell")
+    machines_html = render_units(machine_list, player_troops_map, "machines", "troop")
 
     # 判断部落名是否存在
     clan_name = clan.get('name', '无部落') if clan else '无部落' # More robust check for clan presence
@@ -924,7 +869,7 @@ def generate_player_info(data):
         'trophy_icon': trophy_icon,
         'trophies': trophies,
         'best_trophies': best_trophies,
-        'heroes_html': heroes_html,
+        'heroes_html': "".join(hero_items),
         'spells_html': spells_html,
         'troops_html': troops_html,
         'pets_html': pets_html,
@@ -940,42 +885,39 @@ def generate_player_info(data):
     }
 
     # 填充HTML模板
-    html_content = html_template.format_map(format_dict)
-    return html_content
+    return html_template.render(format_dict)
 
-def generate_player_info_image(data, output_path=None):
+def generate_player_info_image(data, output_path=None, page=None):
     """
     生成玩家统计图片
     
     Args:
         data: 玩家数据字典
         output_path: 输出图片路径，如果为None则使用默认路径
+        page: 浏览器池提供的页面，如果为None则临时启动浏览器
         
     Returns:
         生成的图片路径
     """
+    if page is None:
+        with standalone_page() as page:
+            return generate_player_info_image(data, output_path, page)
+
+    timer = PhaseTimer('player_info')
     # 生成HTML内容
-    html_content = generate_player_info(data)
-    
-    # 创建临时HTML文件
-    temp_html_path = Path('temp.html')
-    with open(temp_html_path, 'w', encoding='utf-8') as f:
-        f.write(html_content)
+    with timer.phase('html'):
+        html_content = generate_player_info(data)
     
     # 如果未指定输出路径，使用默认路径
     if output_path is None:
         output_path = 'player_stats.png'
     
-    # 使用Playwright截图
-    with sync_playwright() as p:
-        browser = p.chromium.launch()
-        page = browser.new_page(viewport={"width": 1360, "height": 1080})
-        page.goto(f'file://{temp_html_path.absolute()}')
-        page.screenshot(path=output_path, full_page=True)
-        browser.close()
-    
-    # 删除临时HTML文件
-    temp_html_path.unlink()
+    # 使用Playwright截图（HTML 和本地图标直接从内存提供，不写临时文件）
+    # 视口按预估的内容高度只设置一次，截取一次内容区域。body 没有外边距，容器从页面左上角开始，
+    # 页面大小就是容器大小，截取容器与原先的整页截图范围相同
+    capture_html(page, html_content, output_path, '.container', VIEWPORT_WIDTH, estimate_content_height(),
+                 PAGE_READY, timer)
+    timer.finish()
     
     return output_path
 
@@ -1,11 +1,15 @@
 from pathlib import Path
-from playwright.sync_api import sync_playwright
+from .render_pool import standalone_page, capture_html, PhaseTimer
+from .asset_store import get_asset_store
+from .sprites import sprite_data_uri, TRANSPARENT_PIXEL
+from .templates import Template
+import os
 import json
 import time
 from datetime import datetime, timedelta
 import ssl
 import logging
-import base64
+from functools import lru_cache
 from io import BytesIO
 
 # 创建不验证SSL的context
@@ -20,6 +24,24 @@ PROJECT_ROOT = SCRIPT_DIR.parent.parent
 # 定义图标路径 - 使用绝对路径
 PIC_SRC_DIR = PROJECT_ROOT / "storage" / "pic_src"
 
+# 截图前需要满足的页面就绪条件：字体、图片及奖杯曲线绘制完成
+PAGE_READY = ('fonts', 'images', 'chart')
+# 没有冲杯数据时的提示页面不包含奖杯曲线
+NO_DATA_PAGE_READY = ('fonts',)
+
+# 页面布局（与 CSS 对应，单位为像素），用于按记录数预估内容高度
+VIEWPORT_WIDTH = 750
+# 页头（玩家信息、奖杯曲线）及战斗记录标题
+LAYOUT_HEADER_HEIGHT = 400
+# 战斗记录表格每行高度
+LAYOUT_BATTLE_ROW_HEIGHT = 40
+# 使用装备区域标题及每行英雄的高度
+LAYOUT_EQUIPMENT_HEIGHT = 80
+LAYOUT_HERO_ROW_HEIGHT = 150
+
+# 奖杯曲线绘制脚本（内联到页面中）
+CHART_RUNTIME_PATH = SCRIPT_DIR / "static" / "player_legend_chart.js"
+
 # 定义英雄和装备的对应关系（从player_info.py中复制）
 hero_equipment_map = {
     'Barbarian King': ['Barbarian Puppet', 'Rage Vial', 'Earthquake Boots', 'Vampstache', 'Giant Gauntlet', 'Spiky Ball', 'Snake Bracelet'],
@@ -32,251 +54,13 @@ hero_equipment_map = {
 # 英雄列表（从player_info.py中复制）
 hero_order = ['Barbarian King', 'Archer Queen', 'Minion Prince', 'Grand Warden', 'Royal Champion']
 
-def image_to_base64_data_uri(image_path):
-    """读取图片文件并返回Base64编码的Data URI"""
-    try:
-        with open(image_path, "rb") as image_file:
-            encoded_string = base64.b64encode(image_file.read()).decode('utf-8')
-            # 根据文件扩展名确定MIME类型，这里假定都是png
-            mime_type = "image/png"
-            return f"data:{mime_type};base64,{encoded_string}"
-    except FileNotFoundError:
-        print(f"错误：图片文件未找到: {image_path}")
-        # 返回一个小的透明像素的Data URI作为占位符
-        return "data:image/gif;base64,R0lGODlhAQABAIAAAAAAAP///yH5BAEAAAAALAAAAAABAAEAAAIBRAA7"
-    except Exception as e:
-        print(f"错误：读取或编码图片时出错 {image_path}: {e}")
-        return "data:image/gif;base64,R0lGODlhAQABAIAAAAAAAP///yH5BAEAAAAALAAAAAABAAEAAAIBRAA7"
-
-def get_date_range(days=1):
-    """获取最近几天的日期列表，从当前日期往前推"""
-    today = datetime.now()
-    date_list = []
-    for i in range(days):
-        day = today - timedelta(days=i)
-        date_list.append(day.strftime("%Y-%m-%d"))
-    return date_list
-
-def timestamp_to_time(ts):
-    """将时间戳转换为时间（小时:分钟:秒）"""
-    dt = datetime.fromtimestamp(ts)
-    return dt.strftime("%H:%M:%S")
-
-def get_most_recent_day_data(data):
-    """获取最近一天的传奇联赛数据（有进攻或防守数据的最后一天）"""
-    # 按日期倒序排列所有天数
-    legend_days = sorted(data.get('legends', {}).keys(), reverse=True)
-    
-    if not legend_days:
-        return None, None
-    
-    # 找到有进攻或防守数据的最后一天
-    for day in legend_days:
-        day_data = data['legends'][day]
-        has_attacks = len(day_data.get('new_attacks', [])) > 0
-        has_defenses = len(day_data.get('new_defenses', [])) > 0
-        
-        if has_attacks or has_defenses:
-            return day, day_data
-    
-    # 如果所有天都没有进攻或防守数据，返回最新的一天
-    latest_day = legend_days[0]
-    return latest_day, data['legends'][latest_day]
-
-def get_final_trophies(day_data):
-    """
-    通过new_attacks和new_defenses中time值最大的元素所包含的trophies属性来确定当天最终奖杯
-    如果都没有，则返回None
-    """
-    max_time = 0
-    final_trophies = None
-    
-    # 检查进攻记录
-    for attack in day_data.get('new_attacks', []):
-        if attack.get('time', 0) > max_time and 'trophies' in attack:
-            max_time = attack['time']
-            final_trophies = attack['trophies']
-    
-    # 检查防守记录
-    for defense in day_data.get('new_defenses', []):
-        if defense.get('time', 0) > max_time and 'trophies' in defense:
-            max_time = defense['time']
-            final_trophies = defense['trophies']
-    
-    return final_trophies
-
-def get_last_attack_equipment(attacks):
-    """获取最后一场进攻的英雄装备信息"""
-    if not attacks:
-        return None
-    
-    # 按时间排序获取最后一场进攻
-    sorted_attacks = sorted(attacks, key=lambda x: x.get('time', 0))
-    if not sorted_attacks:
-        return None
-    
-    # 获取最后一场进攻的装备
-    last_attack = sorted_attacks[-1]
-    return last_attack.get('hero_gear', [])
-
-def generate_player_legend_html(data):
-    """生成玩家冲杯信息的HTML"""
-    # 获取玩家基本信息
-    player_name = data.get('name', 'Unknown')
-    player_tag = data.get('tag', '#UNKNOWN')
-    
-    # 获取排名信息
-    rankings = data.get('rankings', {})
-    global_rank = rankings.get('global_rank', 'N/A')
-    country_name = rankings.get('country_name', 'Unknown')
-    country_code = rankings.get('country_code', 'XX')
-    
-    # 获取最近一天的传奇联赛数据
-    today, day_data = get_most_recent_day_data(data)
-    
-    if not day_data:
-        return f"""<!DOCTYPE html>
-<html><body><h1>没有找到传奇联赛数据</h1></body></html>"""
-    
-    # 获取当日最终奖杯数
-    current_trophies = get_final_trophies(day_data)
-    if current_trophies is None:
-        current_trophies = 5000  # 默认值
-    
-    # 准备进攻记录和防守记录，按时间排序
-    attacks = day_data.get('new_attacks', [])
-    defenses = day_data.get('new_defenses', [])
-    
-    # 按时间排序
-    attacks = sorted(attacks, key=lambda x: x.get('time', 0))
-    defenses = sorted(defenses, key=lambda x: x.get('time', 0))
-    
-    # 获取最后一场进攻的装备
-    last_attack_gear = get_last_attack_equipment(attacks)
-    
-    # 生成装备HTML
-    equipment_html = ""
-    if last_attack_gear:
-        # 按英雄组织装备
-        hero_equipment_items = {}
-        
-        for item in last_attack_gear:
-            name = item.get('name')
-            level = item.get('level', 0)
-            
-            # 找到对应的英雄
-            for hero, equipments in hero_equipment_map.items():
-                if name in equipments:
-                    if hero not in hero_equipment_items:
-                        hero_equipment_items[hero] = []
-                    
-                    hero_equipment_items[hero].append({
-                        'name': name,
-                        'level': level,
-                        'max_level': 27 if name in ['Spiky Ball', 'Electro Boots'] else 18  # 根据已知信息设置最大等级
-                    })
-                    break
-        
-        # 将英雄分成两行显示（每行最多3个）
-        hero_rows = []
-        current_row = []
-        
-        for hero in hero_order:
-            if hero in hero_equipment_items and hero_equipment_items[hero]:
-                current_row.append((hero, hero_equipment_items[hero]))
-                if len(current_row) == 3:  # 每行3个英雄
-                    hero_rows.append(current_row)
-                    current_row = []
-        
-        # 处理最后一行（可能不满3个英雄）
-        if current_row:
-            hero_rows.append(current_row)
-        
-        # 为每行生成HTML
-        for row in hero_rows:
-            row_html = '<div class="hero-row">'
-            
-            for hero, equipments in row:
-                # 英雄图标路径
-                hero_icon_file_path = (PIC_SRC_DIR / f'heroes/{hero}.png').absolute()
-                hero_icon_data_uri = image_to_base64_data_uri(hero_icon_file_path)
-                
-                # 装备HTML
-                hero_equipment_html = ""
-                for equip in equipments:
-                    eq_name = equip['name']
-                    eq_level = equip['level']
-                    eq_max_level = equip['max_level']
-                    
-                    # 装备图标路径
-                    eq_icon_file_path = (PIC_SRC_DIR / f'equipments/{eq_name}.png').absolute()
-                    eq_icon_data_uri = image_to_base64_data_uri(eq_icon_file_path)
-
-                    
-                    # 设置装备类型样式
-                    equipment_class = "equipment-item"
-                    
-                    hero_equipment_html += f"""
-                    <div class="{equipment_class.strip()}">
-                        <img class="equipment-icon" src="{eq_icon_data_uri}">
-                        <div class="equipment-level">{eq_level}</div>
-                    </div>
-                    """
-                
-                row_html += f"""
-                <div class="hero-item">
-                    <div class="hero-icon">
-                        <img src="{hero_icon_data_uri}" style="width:100%;height:100%;object-fit:contain;">
-                    </div>
-                    <div class="hero-divider"></div>
-                    <div class="equipment-grid">
-                        {hero_equipment_html}
-                    </div>
-                </div>
-                """
-            
-            row_html += '</div>'
-            equipment_html += row_html
-    
-    # 准备图表数据 - 所有传奇联赛数据
-    chart_dates = []
-    trophies_progression = []
-    
-    # 获取所有日期，按时间顺序排序
-    sorted_dates = sorted(data.get('legends', {}).keys())
-    
-    for date in sorted_dates:
-        chart_dates.append(date)
-        daily_data = data['legends'][date]
-        
-        # 获取当天最终奖杯
-        final_trophy = get_final_trophies(daily_data)
-        if final_trophy is not None:
-            trophies_progression.append(final_trophy)
-    
-    # 获取奖杯图标的 Data URI
-    trophy_icon_path = (PIC_SRC_DIR / "clan" / "clan_points.png").absolute()
-    trophy_icon_data_uri = image_to_base64_data_uri(trophy_icon_path)
-    
-    # 计算净上分
-    total_attack_change = sum(attack.get('change', 0) for attack in attacks)
-    total_defense_change = sum(defense.get('change', 0) for defense in defenses)
-    # 确保防守奖杯变化为负数
-    if total_defense_change > 0:
-        total_defense_change = -total_defense_change
-    net_change = total_attack_change + total_defense_change
-    
-    # 设置净上分的CSS类
-    net_change_class = "positive-result" if net_change >= 0 else "negative-result"
-    net_change_symbol = "+" if net_change > 0 else ""
-    
-    # 创建HTML模板
-    html = f"""<!DOCTYPE html>
+# --- HTML 模板（导入时编译一次） ---
+PAGE_TEMPLATE = Template("""<!DOCTYPE html>
 <html>
 <head>
     <meta charset="UTF-8">
     <meta name="viewport" content="width=device-width, initial-scale=1.0">
-    <script src="https://cdn.jsdelivr.net/npm/chart.js"></script>
+    {chart_runtime}
     <style>
         body {{
             font-family: "HarmonyOS Sans SC", "PingFang SC", "Microsoft YaHei", sans-serif;
@@ -339,6 +123,11 @@ def generate_player_legend_html(data):
             border-radius: 8px;
             box-shadow: 0 1px 3px rgba(0,0,0,0.1) inset;
         }}
+        .trophy-chart-img {{
+            display: block;
+            width: 100%;
+            height: auto;
+        }}
         .header-chart-title {{
             font-size: 16px;
             font-weight: 500;
@@ -632,7 +421,7 @@ def generate_player_legend_html(data):
                 </div>
                 <div class="header-chart-title">奖杯曲线</div>
                 <div class="header-chart">
-                    <canvas id="trophiesChart"></canvas>
+                    {chart_html}
                 </div>
             </div>
             
@@ -651,7 +440,7 @@ def generate_player_legend_html(data):
                     </div>
                     <div class="stat-item">
                         <div class="stat-value">
-                            <img src="https://flagcdn.com/w20/{country_code.lower()}.png" style="width: 20px; height: 14px; margin-right: 5px;" alt="{country_name}" />
+                            <img src="https://flagcdn.com/w20/{country_code}.png" style="width: 20px; height: 14px; margin-right: 5px;" alt="{country_name}" />
                             {country_name}
                         </div>
                         <div class="stat-label">国家</div>
@@ -671,246 +460,407 @@ def generate_player_legend_html(data):
             <div class="battles-container">
                 <div class="battles-column">
                     <div class="column-title">进攻</div>
-"""
-    
-    # 生成进攻记录
-    sorted_attacks = sorted(attacks, key=lambda x: x.get('time', 0))
-    
-    if sorted_attacks:
-        html += """
-                    <table class="battle-table">
-                        <tbody>
-        """
-        
-        # 添加每个进攻记录
-        for attack in sorted_attacks:
-            time_stamp = attack.get('time', 0)
-            attack_time = timestamp_to_time(time_stamp) if time_stamp else "未知时间"
-            trophy_change = attack.get('change', 0)
-            
-            change_class = "positive-result" if trophy_change >= 0 else "negative-result"
-            change_symbol = "+" if trophy_change > 0 else ""
-            
-            html += f"""
-                            <tr>
-                                <td>{attack_time}</td>
-                                <td class="{change_class}">{change_symbol}{trophy_change}</td>
-                            </tr>
-            """
-        
-        html += """
-                        </tbody>
-                    </table>
-        """
-    else:
-        html += """
-                    <div style="padding: 20px; text-align: center; color: #6c757d;">
-                        暂无进攻记录
-                    </div>
-        """
-    
-    html += """
+{attacks_html}
                 </div>
                 <div class="battles-column">
                     <div class="column-title">防守</div>
-    """
-    
-    # 生成防守记录
-    sorted_defenses = sorted(defenses, key=lambda x: x.get('time', 0))
+    {defenses_html}
+                </div>
+            </div>
+        </div>
+    {equipment_section}
+    </div>
     
-    if sorted_defenses:
-        html += """
+    {chart_script}
+</body>
+</html>
+""")
+
+# 战斗记录表格
+BATTLE_TABLE_TEMPLATE = Template("""
                     <table class="battle-table">
                         <tbody>
-        """
-        
-        # 添加每个防守记录
-        for defense in sorted_defenses:
-            time_stamp = defense.get('time', 0)
-            defense_time = timestamp_to_time(time_stamp) if time_stamp else "未知时间"
-            trophy_change = defense.get('change', 0)
-            
-            # 确保防守奖杯显示为负数
-            if trophy_change > 0:
-                trophy_change = -trophy_change
-            
-            change_class = "negative-result"
-            
-            html += f"""
-                            <tr>
-                                <td class="{change_class}">{trophy_change}</td>
-                                <td>{defense_time}</td>
-                            </tr>
-            """
-        
-        html += """
+        {rows}
                         </tbody>
                     </table>
-        """
-    else:
-        html += """
+        """)
+
+ATTACK_ROW_TEMPLATE = Template("""
+                            <tr>
+                                <td>{time}</td>
+                                <td class="{change_class}">{change_symbol}{change}</td>
+                            </tr>
+            """)
+
+DEFENSE_ROW_TEMPLATE = Template("""
+                            <tr>
+                                <td class="{change_class}">{change}</td>
+                                <td>{time}</td>
+                            </tr>
+            """)
+
+NO_BATTLES_TEMPLATE = Template("""
                     <div style="padding: 20px; text-align: center; color: #6c757d;">
-                        暂无防守记录
+                        {message}
                     </div>
-        """
-    
-    html += f"""
-                </div>
-            </div>
-        </div>
-    """
-    
-    # 添加最后一场进攻的装备显示
-    if equipment_html:
-        html += f"""
+        """)
+
+# 最后一场进攻使用的装备
+EQUIPMENT_SECTION_TEMPLATE = Template("""
         <div class="section">
             <h2 class="section-title">使用装备</h2>
             <div class="hero-section">
                 {equipment_html}
             </div>
         </div>
-        """
+        """)
+
+HERO_TEMPLATE = Template("""
+                <div class="hero-item">
+                    <div class="hero-icon">
+                        <img src="{icon}" style="width:100%;height:100%;object-fit:contain;">
+                    </div>
+                    <div class="hero-divider"></div>
+                    <div class="equipment-grid">
+                        {equipment_html}
+                    </div>
+                </div>
+                """)
+
+EQUIPMENT_TEMPLATE = Template("""
+                    <div class="equipment-item">
+                        <img class="equipment-icon" src="{icon}">
+                        <div class="equipment-level">{level}</div>
+                    </div>
+                    """)
+
+@lru_cache(maxsize=1)
+def load_chart_runtime():
+    """读取奖杯曲线绘制脚本（只读取一次）"""
+    return CHART_RUNTIME_PATH.read_text(encoding='utf-8')
+
+def get_date_range(days=1):
+    """获取最近几天的日期列表，从当前日期往前推"""
+    today = datetime.now()
+    date_list = []
+    for i in range(days):
+        day = today - timedelta(days=i)
+        date_list.append(day.strftime("%Y-%m-%d"))
+    return date_list
+
+def timestamp_to_time(ts):
+    """将时间戳转换为时间（小时:分钟:秒）"""
+    dt = datetime.fromtimestamp(ts)
+    return dt.strftime("%H:%M:%S")
+
+def get_most_recent_day_data(data):
+    """获取最近一天的传奇联赛数据（有进攻或防守数据的最后一天）"""
+    # 按日期倒序排列所有天数
+    legend_days = sorted(data.get('legends', {}).keys(), reverse=True)
     
-    # 结束HTML
-    html += f"""
-    </div>
+    if not legend_days:
+        return None, None
     
-    <script>
-        // 绘制奖杯曲线图
-        const ctx = document.getElementById('trophiesChart').getContext('2d');
-        const gradient = ctx.createLinearGradient(0, 0, 0, 150);
-        gradient.addColorStop(0, 'rgba(52, 152, 219, 0.2)');
-        gradient.addColorStop(1, 'rgba(52, 152, 219, 0.0)');
+    # 找到有进攻或防守数据的最后一天
+    for day in legend_days:
+        day_data = data['legends'][day]
+        has_attacks = len(day_data.get('new_attacks', [])) > 0
+        has_defenses = len(day_data.get('new_defenses', [])) > 0
         
-        const trophiesChart = new Chart(ctx, {{
-            type: 'line',
-            data: {{
-                labels: {json.dumps(chart_dates)},
-                datasets: [{{
-                    label: '奖杯',
-                    data: {json.dumps(trophies_progression)},
-                    fill: true,
-                    backgroundColor: gradient,
-                    borderColor: '#3498db',
-                    borderWidth: 2,
-                    pointRadius: 0,
-                    pointHoverRadius: 0,
-                    tension: 0.3,
-                    borderCapStyle: 'round',
-                    cubicInterpolationMode: 'monotone'
-                }}]
-            }},
-            options: {{
-                responsive: true,
-                maintainAspectRatio: false,
-                animation: {{
-                    duration: 2000,
-                    easing: 'easeOutQuart'
-                }},
-                plugins: {{
-                    legend: {{
-                        display: false
-                    }},
-                    tooltip: {{
-                        backgroundColor: 'rgba(0, 0, 0, 0.7)',
-                        titleColor: '#fff',
-                        bodyColor: '#fff',
-                        titleFont: {{
-                            size: 14
-                        }},
-                        bodyFont: {{
-                            size: 14
-                        }},
-                        padding: 10,
-                        displayColors: false,
-                        callbacks: {{
-                            title: function() {{ return ''; }},
-                            label: function(context) {{
-                                return `奖杯: ${{context.raw}}`;
-                            }}
-                        }}
-                    }}
-                }},
-                scales: {{
-                    y: {{
-                        beginAtZero: false,
-                        min: 5000,
-                        grid: {{
-                            color: 'rgba(0, 0, 0, 0.05)',
-                            borderColor: 'rgba(0, 0, 0, 0.1)',
-                            drawBorder: false
-                        }},
-                        ticks: {{
-                            color: '#666',
-                            font: {{
-                                size: 10
-                            }},
-                            maxTicksLimit: 3,
-                            padding: 10
-                        }}
-                    }},
-                    x: {{
-                        display: false,
-                        grid: {{
-                            display: false
-                        }}
-                    }}
-                }}
-            }}
+        if has_attacks or has_defenses:
+            return day, day_data
+    
+    # 如果所有天都没有进攻或防守数据，返回最新的一天
+    latest_day = legend_days[0]
+    return latest_day, data['legends'][latest_day]
+
+def get_final_trophies(day_data):
+    """
+    通过new_attacks和new_defenses中time值最大的元素所包含的trophies属性来确定当天最终奖杯
+    如果都没有，则返回None
+    """
+    max_time = 0
+    final_trophies = None
+    
+    # 检查进攻记录
+    for attack in day_data.get('new_attacks', []):
+        if attack.get('time', 0) > max_time and 'trophies' in attack:
+            max_time = attack['time']
+            final_trophies = attack['trophies']
+    
+    # 检查防守记录
+    for defense in day_data.get('new_defenses', []):
+        if defense.get('time', 0) > max_time and 'trophies' in defense:
+            max_time = defense['time']
+            final_trophies = defense['trophies']
+    
+    return final_trophies
+
+def get_last_attack_equipment(attacks):
+    """获取最后一场进攻的英雄装备信息"""
+    if not attacks:
+        return None
+    
+    # 按时间排序获取最后一场进攻
+    sorted_attacks = sorted(attacks, key=lambda x: x.get('time', 0))
+    if not sorted_attacks:
+        return None
+    
+    # 获取最后一场进攻的装备
+    last_attack = sorted_attacks[-1]
+    return last_attack.get('hero_gear', [])
+
+def estimate_content_height(data):
+    """按最近一天的进攻/防守记录数及装备行数预估页面内容高度"""
+    _, day_data = get_most_recent_day_data(data)
+    if not day_data:
+        return LAYOUT_HEADER_HEIGHT
+    attacks = day_data.get('new_attacks', [])
+    rows = max(len(attacks), len(day_data.get('new_defenses', [])), 1)
+    height = LAYOUT_HEADER_HEIGHT + rows * LAYOUT_BATTLE_ROW_HEIGHT
+
+    # 最后一场进攻的装备按英雄每行 3 个显示
+    gear = get_last_attack_equipment(sorted(attacks, key=lambda x: x.get('time', 0))) or []
+    heroes = {hero for item in gear for hero, equipments in hero_equipment_map.items() if item.get('name') in equipments}
+    if heroes:
+        height += LAYOUT_EQUIPMENT_HEIGHT + -(-len(heroes) // 3) * LAYOUT_HERO_ROW_HEIGHT
+    return height
+
+def generate_player_legend_html(data, chart_backend=None):
+    """
+    生成玩家冲杯信息的HTML
+
+    Args:
+        data: 包含玩家信息的数据字典
+        chart_backend: 奖杯曲线的绘制方式，'canvas' 由页面脚本绘制，'matplotlib' 在服务端绘制为图片；
+            如果为None则从环境变量 LEGEND_CHART_BACKEND 获取
+    """
+    # 获取玩家基本信息
+    player_name = data.get('name', 'Unknown')
+    player_tag = data.get('tag', '#UNKNOWN')
+    
+    # 获取排名信息
+    rankings = data.get('rankings', {})
+    global_rank = rankings.get('global_rank', 'N/A')
+    country_name = rankings.get('country_name', 'Unknown')
+    country_code = rankings.get('country_code', 'XX')
+    
+    # 获取最近一天的传奇联赛数据
+    today, day_data = get_most_recent_day_data(data)
+    
+    if not day_data:
+        # 与正常页面一样放在 .container 中，截图时截取该元素
+        return f"""<!DOCTYPE html>
+<html><body><div class="container" style="width: {VIEWPORT_WIDTH}px; display: flow-root;"><h1>没有找到传奇联赛数据</h1></div></body></html>"""
+    
+    # 获取当日最终奖杯数
+    current_trophies = get_final_trophies(day_data)
+    if current_trophies is None:
+        current_trophies = 5000  # 默认值
+    
+    # 准备进攻记录和防守记录，按时间排序
+    attacks = day_data.get('new_attacks', [])
+    defenses = day_data.get('new_defenses', [])
+    
+    # 按时间排序
+    attacks = sorted(attacks, key=lambda x: x.get('time', 0))
+    defenses = sorted(defenses, key=lambda x: x.get('time', 0))
+    
+    # 获取最后一场进攻的装备
+    last_attack_gear = get_last_attack_equipment(attacks)
+    
+    # 生成装备HTML
+    equipment_html = ""
+    if last_attack_gear:
+        # 按英雄组织装备
+        hero_equipment_items = {}
+        
+        for item in last_attack_gear:
+            name = item.get('name')
+            level = item.get('level', 0)
+            
+            # 找到对应的英雄
+            for hero, equipments in hero_equipment_map.items():
+                if name in equipments:
+                    if hero not in hero_equipment_items:
+                        hero_equipment_items[hero] = []
+                    
+                    hero_equipment_items[hero].append({
+                        'name': name,
+                        'level': level,
+                        'max_level': 27 if name in ['Spiky Ball', 'Electro Boots'] else 18  # 根据已知信息设置最大等级
+                    })
+                    break
+        
+        # 将英雄分成两行显示（每行最多3个）
+        hero_rows = []
+        current_row = []
+        
+        for hero in hero_order:
+            if hero in hero_equipment_items and hero_equipment_items[hero]:
+                current_row.append((hero, hero_equipment_items[hero]))
+                if len(current_row) == 3:  # 每行3个英雄
+                    hero_rows.append(current_row)
+                    current_row = []
+        
+        # 处理最后一行（可能不满3个英雄）
+        if current_row:
+            hero_rows.append(current_row)
+        
+        # 为每行生成HTML
+        row_items = []
+        for row in hero_rows:
+            hero_items = []
+            for hero, equipments in row:
+                # 英雄图标路径
+                hero_icon_data_uri = sprite_data_uri(PIC_SRC_DIR / f'heroes/{hero}.png', TRANSPARENT_PIXEL)
+
+                # 装备HTML
+                hero_equipment_html = "".join(
+                    EQUIPMENT_TEMPLATE.render(
+                        icon=sprite_data_uri(PIC_SRC_DIR / f'equipments/{equip["name"]}.png', TRANSPARENT_PIXEL),
+                        level=equip['level'],
+                    )
+                    for equip in equipments
+                )
+                hero_items.append(HERO_TEMPLATE.render(icon=hero_icon_data_uri, equipment_html=hero_equipment_html))
+
+            row_items.append('<div class="hero-row">' + "".join(hero_items) + '</div>')
+        equipment_html = "".join(row_items)
+    
+    # 准备奖杯曲线 - 所有传奇联赛数据
+    chart_backend = chart_backend or os.getenv('LEGEND_CHART_BACKEND', 'canvas')
+    if chart_backend == 'matplotlib':
+        from .player_legend_chart import trophy_chart_html
+        chart_html = trophy_chart_html(data.get('legends', {}))
+        chart_runtime = ""
+        chart_script = ""
+    else:
+        trophies_progression = []
+        
+        # 获取所有日期，按时间顺序排序
+        sorted_dates = sorted(data.get('legends', {}).keys())
+        
+        for date in sorted_dates:
+            daily_data = data['legends'][date]
+            
+            # 获取当天最终奖杯
+            final_trophy = get_final_trophies(daily_data)
+            if final_trophy is not None:
+                trophies_progression.append(final_trophy)
+
+        chart_html = '<canvas id="trophiesChart"></canvas>'
+        chart_runtime = f"<script>{load_chart_runtime()}</script>"
+        chart_script = f"""<script>
+        // 绘制奖杯曲线图（无动画，绘制完成后设置 window.__chartReady）
+        TrophyChart.draw(document.getElementById('trophiesChart'), {{
+            data: {json.dumps(trophies_progression)},
+            min: 5000,
+            maxTicks: 3,
+            color: '#3498db',
+            lineWidth: 2,
+            fill: ['rgba(52, 152, 219, 0.2)', 'rgba(52, 152, 219, 0.0)'],
+            gridColor: 'rgba(0, 0, 0, 0.05)',
+            tickColor: '#666',
+            fontSize: 10,
+            tickPadding: 10
         }});
-    </script>
-</body>
-</html>
-"""
+    </script>"""
+    
+    # 获取奖杯图标的 Data URI
+    trophy_icon_data_uri = sprite_data_uri(PIC_SRC_DIR / "clan" / "clan_points.png", TRANSPARENT_PIXEL)
+    
+    # 计算净上分
+    total_attack_change = sum(attack.get('change', 0) for attack in attacks)
+    total_defense_change = sum(defense.get('change', 0) for defense in defenses)
+    # 确保防守奖杯变化为负数
+    if total_defense_change > 0:
+        total_defense_change = -total_defense_change
+    net_change = total_attack_change + total_defense_change
     
-    return html
+    # 设置净上分的CSS类
+    net_change_class = "positive-result" if net_change >= 0 else "negative-result"
+    net_change_symbol = "+" if net_change > 0 else ""
+    
+    # 生成进攻和防守记录（每行渲染为一个片段，最后一次性拼接）
+    attack_rows = []
+    for attack in sorted(attacks, key=lambda x: x.get('time', 0)):
+        time_stamp = attack.get('time', 0)
+        trophy_change = attack.get('change', 0)
+        attack_rows.append(ATTACK_ROW_TEMPLATE.render(
+            time=timestamp_to_time(time_stamp) if time_stamp else "未知时间",
+            change_class="positive-result" if trophy_change >= 0 else "negative-result",
+            change_symbol="+" if trophy_change > 0 else "",
+            change=trophy_change,
+        ))
+
+    defense_rows = []
+    for defense in sorted(defenses, key=lambda x: x.get('time', 0)):
+        time_stamp = defense.get('time', 0)
+        # 确保防守奖杯显示为负数
+        defense_rows.append(DEFENSE_ROW_TEMPLATE.render(
+            time=timestamp_to_time(time_stamp) if time_stamp else "未知时间",
+            change_class="negative-result",
+            change=-abs(defense.get('change', 0)),
+        ))
 
-def generate_player_legend_image(data, output_path=None):
+    return PAGE_TEMPLATE.render(
+        chart_runtime=chart_runtime,
+        player_name=player_name,
+        player_tag=player_tag,
+        chart_html=chart_html,
+        trophy_icon_data_uri=trophy_icon_data_uri,
+        current_trophies=current_trophies,
+        global_rank=global_rank,
+        country_code=country_code.lower(),
+        country_name=country_name,
+        net_change_class=net_change_class,
+        net_change_symbol=net_change_symbol,
+        net_change=net_change,
+        attacks_html=(BATTLE_TABLE_TEMPLATE.render(rows="".join(attack_rows)) if attack_rows
+                      else NO_BATTLES_TEMPLATE.render(message="暂无进攻记录")),
+        defenses_html=(BATTLE_TABLE_TEMPLATE.render(rows="".join(defense_rows)) if defense_rows
+                       else NO_BATTLES_TEMPLATE.render(message="暂无防守记录")),
+        equipment_section=EQUIPMENT_SECTION_TEMPLATE.render(equipment_html=equipment_html) if equipment_html else "",
+        chart_script=chart_script,
+    )
+
+def generate_player_legend_image(data, output_path=None, page=None, chart_backend=None):
     """
     生成玩家冲杯信息图片
     
     Args:
         data: 包含玩家信息的数据字典
         output_path: 图片保存路径
+        page: 浏览器池提供的页面，如果为None则临时启动浏览器
+        chart_backend: 奖杯曲线的绘制方式，如果为None则从环境变量获取
     
     Returns:
         图片保存路径
     """
     logger = logging.getLogger('PlayerLeagueImage')
+
+    if page is None:
+        with standalone_page() as page:
+            return generate_player_legend_image(data, output_path, page, chart_backend)
     
     try:
-        # 生成HTML内容
-        html_content = generate_player_legend_html(data)
+        timer = PhaseTimer('player_legend')
+        # 生成HTML内容，远程图片（国旗）改写为本地存储的 data URI
+        with timer.phase('html'):
+            html_content = get_asset_store().rewrite_html(generate_player_legend_html(data, chart_backend))
         
-        # 使用Playwright渲染HTML为图片
-        with sync_playwright() as p:
-            browser = p.chromium.launch()
-            page = browser.new_page(viewport={"width": 750, "height": 1600})
-            
-            # 设置HTML内容
-            page.set_content(html_content)
-            
-            # 等待图表渲染完成
-            page.wait_for_timeout(1000)
-            
-            # 获取实际内容高度
-            body_height = page.evaluate('document.body.scrollHeight')
-            
-            # 调整页面大小以适应内容
-            page.set_viewport_size({"width": 750, "height": body_height})
-            
-            # 截图保存
-            if output_path:
-                page.screenshot(path=output_path, full_page=True)
-                logger.info(f"冲杯信息图片已生成: {output_path}")
-            else:
-                # 生成临时文件名
-                timestamp = int(time.time())
-                output_path = f"/tmp/player_legend_{timestamp}.png"
-                page.screenshot(path=output_path, full_page=True)
-                logger.info(f"冲杯信息图片已生成(临时文件): {output_path}")
-            
-            browser.close()
+        # 如果未指定输出路径，生成临时文件名
+        if not output_path:
+            output_path = f"/tmp/player_legend_{int(time.time())}.png"
+
+        # 视口按预估的内容高度只设置一次，等待图表绘制完成后截取一次内容区域
+        _, day_data = get_most_recent_day_data(data)
+        ready = PAGE_READY if day_data else NO_DATA_PAGE_READY
+        capture_html(page, html_content, output_path, '.container', VIEWPORT_WIDTH,
+                     estimate_content_height(data), ready, timer)
+        logger.info(f"冲杯信息图片已生成: {output_path}")
+        timer.finish()
         
         return output_path
     
@@ -0,0 +1,180 @@
+import io
+import base64
+from functools import lru_cache
+from typing import Any, Dict, Tuple
+
+import numpy as np
+import matplotlib
+matplotlib.use('Agg')
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.patches import Polygon
+
+# 图表在页面中的显示尺寸（CSS 像素）及渲染倍率，与 .header-chart 的内容区域一致
+CHART_WIDTH = 400
+CHART_HEIGHT = 120
+CHART_SCALE = 2
+
+# 与画布版本保持一致的样式
+Y_MIN = 5000
+MAX_TICKS = 3
+LINE_COLOR = '#3498db'
+FILL_RGB = (52 / 255, 152 / 255, 219 / 255)
+GRID_COLOR = (0, 0, 0, 0.05)
+TICK_COLOR = '#666666'
+FONT_SIZE_PX = 10
+
+
+def trophy_series(legends: Dict[str, Any]) -> np.ndarray:
+    """
+    计算每天的最终奖杯数（当天时间最晚的进攻/防守记录中的奖杯数），按日期排序
+
+    与 get_final_trophies 的规则一致：忽略 time 为 0 或没有 trophies 的记录，
+    同一时间的记录以进攻优先。
+
+    Args:
+        legends: 按日期分组的传奇联赛数据
+
+    Returns:
+        每天最终奖杯数组（没有有效记录的日期被跳过）
+    """
+    days, times, trophies = [], [], []
+    for day_index, day in enumerate(sorted(legends)):
+        day_data = legends[day]
+        for record in day_data.get('new_attacks', []) + day_data.get('new_defenses', []):
+            if record.get('time', 0) > 0 and 'trophies' in record:
+                days.append(day_index)
+                times.append(record['time'])
+                trophies.append(record['trophies'])
+    if not trophies:
+        return np.empty(0)
+
+    days = np.asarray(days)
+    times = np.asarray(times)
+    trophies = np.asarray(trophies, dtype=float)
+    sequence = np.arange(len(trophies))
+
+    # 按 (日期, 时间, 原始顺序倒序) 排序，每个日期分组的最后一项即当天最终奖杯
+    order = np.lexsort((-sequence, times, days))
+    sorted_days = days[order]
+    is_last = np.append(sorted_days[1:] != sorted_days[:-1], True)
+    return trophies[order][is_last]
+
+
+def _nice_step(value_range: float, max_ticks: int) -> float:
+    """计算合适的刻度间隔（1/2/5 × 10^n）"""
+    rough = value_range / max(max_ticks - 1, 1)
+    power = 10 ** np.floor(np.log10(rough))
+    for step in (1, 2, 5, 10):
+        if step * power >= rough:
+            return step * power
+    return 10 * power
+
+
+def _monotone_curve(y: np.ndarray, samples: int = 16) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    单调三次 Hermite 插值（Fritsch-Carlson），与画布版本使用相同的插值方式
+
+    Returns:
+        插值后的 (x, y)，x 为 0..n-1 的数据索引坐标
+    """
+    n = len(y)
+    x = np.arange(n, dtype=float)
+    if n < 2:
+        return np.array([0.0, 1.0]), np.repeat(y, 2)
+
+    delta = np.diff(y)
+    tangent = np.empty(n)
+    tangent[0] = delta[0]
+    tangent[-1] = delta[-1]
+    tangent[1:-1] = np.where(delta[:-1] * delta[1:] <= 0, 0.0, (delta[:-1] + delta[1:]) / 2)
+
+    flat = delta == 0
+    with np.errstate(divide='ignore', invalid='ignore'):
+        a = np.where(flat, 0.0, tangent[:-1] / delta)
+        b = np.where(flat, 0.0, tangent[1:] / delta)
+    s = a * a + b * b
+    scale = np.where(s > 9, 3 / np.sqrt(np.where(s > 0, s, 1)), 1.0)
+    tangent[:-1] = np.where(flat, 0.0, np.where(s > 9, scale * a * delta, tangent[:-1]))
+    tangent[1:] = np.where(flat, 0.0, np.where(s > 9, scale * b * delta, tangent[1:]))
+
+    # 每段取 samples 个点计算 Hermite 基函数
+    t = np.linspace(0, 1, samples, endpoint=False)
+    h00 = 2 * t ** 3 - 3 * t ** 2 + 1
+    h10 = t ** 3 - 2 * t ** 2 + t
+    h01 = -2 * t ** 3 + 3 * t ** 2
+    h11 = t ** 3 - t ** 2
+    curve = (np.outer(y[:-1], h00) + np.outer(tangent[:-1], h10)
+             + np.outer(y[1:], h01) + np.outer(tangent[1:], h11))
+    curve_x = x[:-1, None] + t[None, :]
+    return np.append(curve_x.ravel(), x[-1]), np.append(curve.ravel(), y[-1])
+
+
+@lru_cache(maxsize=128)
+def render_trophy_chart(series: Tuple[float, ...]) -> str:
+    """
+    使用 matplotlib (Agg) 绘制奖杯曲线，相同数据只绘制一次
+
+    Args:
+        series: 每天最终奖杯数
+
+    Returns:
+        PNG 图片的 data URI
+    """
+    dpi = 96 * CHART_SCALE
+    figure = Figure(figsize=(CHART_WIDTH / 96, CHART_HEIGHT / 96), dpi=dpi)
+    FigureCanvasAgg(figure)
+    ax = figure.add_axes((0, 0, 1, 1))
+    ax.set_axis_off()
+
+    y = np.asarray(series, dtype=float)
+    font_pt = FONT_SIZE_PX * 72 / 96
+    if len(y):
+        data_max = float(y.max())
+        step = _nice_step(max(data_max - Y_MIN, 1), MAX_TICKS)
+        y_max = max(np.ceil(data_max / step) * step, Y_MIN + step)
+        ticks = np.arange(Y_MIN, y_max + step / 2, step)
+
+        # 左侧留出刻度文字的宽度，上下留出半行文字的高度（与画布版本的布局一致）
+        label_px = max(len(str(int(tick))) for tick in ticks) * FONT_SIZE_PX * 0.7 + 12
+        margin_y = (FONT_SIZE_PX / 2 + 1) / CHART_HEIGHT
+        ax.set_position((label_px / CHART_WIDTH, margin_y, 1 - label_px / CHART_WIDTH, 1 - 2 * margin_y))
+
+        curve_x, curve_y = _monotone_curve(y)
+        x_max = max(len(y) - 1, 1)
+        ax.set_xlim(0, x_max)
+        ax.set_ylim(Y_MIN, y_max)
+
+        for tick in ticks:
+            ax.axhline(tick, color=GRID_COLOR, linewidth=72 / 96, zorder=0)
+            ax.annotate(str(int(tick)), xy=(0, tick), xycoords=('axes fraction', 'data'),
+                        xytext=(-10 * 72 / 96, 0), textcoords='offset points',
+                        ha='right', va='center', fontsize=font_pt, color=TICK_COLOR, annotation_clip=False)
+
+        # 顶部 0.2 → 底部 0 透明度的渐变填充，裁剪到曲线下方区域
+        gradient = np.zeros((64, 1, 4))
+        gradient[..., :3] = FILL_RGB
+        gradient[..., 3] = np.linspace(0.2, 0.0, 64)[:, None]
+        clip = Polygon(np.column_stack([np.r_[curve_x, curve_x[-1], curve_x[0]],
+                                        np.r_[curve_y, Y_MIN, Y_MIN]]), closed=True, transform=ax.transData)
+        image = ax.imshow(gradient, extent=(0, x_max, Y_MIN, y_max), aspect='auto', origin='upper', zorder=1)
+        image.set_clip_path(clip)
+
+        ax.plot(curve_x, curve_y, color=LINE_COLOR, linewidth=2 * 72 / 96,
+                solid_capstyle='round', solid_joinstyle='round', zorder=2)
+
+    buffer = io.BytesIO()
+    figure.savefig(buffer, format='png', dpi=dpi, transparent=True)
+    return f"data:image/png;base64,{base64.b64encode(buffer.getvalue()).decode('utf-8')}"
+
+
+def trophy_chart_html(legends: Dict[str, Any]) -> str:
+    """
+    生成奖杯曲线的 <img> 标签，图片加载完成后设置 window.__chartReady
+
+    Args:
+        legends: 按日期分组的传奇联赛数据
+    """
+    data_uri = render_trophy_chart(tuple(trophy_series(legends).tolist()))
+    return (f'<img class="trophy-chart-img" src="{data_uri}" alt="奖杯曲线" '
+            f'onload="window.__chartReady = true" onerror="window.__chartReady = true">')
@@ -1,9 +1,9 @@
 import json
 import os
 import asyncio
-import base64 # 导入 base64 模块
 from pathlib import Path
-from playwright.sync_api import sync_playwright
+from .render_pool import standalone_page, capture_html, PhaseTimer
+from .sprites import get_sprite_registry
 from collections import defaultdict # 导入 defaultdict
 
 # 定义图标路径 - 存储文件路径本身
@@ -11,48 +11,23 @@ PIC_SRC_DIR = Path(__file__).parent.parent.parent / "storage/pic_src"
 WIN_STAR_IMG_PATH = PIC_SRC_DIR / 'member/winstar.png'
 LOSE_STAR_IMG_PATH = PIC_SRC_DIR / 'member/losestar.png'
 
-# --- 新增：图片转 Base64 辅助函数 ---
-def _image_to_base64(image_path: Path) -> str | None:
-    """Reads an image file and returns a Base64 data URI string."""
-    if not image_path.is_file():
-        print(f"Warning: Image file not found at {image_path}")
-        return None
-    try:
-        with open(image_path, "rb") as image_file:
-            encoded_string = base64.b64encode(image_file.read()).decode('utf-8')
-        # 推断 MIME 类型，这里简化处理为 png
-        mime_type = "image/png"
-        return f"data:{mime_type};base64,{encoded_string}"
-    except Exception as e:
-        print(f"Error encoding image {image_path}: {e}")
-        return None
-# --- 结束新增 ---
-
-# 修改: 函数签名，接收 json_data 而不是 json_path
-def generate_player_warhits_image(json_data: dict | list, output_path: str | Path):
-    """Processes war data (dict/list), calculates stats, and generates an image using Playwright."""
+# 截图前需要满足的页面就绪条件
+PAGE_READY = ('fonts', 'images')
 
-    # 修改: 移除文件读取逻辑，直接使用 json_data
-    # try:
-    #     with open(json_path, 'r', encoding='utf-8') as f:
-    #         data = json.load(f)
-    # except FileNotFoundError:
-    #     print(f"Error: JSON file not found at {json_path}")
-    #     return
-    # except json.JSONDecodeError:
-    #     print(f"Error: Could not decode JSON from {json_path}")
-    #     return
+# Viewport width and expected content height (the layout does not grow with the data)
+VIEWPORT_WIDTH = 1280
+CONTENT_HEIGHT = 1100
 
-    # 修改: 直接从 json_data 获取 items
-    items = json_data.get('items', []) if isinstance(json_data, dict) else json_data
-    if not items or not isinstance(items, list):
-        print("Invalid or empty war data provided.")
-        return
+def compute_warhits_stats(items: list) -> tuple[dict, float]:
+    """
+    统计玩家部落战/联赛的进攻与防守星数分布，并计算综合评分（HTML 和 Pillow 渲染共用）
 
-    # Assuming all items belong to the same player for this analysis
-    player_name = items[0].get('member_data', {}).get('name', 'Unknown Player')
-    player_tag = items[0].get('member_data', {}).get('tag', 'Unknown Tag')
+    Args:
+        items: 战争记录列表
 
+    Returns:
+        (统计数据, 综合评分)
+    """
     # 初始化统计数据结构
     stats = {
         'random': {
@@ -129,27 +104,68 @@ def generate_player_warhits_image(json_data: dict | list, output_path: str | Pat
         total_weight += random_attack_weight
 
     final_score = (total_weighted_score / total_weight) if total_weight > 0 else 0
+
+    return stats, final_score
+
+
+def generate_player_warhits_html(json_data: dict | list, sprite_sheets: bool | None = None) -> str | None:
+    """Builds the war stats page HTML; returns None for empty data.
+
+    sprite_sheets overrides the HTML_SPRITE_SHEETS setting for the star icons.
+    """
+    # 修改: 移除文件读取逻辑，直接使用 json_data
+    # try:
+    #     with open(json_path, 'r', encoding='utf-8') as f:
+    #         data = json.load(f)
+    # except FileNotFoundError:
+    #     print(f"Error: JSON file not found at {json_path}")
+    #     return
+    # except json.JSONDecodeError:
+    #     print(f"Error: Could not decode JSON from {json_path}")
+    #     return
+
+    # 修改: 直接从 json_data 获取 items
+    items = json_data.get('items', []) if isinstance(json_data, dict) else json_data
+    if not items or not isinstance(items, list):
+        print("Invalid or empty war data provided.")
+        return None
+
+    # Assuming all items belong to the same player for this analysis
+    player_name = items[0].get('member_data', {}).get('name', 'Unknown Player')
+    player_tag = items[0].get('member_data', {}).get('tag', 'Unknown Tag')
+
+    stats, final_score = compute_warhits_stats(items)
     final_score_str = f"{final_score:.1f}"
 
-    # Helper function to generate star images HTML using Base64
+    # 星星图标：合并为雪碧图（页面中只包含一份图片数据），或直接引用缓存的 data URI
+    sprites = get_sprite_registry()
+    if sprite_sheets is None:
+        sprite_sheets = os.getenv('HTML_SPRITE_SHEETS', '1') == '1'
+    if sprite_sheets:
+        star_sheet = sprites.sprite_sheet([WIN_STAR_IMG_PATH, LOSE_STAR_IMG_PATH], height=18)
+        # .star-label span 的左边距规则同样会匹配雪碧图 span，这里恢复星星图标自身的边距
+        sprite_css = star_sheet.css + "\n.star-label .star-image { margin-left: 2px; }"
+        win_star_html = f'<span class="{star_sheet.classes[WIN_STAR_IMG_PATH]} star-image"></span>'
+        lose_star_html = f'<span class="{star_sheet.classes[LOSE_STAR_IMG_PATH]} star-image"></span>'
+    else:
+        sprite_css = ""
+        win_star_base64 = sprites.data_uri(WIN_STAR_IMG_PATH)
+        lose_star_base64 = sprites.data_uri(LOSE_STAR_IMG_PATH)
+        win_star_html = f'<img src="{win_star_base64}" alt="Win Star" class="star-image">' if win_star_base64 else None
+        lose_star_html = f'<img src="{lose_star_base64}" alt="Lose Star" class="star-image">' if lose_star_base64 else None
+
+    # Helper function to generate star images HTML
     def _generate_star_images(stars):
         win_stars = stars
         lose_stars = 3 - stars
         img_html = ''
-        # 获取 Base64 编码后的图片数据
-        win_star_base64 = _image_to_base64(WIN_STAR_IMG_PATH)
-        lose_star_base64 = _image_to_base64(LOSE_STAR_IMG_PATH)
-
-        # 仅在成功获取 Base64 数据时添加 img 标签
-        if win_star_base64:
-            for _ in range(win_stars):
-                img_html += f'<img src="{win_star_base64}" alt="Win Star" class="star-image">'
+        if win_star_html:
+            img_html += win_star_html * win_stars
         else:
             img_html += f'<span class="star-placeholder">[Win Star]*{win_stars}</span>' # Fallback text
 
-        if lose_star_base64:
-            for _ in range(lose_stars):
-                img_html += f'<img src="{lose_star_base64}" alt="Lose Star" class="star-image">'
+        if lose_star_html:
+            img_html += lose_star_html * lose_stars
         else:
             img_html += f'<span class="star-placeholder">[Lose Star]*{lose_stars}</span>' # Fallback text
 
@@ -441,6 +457,7 @@ def generate_player_warhits_image(json_data: dict | list, output_path: str | Pat
                 margin-left: 4px; /* 数字与 TH 标签的间距 */
             }}
         </style>
+        <style>{sprite_css}</style>
     </head>
     <body>
         <div class="container">
@@ -490,25 +507,30 @@ def generate_player_warhits_image(json_data: dict | list, output_path: str | Pat
     </body>
     </html>
     """
+    return html_content
 
-    # --- Generate Image using Playwright --- 
-    with sync_playwright() as p:
-        browser = p.chromium.launch()
-        page = browser.new_page()
-        page.set_content(html_content)
-        
-        # Find the container element and take a screenshot of it
-        container_element = page.query_selector('.container')
-        if container_element:
-            container_element.screenshot(path=output_path)
-            print(f"Image successfully generated at {output_path}")
-        else:
-            print("Error: Could not find the container element to screenshot.")
-            # Fallback: screenshot the whole page if container not found
-            page.screenshot(path=output_path, full_page=True)
-            print(f"Fallback: Screenshotting full page at {output_path}")
 
-        browser.close()
+# 修改: 函数签名，接收 json_data 而不是 json_path
+def generate_player_warhits_image(json_data: dict | list, output_path: str | Path, page=None):
+    """Processes war data (dict/list), calculates stats, and generates an image using Playwright.
+
+    If no pooled page is given, a temporary browser is launched for this call.
+    """
+    if page is None:
+        with standalone_page() as page:
+            return generate_player_warhits_image(json_data, output_path, page)
+
+    timer = PhaseTimer('player_warhits')
+    with timer.phase('html'):
+        html_content = generate_player_warhits_html(json_data)
+    if html_content is None:
+        return
+
+    # --- Generate Image using Playwright ---
+    # Size the viewport once and take a single screenshot of the container
+    capture_html(page, html_content, output_path, '.container', VIEWPORT_WIDTH, CONTENT_HEIGHT, PAGE_READY, timer)
+    print(f"Image successfully generated at {output_path}")
+    timer.finish()
 
 # Example usage (if you want to run this script directly for testing)
 def main():
@@ -0,0 +1,256 @@
+"""
+玩家战争数据图片的 Pillow 渲染器
+
+与 player_warhits.py 的 HTML 版本布局一致（部落战/联赛两列统计 + 右上角综合评分），不需要浏览器。
+"""
+from functools import lru_cache
+from typing import Optional, Tuple
+
+from PIL import Image, ImageDraw
+
+from .player_warhits import compute_warhits_stats, WIN_STAR_IMG_PATH, LOSE_STAR_IMG_PATH
+from .pillow_engine import get_font, load_icon, rounded_box, hex_color, text_width, paste, dashed_line, save_png
+
+# --- 布局（与 HTML 版本的 CSS 对应，单位为像素，1em = 16px） ---
+PAGE_BG = hex_color('#f4f7f9')
+CONTAINER_WIDTH = 800
+CONTAINER_PADDING_Y = 35
+CONTAINER_PADDING_X = 45
+CONTAINER_RADIUS = 18
+COLUMN_GAP = 35
+COLUMN_PADDING = 25
+COLUMN_RADIUS = 12
+COLUMN_COLORS = (hex_color('#f8faff'), hex_color('#fafff8'))
+STAR_ROW_HEIGHT = 27
+STAR_ROW_GAP = 8
+STAR_HEIGHT = 18
+LAYER_HEIGHT = 2000
+
+COLORS = {
+    'border': hex_color('#dde4ea'),
+    'title': hex_color('#00796b'),
+    'name': hex_color('#263238'),
+    'tag': hex_color('#607d8b'),
+    'column_border': hex_color('#e8eef3'),
+    'h4': hex_color('#455a64'),
+    'h4_border': hex_color('#dce4ec'),
+    'h5': hex_color('#00695c'),
+    'h5_border': hex_color('#b2dfdb'),
+    'count': hex_color('#1e88e5'),
+    'percentage': hex_color('#78909c'),
+    'average': hex_color('#00897b'),
+    'average_border': hex_color('#e0e0e0'),
+    'h6': hex_color('#424242'),
+    'th_card': hex_color('#e8f0f3'),
+    'th_card_border': hex_color('#dce4ec'),
+    'th_text': hex_color('#37474f'),
+    'th_count': hex_color('#1a2a3a'),
+    'no_data': hex_color('#90a4ae'),
+    'score_bg': hex_color('#e0f2f1'),
+}
+
+
+@lru_cache(maxsize=4)
+def _star_label(stars: int) -> Image.Image:
+    """星数标签（赢得的星 + 未赢得的星），每种星数只拼接一次"""
+    win = load_icon(str(WIN_STAR_IMG_PATH), STAR_HEIGHT)
+    lose = load_icon(str(LOSE_STAR_IMG_PATH), STAR_HEIGHT)
+    icons = [icon for icon in [win] * stars + [lose] * (3 - stars) if icon]
+    width = sum(icon.width + 5 for icon in icons)
+    label = Image.new('RGBA', (max(width, 1), STAR_HEIGHT), (0, 0, 0, 0))
+    x = 2
+    for icon in icons:
+        label.alpha_composite(icon, (x, 0))
+        x += icon.width + 5
+    return label
+
+
+def _draw_no_data(draw: ImageDraw.ImageDraw, x: int, y: int, text: str = "无数据") -> int:
+    """绘制“无数据”提示，返回占用的高度"""
+    draw.text((x, y + 10 + 10), text, font=get_font(16), fill=COLORS['no_data'], anchor='lm')
+    return 39
+
+
+def _draw_category(layer: Image.Image, draw: ImageDraw.ImageDraw, x: int, y: int, width: int,
+                   title: str, category: dict, descending: bool) -> int:
+    """
+    绘制进攻/防守统计：标题、星数分布、三星率和平均星数
+
+    Returns:
+        绘制结束后的 y 坐标
+    """
+    h5_font = get_font(20.8, bold=True)
+    draw.text((x, y + 12.5), title, font=h5_font, fill=COLORS['h5'], anchor='lm')
+    y += 25 + 5
+    dashed_line(draw, (x, y), x + text_width(h5_font, title), COLORS['h5_border'])
+    y += 1 + 18
+
+    if category['total'] == 0:
+        return y + _draw_no_data(draw, x, y)
+
+    count_font = get_font(16, bold=True)
+    percentage_font = get_font(14.4)
+    row_x = x + 5
+    row_width = width - 5
+    for stars in (range(3, -1, -1) if descending else range(4)):
+        center_y = y + STAR_ROW_HEIGHT / 2
+        label = _star_label(stars)
+        paste(layer, label, (row_x, center_y - label.height / 2))
+
+        # space-between: 星数标签靠左，百分比靠右，次数居中
+        count_text = f"{category['counts'].get(stars, 0)}次"
+        percentage_text = f"({category['percentages'].get(stars, 0):.1f}%)"
+        label_width = max(75, label.width)
+        count_width = max(60, text_width(count_font, count_text))
+        percentage_width = max(80, text_width(percentage_font, percentage_text))
+        spacing = (row_width - label_width - count_width - percentage_width) / 2
+        count_right = row_x + label_width + spacing + count_width
+        draw.text((count_right, center_y), count_text, font=count_font, fill=COLORS['count'], anchor='rm')
+        draw.text((row_x + row_width, center_y), percentage_text, font=percentage_font,
+                  fill=COLORS['percentage'], anchor='rm')
+        y += STAR_ROW_HEIGHT + STAR_ROW_GAP
+    y += 15 - STAR_ROW_GAP
+
+    average_font = get_font(17.6, bold=True)
+    draw.line((x, y, x + width - 1, y), fill=COLORS['average_border'])
+    y += 1 + 6
+    draw.text((x, y + 10.5), f"三星率: {category['percentages'].get(3, 0):.1f}%", font=average_font,
+              fill=COLORS['average'], anchor='lm')
+    y += 21 + 6 + 15 + 6
+    draw.text((x, y + 10.5), f"平均星数: {category['avg_stars']:.2f}", font=average_font,
+              fill=COLORS['average'], anchor='lm')
+    return y + 21 + 6
+
+
+def _draw_opponent_th(layer: Image.Image, draw: ImageDraw.ImageDraw, x: int, y: int, width: int,
+                      th_counts: dict) -> int:
+    """绘制对手大本营分布卡片（自动换行），返回绘制结束后的 y 坐标"""
+    y += 6
+    dashed_line(draw, (x, y), x + width, COLORS['column_border'])
+    y += 1 + 8 + 39
+    draw.text((x, y + 10), "对手本位:", font=get_font(16.8, bold=True), fill=COLORS['h6'], anchor='lm')
+    y += 20
+
+    if not th_counts:
+        return y + 5 + _draw_no_data(draw, x, y + 5, "无进攻数据")
+
+    y += 8
+    text_font = get_font(14.4)
+    count_font = get_font(14.4, bold=True)
+    card_height = 29
+    card_x = x
+    for th, count in sorted(th_counts.items()):
+        label, number = f"TH{th}", str(count)
+        label_width = text_width(text_font, label)
+        card_width = max(60, round(label_width + 4 + text_width(count_font, number)) + 22)
+        if card_x > x and card_x + card_width > x + width:
+            card_x = x
+            y += card_height + 8
+        paste(layer, rounded_box((card_width, card_height), 5, COLORS['th_card'], COLORS['th_card_border']),
+              (card_x, y))
+        text_x = card_x + (card_width - label_width - 4 - text_width(count_font, number)) / 2
+        draw.text((text_x, y + card_height / 2), label, font=text_font, fill=COLORS['th_text'], anchor='lm')
+        draw.text((text_x + label_width + 4, y + card_height / 2), number, font=count_font,
+                  fill=COLORS['th_count'], anchor='lm')
+        card_x += card_width + 8
+    return y + card_height
+
+
+def _draw_column(title: str, war_stats: dict, width: int) -> Tuple[Image.Image, int]:
+    """
+    在透明图层上绘制一列（部落战或联赛）的内容
+
+    Returns:
+        (内容图层, 列的实际高度)
+    """
+    layer = Image.new('RGBA', (width, LAYER_HEIGHT), (0, 0, 0, 0))
+    draw = ImageDraw.Draw(layer)
+    x = 1 + COLUMN_PADDING
+    content_width = width - 2 * x
+    y = 1 + COLUMN_PADDING
+
+    draw.text((width / 2, y + 14.5), title, font=get_font(24, bold=True), fill=COLORS['h4'], anchor='mm')
+    y += 29 + 12
+    draw.rectangle((x, y, x + content_width - 1, y + 1), fill=COLORS['h4_border'])
+    y += 2 + 25
+
+    attacks = war_stats['attacks']
+    y = _draw_category(layer, draw, x, y, content_width, f"进攻 (总计: {attacks['total']})", attacks, True)
+    y = _draw_opponent_th(layer, draw, x, y, content_width, war_stats['opponent_th_counts'])
+    y += 30
+
+    defenses = war_stats['defenses']
+    y = _draw_category(layer, draw, x, y, content_width, f"防守 (总计: {defenses['total']})", defenses, False)
+    y += 15
+    return layer, y + COLUMN_PADDING + 1
+
+
+def _draw_score(score: str) -> Image.Image:
+    """绘制右上角的综合评分徽章"""
+    label_font = get_font(14.4)
+    score_font = get_font(24, bold=True)
+    width = round(max(text_width(label_font, "综合评分"), text_width(score_font, score))) + 2 * 15 + 2
+    height = 17 + 5 + 29 + 2 * 25 + 2
+    badge = rounded_box((width, height), 18, COLORS['score_bg'], COLORS['h5_border']).copy()
+    draw = ImageDraw.Draw(badge)
+    draw.text((width / 2, 26 + 8.5), "综合评分", font=label_font, fill=COLORS['title'], anchor='mm')
+    draw.text((width / 2, 26 + 17 + 5 + 14.5), score, font=score_font, fill=COLORS['h5'], anchor='mm')
+    return badge
+
+
+def render_player_warhits_image(json_data, output_path) -> Optional[str]:
+    """
+    使用 Pillow 生成玩家战争数据图片
+
+    Args:
+        json_data: 包含 items 的数据，或战争记录列表
+        output_path: 输出图片路径
+
+    Returns:
+        成功时返回输出路径，数据为空时返回None
+    """
+    items = json_data.get('items', []) if isinstance(json_data, dict) else json_data
+    if not items or not isinstance(items, list):
+        print("Invalid or empty war data provided.")
+        return None
+
+    player_name = items[0].get('member_data', {}).get('name', 'Unknown Player')
+    player_tag = items[0].get('member_data', {}).get('tag', 'Unknown Tag')
+    stats, final_score = compute_warhits_stats(items)
+
+    inner_width = CONTAINER_WIDTH - 2 * CONTAINER_PADDING_X - 2
+    column_width = (inner_width - COLUMN_GAP) // 2
+    columns = [_draw_column("部落战", stats['random'], column_width),
+               _draw_column("联赛", stats['cwl'], column_width)]
+    # 两列等高（grid 默认拉伸）
+    column_height = max(height for _, height in columns)
+
+    header_height = 36 + 15 + 40 + 8 + 21 + 30
+    grid_top = 1 + CONTAINER_PADDING_Y + header_height
+    height = grid_top + column_height + CONTAINER_PADDING_Y + 1
+
+    canvas = Image.new('RGBA', (CONTAINER_WIDTH, height), PAGE_BG + (255,))
+    paste(canvas, rounded_box((CONTAINER_WIDTH, height), CONTAINER_RADIUS, (255, 255, 255), COLORS['border']), (0, 0))
+    draw = ImageDraw.Draw(canvas)
+
+    # 标题、玩家名称和标签
+    center_x = CONTAINER_WIDTH / 2
+    y = 1 + CONTAINER_PADDING_Y
+    draw.text((center_x, y + 18), "玩家实力分析", font=get_font(30.4, bold=True), fill=COLORS['title'], anchor='mm')
+    y += 36 + 15
+    draw.text((center_x, y + 20), player_name, font=get_font(33.6, bold=True), fill=COLORS['name'], anchor='mm')
+    y += 40 + 8
+    draw.text((center_x, y + 10.5), player_tag, font=get_font(17.6), fill=COLORS['tag'], anchor='mm')
+
+    # 两列统计
+    for index, (layer, _) in enumerate(columns):
+        x = 1 + CONTAINER_PADDING_X + index * (column_width + COLUMN_GAP)
+        paste(canvas, rounded_box((column_width, column_height), COLUMN_RADIUS, COLUMN_COLORS[index],
+                                  COLORS['column_border']), (x, grid_top))
+        canvas.alpha_composite(layer.crop((0, 0, column_width, column_height)), (x, grid_top))
+
+    # 综合评分（绝对定位在右上角）
+    badge = _draw_score(f"{final_score:.1f}")
+    paste(canvas, badge, (CONTAINER_WIDTH - 1 - 30 - badge.width, 1 + 20))
+
+    return save_png(canvas, output_path)
@@ -0,0 +1,485 @@
+"""
+进程隔离的渲染服务
+
+浏览器在独立的渲染进程中运行，机器人进程只通过管道发送渲染任务（渲染函数名、数据、输出路径）
+并接收生成的图片路径，不与浏览器共享内存：Chromium 卡死时按任务超时结束整个渲染进程，
+崩溃时只影响当前任务，调用方收到异常后照常回复文字。
+
+每个渲染进程内部是只有一个浏览器的 RenderPool（页面复用、崩溃重启、预热逻辑不变）。
+渲染进程完成指定数量的任务或内存占用超过上限后由新进程替换。配置项：
+    RENDER_POOL_SIZE            渲染进程数量
+    RENDER_JOB_TIMEOUT          单个渲染任务的超时时间（秒），超时后结束渲染进程
+    RENDER_WORKER_MAX_JOBS      渲染进程完成多少个任务后替换
+    RENDER_WORKER_MAX_RSS_MB    渲染进程（含浏览器子进程）内存上限，需要安装 psutil
+    RENDER_WORKER_START_TIMEOUT 渲染进程启动及预热的超时时间（秒）
+"""
+import os
+import time
+import queue
+import logging
+import importlib
+import itertools
+import threading
+import multiprocessing
+from multiprocessing.connection import Connection, wait
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from .scheduler import JobSchedule, RenderJobQueue, wait_for_result
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+logger = logging.getLogger('ProcessRenderPool')
+
+# 渲染进程使用 spawn 启动：机器人进程中已有多个线程，fork 出的子进程可能继承被占用的锁
+_mp_context = multiprocessing.get_context('spawn')
+
+# 渲染进程启动失败后重新启动前的等待时间（秒）
+RESTART_DELAY = 5
+
+
+def _worker_main(conn: Connection, warm_up: bool) -> None:
+    """
+    渲染进程入口：启动只有一个浏览器的 RenderPool，逐个执行管道中收到的渲染任务
+
+    消息格式（均为元组）：
+        父进程 -> 渲染进程: (任务ID, 模块名, 函数名, 数据, 输出路径, 其他参数)，None 表示退出
+        渲染进程 -> 父进程: ('ready', 预热耗时) / ('failed', 错误信息) / ('done', 任务ID, 结果, 错误信息)
+    """
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+    )
+    from .render_pool import RenderPool
+    from .warmup import warm_up_page
+
+    pool = RenderPool(size=1, warm_up=warm_up_page if warm_up else None)
+    try:
+        pool.start()
+    except Exception as e:
+        conn.send(('failed', str(e)))
+        return
+    conn.send(('ready', pool.warm_up_report()))
+
+    try:
+        while True:
+            try:
+                job = conn.recv()
+            except EOFError:
+                # 父进程已退出
+                break
+            if job is None:
+                break
+            job_id, module_name, func_name, data, output_path, kwargs = job
+            try:
+                render_func = getattr(importlib.import_module(module_name), func_name)
+                result = pool.render(render_func, data, output_path, **kwargs)
+            except Exception as e:
+                conn.send(('done', job_id, None, f"{type(e).__name__}: {str(e)}"))
+                continue
+            conn.send(('done', job_id, result, None))
+    finally:
+        pool.close()
+
+
+class _RenderProcess:
+    """父进程中记录的单个渲染进程状态"""
+
+    def __init__(self, index: int, warm_up: bool):
+        self.name = f"RenderProcess-{index}"
+        self.conn, child_conn = _mp_context.Pipe()
+        self.process = _mp_context.Process(target=_worker_main, args=(child_conn, warm_up),
+                                           name=self.name, daemon=True)
+        self.process.start()
+        # 子进程持有的一端在父进程中关闭，子进程退出后 recv 才能收到 EOF
+        child_conn.close()
+
+        self.started_at = time.monotonic()
+        self.ready = False
+        self.jobs_done = 0
+        self.warm_up_timings: Dict[str, Dict[str, float]] = {}
+        # 正在执行的任务：(任务ID, Future, 开始时间)
+        self.current: Optional[Tuple[int, Future, float]] = None
+
+    @property
+    def idle(self) -> bool:
+        return self.ready and self.current is None
+
+    def rss_mb(self) -> Optional[float]:
+        """渲染进程及其浏览器子进程占用的内存（MB），未安装 psutil 时返回None"""
+        if psutil is None:
+            return None
+        try:
+            proc = psutil.Process(self.process.pid)
+            processes = [proc] + proc.children(recursive=True)
+        except psutil.Error:
+            return None
+        total = 0
+        for p in processes:
+            try:
+                total += p.memory_info().rss
+            except psutil.Error:
+                pass
+        return total / (1024 * 1024)
+
+    def kill(self) -> None:
+        """强制结束渲染进程；安装了 psutil 时同时结束浏览器子进程"""
+        children = []
+        if psutil is not None:
+            try:
+                children = psutil.Process(self.process.pid).children(recursive=True)
+            except psutil.Error:
+                pass
+        if self.process.is_alive():
+            self.process.kill()
+        for child in children:
+            try:
+                child.kill()
+            except psutil.Error:
+                pass
+        self.process.join(timeout=5)
+        self.conn.close()
+
+    def stop(self, timeout: float = 10) -> None:
+        """通知渲染进程关闭浏览器后退出，超时未退出时强制结束"""
+        try:
+            self.conn.send(None)
+        except (OSError, ValueError):
+            pass
+        self.process.join(timeout=timeout)
+        self.kill()
+
+
+class ProcessRenderPool:
+    """
+    进程隔离的渲染池，维护 N 个渲染进程
+
+    渲染任务以 (渲染函数, 数据, 输出路径) 的形式提交，渲染函数需为模块级函数（在渲染进程中按名称导入），
+    签名为 (data, output_path, page=page, **kwargs)，与 RenderPool.render 相同。
+    """
+
+    def __init__(self, size: Optional[int] = None, job_timeout: Optional[int] = None,
+                 max_jobs: Optional[int] = None, max_rss_mb: Optional[int] = None,
+                 start_timeout: Optional[int] = None, warm_up: bool = False):
+        """
+        初始化渲染池
+
+        Args:
+            size: 渲染进程数量，如果为None则从环境变量获取
+            job_timeout: 单个渲染任务的超时时间（秒），超时后结束渲染进程
+            max_jobs: 渲染进程完成多少个任务后替换
+            max_rss_mb: 渲染进程（含浏览器）的内存上限（MB），0 表示不限制
+            start_timeout: 渲染进程启动及预热的超时时间（秒）
+            warm_up: 渲染进程启动后是否用示例数据预热
+        """
+        self.logger = logging.getLogger('ProcessRenderPool')
+        self.logger.setLevel(logging.INFO)
+
+        self.size = size if size is not None else int(os.getenv('RENDER_POOL_SIZE', 2))
+        self.job_timeout = job_timeout if job_timeout is not None else int(os.getenv('RENDER_JOB_TIMEOUT', 60))
+        self.max_jobs = max_jobs if max_jobs is not None else int(os.getenv('RENDER_WORKER_MAX_JOBS', 200))
+        self.max_rss_mb = max_rss_mb if max_rss_mb is not None else int(os.getenv('RENDER_WORKER_MAX_RSS_MB', 1024))
+        self.start_timeout = start_timeout if start_timeout is not None else int(os.getenv('RENDER_WORKER_START_TIMEOUT', 120))
+        self.warm_up = warm_up
+
+        # 等待分配的任务：(任务ID, Future, 模块名, 函数名, 数据, 输出路径, 其他参数)，按优先级及群轮转
+        self._jobs = RenderJobQueue()
+        self._job_ids = itertools.count(1)
+        # 提交任务或关闭时唤醒调度线程
+        self._wakeup_recv, self._wakeup_send = _mp_context.Pipe(duplex=False)
+
+        self._processes: List[Optional[_RenderProcess]] = []
+        # 启动失败的渲染进程槽位 -> 允许重新启动的时间
+        self._restart_at: Dict[int, float] = {}
+        self._last_start_error: Optional[str] = None
+        self._spawned = 0
+        self._dispatcher: Optional[threading.Thread] = None
+        # 正在后台退出的被替换渲染进程
+        self._reapers: List[threading.Thread] = []
+        self._started = threading.Event()
+        self._closing = False
+
+        self._lock = threading.Lock()
+        self._stats = {
+            'jobs_done': 0,
+            'jobs_failed': 0,
+            'jobs_timed_out': 0,
+            'workers_recycled': 0,
+            'workers_crashed': 0,
+        }
+
+    def start(self) -> None:
+        """启动所有渲染进程并等待其就绪（或启动失败）"""
+        if self._dispatcher is not None:
+            return
+        if self.max_rss_mb and psutil is None:
+            self.logger.warning("未安装 psutil，渲染进程的内存上限（RENDER_WORKER_MAX_RSS_MB）不生效")
+        self._processes = [self._spawn() for _ in range(self.size)]
+        self._dispatcher = threading.Thread(target=self._dispatch_loop, name="RenderDispatcher", daemon=True)
+        self._dispatcher.start()
+        self._started.wait()
+
+        ready = sum(1 for p in self._processes if p is not None and p.ready)
+        if not ready:
+            error = self._last_start_error
+            self.close()
+            raise RuntimeError(f"渲染进程启动失败: {error}")
+        self.logger.info(f"渲染进程池启动完成: {ready}/{self.size} 个渲染进程可用")
+
+    def _spawn(self) -> _RenderProcess:
+        process = _RenderProcess(self._spawned, self.warm_up)
+        self._spawned += 1
+        self.logger.info(f"[{process.name}] 渲染进程已启动 (pid={process.process.pid})")
+        return process
+
+    def render(self, render_func: Callable[..., Any], data: Any, output_path: str,
+               schedule: Optional[JobSchedule] = None, **kwargs) -> Any:
+        """
+        在渲染进程中执行渲染函数并等待结果
+
+        Args:
+            render_func: 模块级渲染函数，签名为 (data, output_path, page=page, **kwargs)
+            data: 渲染数据（需可序列化）
+            output_path: 图片保存路径
+            schedule: 调度信息（优先级、群、截止时间），为None时按交互式任务处理
+            **kwargs: 传递给渲染函数的其他参数（需可序列化）
+
+        Returns:
+            渲染函数的返回值
+
+        Raises:
+            RenderDeadlineExceeded: 排队超过截止时间，任务已取消
+            TimeoutError: 渲染超时（渲染进程已被结束）
+            RuntimeError: 渲染失败或渲染进程异常退出
+        """
+        return wait_for_result(self.submit(render_func, data, output_path, schedule=schedule, **kwargs), schedule)
+
+    def submit(self, render_func: Callable[..., Any], data: Any, output_path: str,
+               schedule: Optional[JobSchedule] = None, **kwargs) -> Future:
+        """提交渲染任务，返回任务的 Future 对象"""
+        if self._dispatcher is None:
+            raise RuntimeError("渲染进程池尚未启动")
+        if self._closing:
+            raise RuntimeError("渲染进程池已关闭")
+        future = Future()
+        self._jobs.put((next(self._job_ids), future, render_func.__module__, render_func.__name__,
+                        data, str(output_path), kwargs), schedule)
+        self._wakeup_send.send_bytes(b'')
+        return future
+
+    def warm_up_report(self) -> Dict[str, Dict[str, float]]:
+        """获取各渲染进程最近一次预热的耗时：渲染进程名称 -> 模式 -> 毫秒"""
+        report = {}
+        for process in self._processes:
+            if process is None:
+                continue
+            for worker, timings in process.warm_up_timings.items():
+                report[f"{process.name}/{worker}"] = dict(timings)
+        return report
+
+    def _record(self, key: str, value: int = 1) -> None:
+        with self._lock:
+            self._stats[key] += value
+
+    def stats(self) -> Dict[str, int]:
+        """获取渲染进程池运行统计"""
+        with self._lock:
+            stats = dict(self._stats)
+        stats['workers'] = sum(1 for p in self._processes if p is not None and p.ready)
+        stats['queued'] = self._jobs.qsize()
+        return stats
+
+    def close(self) -> None:
+        """关闭所有渲染进程，未完成的任务以异常结束"""
+        if self._dispatcher is None:
+            return
+        self._closing = True
+        self._wakeup_send.send_bytes(b'')
+        self._dispatcher.join(timeout=30)
+        self._dispatcher = None
+        for reaper in self._reapers:
+            reaper.join(timeout=30)
+        self._reapers = []
+        self.logger.info("渲染进程池已关闭")
+
+    # --- 调度线程 ---
+
+    def _dispatch_loop(self) -> None:
+        """调度线程：分配任务、接收结果、检查超时及回收渲染进程"""
+        while not self._closing:
+            self._check_processes()
+            if not self._started.is_set() and all(p is None or p.ready for p in self._processes):
+                self._started.set()
+            self._assign_jobs()
+
+            conns = [p.conn for p in self._processes if p is not None]
+            for conn in wait(conns + [self._wakeup_recv], timeout=self._poll_interval()):
+                if conn is self._wakeup_recv:
+                    self._wakeup_recv.recv_bytes()
+                    continue
+                process = next((p for p in self._processes if p is not None and p.conn is conn), None)
+                if process is not None:
+                    self._receive(process)
+
+        # 关闭：结束所有渲染进程，未完成的任务以异常结束
+        for index, process in enumerate(self._processes):
+            if process is not None:
+                self._fail_current(process, RuntimeError("渲染进程池已关闭"))
+                process.stop()
+                self._processes[index] = None
+        self._fail_pending(RuntimeError("渲染进程池已关闭"))
+        self._started.set()
+
+    def _poll_interval(self) -> float:
+        """距离最近一个任务超时（或启动超时、重新启动）的时间，用作等待消息的超时"""
+        now = time.monotonic()
+        deadlines = list(self._restart_at.values())
+        for process in self._processes:
+            if process is None:
+                continue
+            if not process.ready:
+                deadlines.append(process.started_at + self.start_timeout)
+            elif process.current is not None:
+                deadlines.append(process.current[2] + self.job_timeout)
+        if not deadlines:
+            return 1.0
+        return min(max(min(deadlines) - now, 0.01), 1.0)
+
+    def _receive(self, process: _RenderProcess) -> None:
+        """读取渲染进程的一条消息；管道关闭说明渲染进程已退出"""
+        try:
+            message = process.conn.recv()
+        except (EOFError, OSError):
+            self._replace(process, "渲染进程异常退出", crashed=True)
+            return
+
+        kind = message[0]
+        if kind == 'ready':
+            process.ready = True
+            process.warm_up_timings = message[1]
+            self.logger.info(f"[{process.name}] 渲染进程就绪，启动耗时 {time.monotonic() - process.started_at:.1f}s")
+        elif kind == 'failed':
+            self._last_start_error = message[1]
+            self.logger.error(f"[{process.name}] 渲染进程中的浏览器启动失败: {message[1]}")
+            self._replace(process, message[1], start_failed=True)
+        elif kind == 'done':
+            _, job_id, result, error = message
+            if process.current is None or process.current[0] != job_id:
+                return
+            _, future, _ = process.current
+            process.current = None
+            process.jobs_done += 1
+            if error is None:
+                future.set_result(result)
+                self._record('jobs_done')
+            else:
+                future.set_exception(RuntimeError(error))
+                self._record('jobs_failed')
+            self._maybe_recycle(process)
+
+    def _check_processes(self) -> None:
+        """检查任务超时、启动超时及意外退出的渲染进程，并重新启动空出的槽位"""
+        now = time.monotonic()
+        for index, process in enumerate(self._processes):
+            if process is None:
+                if self._restart_at.get(index, 0) <= now:
+                    self._restart_at.pop(index, None)
+                    self._processes[index] = self._spawn()
+                continue
+            if not process.process.is_alive() and not process.conn.poll():
+                self._replace(process, f"渲染进程异常退出 (exitcode={process.process.exitcode})", crashed=True)
+            elif not process.ready and now - process.started_at > self.start_timeout:
+                self._last_start_error = f"启动超过 {self.start_timeout} 秒"
+                self.logger.error(f"[{process.name}] 渲染进程{self._last_start_error}，正在结束")
+                self._replace(process, self._last_start_error, start_failed=True)
+            elif process.current is not None and now - process.current[2] > self.job_timeout:
+                self.logger.error(f"[{process.name}] 渲染任务超过 {self.job_timeout} 秒未完成，正在结束渲染进程")
+                self._record('jobs_timed_out')
+                self._fail_current(process, TimeoutError(f"渲染超过 {self.job_timeout} 秒未完成"))
+                self._replace(process, "渲染超时")
+
+    def _assign_jobs(self) -> None:
+        """将等待中的任务分配给空闲的渲染进程"""
+        # 没有可用的渲染进程（全部启动失败）时，等待中的任务直接失败，避免调用方一直等待到截止时间
+        if all(p is None for p in self._processes) and self._last_start_error:
+            self._fail_pending(RuntimeError(f"渲染进程启动失败: {self._last_start_error}"))
+            return
+
+        for process in self._processes:
+            if process is None or not process.idle:
+                continue
+            while True:
+                try:
+                    job_id, future, module_name, func_name, data, output_path, kwargs = self._jobs.get_nowait()
+                except queue.Empty:
+                    return
+                # 调用方已取消的任务直接丢弃
+                if future.set_running_or_notify_cancel():
+                    break
+            try:
+                process.conn.send((job_id, module_name, func_name, data, output_path, kwargs))
+            except Exception as e:
+                future.set_exception(RuntimeError(f"渲染任务发送失败: {str(e)}"))
+                self._record('jobs_failed')
+                continue
+            process.current = (job_id, future, time.monotonic())
+
+    def _maybe_recycle(self, process: _RenderProcess) -> None:
+        """渲染进程完成的任务数或内存占用超过上限时替换为新进程"""
+        reason = None
+        if self.max_jobs and process.jobs_done >= self.max_jobs:
+            reason = f"已完成 {process.jobs_done} 个任务"
+        elif self.max_rss_mb:
+            rss = process.rss_mb()
+            if rss is not None and rss > self.max_rss_mb:
+                reason = f"内存占用 {rss:.0f}MB 超过上限 {self.max_rss_mb}MB"
+        if reason:
+            self.logger.info(f"[{process.name}] {reason}，替换渲染进程")
+            self._record('workers_recycled')
+            index = self._processes.index(process)
+            self._processes[index] = self._spawn()
+            self._reap(process)
+
+    def _reap(self, process: _RenderProcess) -> None:
+        """在后台线程中通知被替换的渲染进程退出，调度线程不等待其关闭浏览器"""
+        self._reapers = [reaper for reaper in self._reapers if reaper.is_alive()]
+        reaper = threading.Thread(target=process.stop, name=f"{process.name}-Reaper", daemon=True)
+        reaper.start()
+        self._reapers.append(reaper)
+
+    def _replace(self, process: _RenderProcess, reason: str, crashed: bool = False, start_failed: bool = False) -> None:
+        """结束渲染进程（当前任务以异常结束）并在槽位中启动新进程；启动失败时延迟重新启动"""
+        if crashed:
+            self.logger.error(f"[{process.name}] {reason}")
+            self._record('workers_crashed')
+        self._fail_current(process, RuntimeError(reason))
+        process.kill()
+        index = self._processes.index(process)
+        if start_failed:
+            self._processes[index] = None
+            self._restart_at[index] = time.monotonic() + RESTART_DELAY
+        else:
+            self._processes[index] = self._spawn()
+
+    def _fail_current(self, process: _RenderProcess, error: Exception) -> None:
+        if process.current is None:
+            return
+        _, future, _ = process.current
+        process.current = None
+        if not future.done():
+            future.set_exception(error)
+            self._record('jobs_failed')
+
+    def _fail_pending(self, error: Exception) -> None:
+        while True:
+            try:
+                job = self._jobs.get_nowait()
+            except queue.Empty:
+                return
+            future = job[1]
+            if future.set_running_or_notify_cancel():
+                future.set_exception(error)
+                self._record('jobs_failed')
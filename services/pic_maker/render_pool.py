@@ -0,0 +1,516 @@
+import os
+import time
+import logging
+import weakref
+import mimetypes
+import threading
+from pathlib import Path
+from concurrent.futures import Future
+from contextlib import contextmanager
+from functools import lru_cache
+from typing import Any, Callable, Dict, Iterable, Optional, Union
+from urllib.parse import quote, unquote, urlsplit
+
+from playwright.sync_api import sync_playwright, TimeoutError as PlaywrightTimeoutError
+
+from .scheduler import JobSchedule, RenderJobQueue, wait_for_result
+from .sprites import get_sprite_registry, TRANSPARENT_PIXEL
+
+# 渲染页面使用的虚拟站点：页面 HTML 和本地图标都通过请求拦截从内存提供，不写临时文件
+RENDER_ORIGIN = "http://render.local"
+RENDER_DOCUMENT_URL = f"{RENDER_ORIGIN}/index.html"
+ASSET_PATH_PREFIX = "/assets/"
+
+# 页面 -> 当前要提供的 HTML（每个页面只注册一次请求拦截）
+_page_documents: "weakref.WeakKeyDictionary[Any, Dict[str, str]]" = weakref.WeakKeyDictionary()
+
+# 页面就绪条件：模板声明截图前需要满足的条件，渲染时只等待这些条件
+READY_CONDITIONS = {
+    # 页面使用的字体已加载
+    'fonts': "document.fonts.status === 'loaded'",
+    # 所有 <img> 已加载完成（加载失败的图片同样视为完成）
+    'images': "Array.from(document.images).every(img => img.complete)",
+    # 奖杯曲线已绘制（图表脚本或图表图片设置的信号）
+    'chart': "window.__chartReady === true",
+}
+DEFAULT_READY = ('fonts', 'images')
+
+# 按预估内容高度设置视口时的上下限（像素）
+MIN_VIEWPORT_HEIGHT = 600
+MAX_VIEWPORT_HEIGHT = 8000
+
+logger = logging.getLogger('RenderPool')
+
+# 各模式各渲染阶段的累计耗时：mode -> phase -> [次数, 总耗时, 最大耗时]
+_phase_stats: Dict[str, Dict[str, list]] = {}
+_phase_stats_lock = threading.Lock()
+
+
+class PhaseTimer:
+    """
+    记录一次渲染各阶段（生成HTML、加载、等待就绪、截图）的耗时
+
+    用法:
+        timer = PhaseTimer('clan_info')
+        with timer.phase('html'):
+            ...
+        timer.finish()
+    """
+
+    def __init__(self, mode: str):
+        self.mode = mode
+        self.phases: Dict[str, float] = {}
+        self.ready = True
+
+    @contextmanager
+    def phase(self, name: str):
+        """计时一个阶段，同名阶段的耗时累加"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases[name] = self.phases.get(name, 0.0) + (time.perf_counter() - start) * 1000
+
+    def finish(self) -> Dict[str, float]:
+        """结束计时，将本次各阶段耗时计入全局统计"""
+        with _phase_stats_lock:
+            mode_stats = _phase_stats.setdefault(self.mode, {})
+            for name, elapsed in self.phases.items():
+                entry = mode_stats.setdefault(name, [0, 0.0, 0.0])
+                entry[0] += 1
+                entry[1] += elapsed
+                entry[2] = max(entry[2], elapsed)
+        summary = ", ".join(f"{name} {elapsed:.0f}ms" for name, elapsed in self.phases.items())
+        logger.debug(f"[{self.mode}] 渲染耗时: {summary}{'' if self.ready else '（未等到就绪条件）'}")
+        return self.phases
+
+
+def phase_stats() -> Dict[str, Dict[str, Dict[str, float]]]:
+    """
+    获取各模式各渲染阶段的耗时统计
+
+    Returns:
+        mode -> phase -> {'count', 'avg_ms', 'max_ms'}
+    """
+    with _phase_stats_lock:
+        return {
+            mode: {name: {'count': count, 'avg_ms': total / count, 'max_ms': peak}
+                   for name, (count, total, peak) in phases.items()}
+            for mode, phases in _phase_stats.items()
+        }
+
+
+class _BrowserWorker(threading.Thread):
+    """
+    持有单个 Chromium 实例的工作线程
+
+    Playwright 同步 API 的对象只能在创建它的线程中使用，因此浏览器、上下文和页面
+    都由该线程创建并独占，渲染任务通过队列交给它执行。
+    """
+
+    def __init__(self, pool: 'RenderPool', index: int):
+        super().__init__(name=f"RenderWorker-{index}", daemon=True)
+        self.pool = pool
+        self.index = index
+        self.logger = pool.logger
+
+        self._playwright = None
+        self._browser = None
+        self._context = None
+        self._page = None
+        self._page_uses = 0
+
+        # 启动完成（或失败）后置位，供 RenderPool.start 等待
+        self.ready = threading.Event()
+        self.start_error: Optional[Exception] = None
+        # 最近一次预热各模式的耗时（毫秒）
+        self.warm_up_timings: Dict[str, float] = {}
+
+    def run(self):
+        with sync_playwright() as p:
+            self._playwright = p
+            try:
+                self._ensure_page()
+            except Exception as e:
+                self.logger.error(f"[{self.name}] 浏览器启动失败: {str(e)}")
+                self.start_error = e
+            finally:
+                self.ready.set()
+
+            while True:
+                job = self.pool._jobs.get()
+                if job is None:
+                    # 收到退出信号
+                    break
+                self._execute(job)
+
+            self._close_browser()
+
+    def _launch_browser(self):
+        """启动（或重启）浏览器"""
+        self._close_browser()
+        self._browser = self._playwright.chromium.launch(**self.pool.launch_options)
+        self.logger.info(f"[{self.name}] 浏览器已启动")
+
+    def _close_browser(self):
+        """关闭浏览器，忽略已崩溃浏览器的关闭错误"""
+        self._page = None
+        self._context = None
+        if self._browser is not None:
+            try:
+                self._browser.close()
+            except Exception:
+                pass
+            self._browser = None
+
+    def _new_page(self):
+        """在新的浏览器上下文中预创建页面"""
+        self._context = self._browser.new_context(viewport=self.pool.viewport,
+                                                  device_scale_factor=self.pool.device_scale_factor)
+        self._page = self._context.new_page()
+        self._page_uses = 0
+
+    def _recycle_page(self):
+        """关闭当前页面及上下文，下一次任务前重新创建"""
+        if self._context is not None:
+            try:
+                self._context.close()
+            except Exception:
+                pass
+        self._context = None
+        self._page = None
+        self.pool._record('pages_recycled')
+
+    def _ensure_page(self):
+        """确保浏览器存活且有可用页面，浏览器崩溃时自动重启"""
+        launched = False
+        if self._browser is None or not self._browser.is_connected():
+            if self._browser is not None:
+                self.logger.warning(f"[{self.name}] 检测到浏览器已断开，正在重启...")
+                self.pool._record('browser_restarts')
+            self._launch_browser()
+            launched = True
+        if self._page is None or self._page.is_closed():
+            self._new_page()
+        if launched and self.pool.warm_up is not None:
+            self._warm_up()
+        return self._page
+
+    def _warm_up(self):
+        """新启动的浏览器先在常驻页面上渲染一遍示例页面，加载字体并解码图标（页面保留给后续任务）"""
+        start = time.perf_counter()
+        try:
+            self.warm_up_timings = self.pool.warm_up(self._page) or {}
+        except Exception as e:
+            self.logger.warning(f"[{self.name}] 预热失败: {str(e)}")
+            self.warm_up_timings = {}
+        summary = ", ".join(f"{mode} {elapsed:.0f}ms" for mode, elapsed in self.warm_up_timings.items())
+        self.logger.info(f"[{self.name}] 预热完成，耗时 {(time.perf_counter() - start) * 1000:.0f}ms（{summary or '无'}）")
+
+    def _execute(self, job):
+        fn, args, kwargs, future = job
+        if not future.set_running_or_notify_cancel():
+            return
+
+        try:
+            page = self._ensure_page()
+            result = fn(page, *args, **kwargs)
+        except Exception as e:
+            future.set_exception(e)
+            self.pool._record('jobs_failed')
+            # 出错后页面状态未知，直接回收；若浏览器已崩溃，下次任务前会重启
+            self._recycle_page()
+            return
+
+        future.set_result(result)
+        self.pool._record('jobs_done')
+        self._page_uses += 1
+        if self._page_uses >= self.pool.max_page_uses:
+            self._recycle_page()
+
+
+class RenderPool:
+    """
+    常驻渲染服务，维护 N 个已启动的 Chromium 浏览器及预创建的页面
+
+    渲染器以 `fn(page, *args, **kwargs)` 的形式提交任务，由空闲浏览器执行，
+    页面在使用指定次数后回收重建，浏览器崩溃后自动重启。
+    """
+
+    def __init__(self, size: Optional[int] = None, max_page_uses: Optional[int] = None,
+                 job_timeout: Optional[int] = None, launch_options: Optional[Dict[str, Any]] = None,
+                 warm_up: Optional[Callable[[Any], Dict[str, float]]] = None):
+        """
+        初始化浏览器池
+
+        Args:
+            size: 浏览器数量，如果为None则从环境变量获取
+            max_page_uses: 单个页面的最大使用次数，超过后回收重建
+            job_timeout: 单个渲染任务的超时时间（秒）
+            launch_options: 传递给 chromium.launch 的参数
+            warm_up: 预热函数，每个浏览器启动（或重启）后以页面为参数调用一次，返回各模式耗时（毫秒）
+        """
+        self.logger = logging.getLogger('RenderPool')
+        self.logger.setLevel(logging.INFO)
+
+        self.size = size if size is not None else int(os.getenv('RENDER_POOL_SIZE', 2))
+        self.max_page_uses = max_page_uses if max_page_uses is not None else int(os.getenv('RENDER_PAGE_MAX_USES', 50))
+        self.job_timeout = job_timeout if job_timeout is not None else int(os.getenv('RENDER_JOB_TIMEOUT', 60))
+        self.launch_options = launch_options or {}
+        self.warm_up = warm_up
+        self.viewport = {"width": 1280, "height": 720}
+        # 设备像素比：大于 1 时输出更清晰但更大的图片
+        self.device_scale_factor = float(os.getenv('RENDER_DEVICE_SCALE', 1))
+
+        # 按优先级及群轮转的任务队列
+        self._jobs = RenderJobQueue()
+        self._workers: list[_BrowserWorker] = []
+        self._lock = threading.Lock()
+        self._stats = {
+            'jobs_done': 0,
+            'jobs_failed': 0,
+            'pages_recycled': 0,
+            'browser_restarts': 0,
+        }
+
+    def start(self):
+        """启动所有浏览器并等待其就绪"""
+        if self._workers:
+            return
+        for i in range(self.size):
+            worker = _BrowserWorker(self, i)
+            worker.start()
+            self._workers.append(worker)
+        for worker in self._workers:
+            worker.ready.wait()
+
+        failed = [w for w in self._workers if w.start_error is not None]
+        if len(failed) == len(self._workers):
+            raise RuntimeError(f"浏览器池启动失败: {str(failed[0].start_error)}")
+        self.logger.info(f"浏览器池启动完成: {self.size - len(failed)}/{self.size} 个浏览器可用")
+
+    def submit(self, fn: Callable[..., Any], *args, schedule: Optional[JobSchedule] = None, **kwargs) -> Future:
+        """
+        提交渲染任务
+
+        Args:
+            fn: 渲染函数，第一个参数为 Playwright 页面
+            *args, **kwargs: 传递给渲染函数的其他参数
+            schedule: 调度信息（优先级、群、截止时间），为None时按交互式任务处理
+
+        Returns:
+            任务的 Future 对象
+        """
+        if not self._workers:
+            raise RuntimeError("浏览器池尚未启动")
+        future = Future()
+        self._jobs.put((fn, args, kwargs, future), schedule)
+        return future
+
+    def run(self, fn: Callable[..., Any], *args, schedule: Optional[JobSchedule] = None, **kwargs) -> Any:
+        """提交渲染任务并等待结果，排队超过截止时间时抛出 RenderDeadlineExceeded"""
+        return wait_for_result(self.submit(fn, *args, schedule=schedule, **kwargs), schedule, self.job_timeout)
+
+    def render(self, render_func: Callable[..., Any], data: Any, output_path: str,
+               schedule: Optional[JobSchedule] = None, **kwargs) -> Any:
+        """
+        执行渲染器的图片生成函数并等待结果（与 ProcessRenderPool.render 接口相同）
+
+        Args:
+            render_func: 渲染函数，签名为 (data, output_path, page=page, **kwargs)
+            data: 渲染数据
+            output_path: 图片保存路径
+            schedule: 调度信息（优先级、群、截止时间）
+            **kwargs: 传递给渲染函数的其他参数
+        """
+        return self.run(lambda page: render_func(data, output_path, page=page, **kwargs), schedule=schedule)
+
+    def warm_up_report(self) -> Dict[str, Dict[str, float]]:
+        """获取各浏览器最近一次预热的耗时：worker 名称 -> 模式 -> 毫秒"""
+        return {worker.name: dict(worker.warm_up_timings) for worker in self._workers}
+
+    def _record(self, key: str, value: int = 1):
+        with self._lock:
+            self._stats[key] += value
+
+    def stats(self) -> Dict[str, int]:
+        """获取浏览器池运行统计"""
+        with self._lock:
+            stats = dict(self._stats)
+        stats['browsers'] = sum(1 for w in self._workers if w.is_alive())
+        stats['queued'] = self._jobs.qsize()
+        return stats
+
+    def close(self):
+        """关闭所有浏览器"""
+        for _ in self._workers:
+            self._jobs.put(None)
+        for worker in self._workers:
+            worker.join(timeout=10)
+        self._workers = []
+        self.logger.info("浏览器池已关闭")
+
+
+@contextmanager
+def standalone_page(viewport: Optional[Dict[str, int]] = None):
+    """
+    临时启动浏览器并提供页面，用于脚本直接运行等没有浏览器池的场景
+
+    Args:
+        viewport: 页面视口大小
+    """
+    with sync_playwright() as p:
+        browser = p.chromium.launch()
+        try:
+            yield browser.new_page(viewport=viewport, device_scale_factor=float(os.getenv('RENDER_DEVICE_SCALE', 1)))
+        finally:
+            browser.close()
+
+
+def asset_url(path: Union[str, Path]) -> str:
+    """
+    本地图标在渲染页面中的地址
+
+    Args:
+        path: 图标路径（绝对路径或相对于 storage/pic_src）
+
+    Returns:
+        虚拟站点下的图标地址；不在图标目录中的文件返回 data URI
+    """
+    url = _asset_path_url(path)
+    if url is None:
+        return get_sprite_registry().data_uri(path, TRANSPARENT_PIXEL)
+    return url
+
+
+@lru_cache(maxsize=4096)
+def _asset_path_url(path: Union[str, Path]) -> Optional[str]:
+    """图标路径转换为虚拟站点地址（只做路径计算，结果缓存），不在图标目录中时返回None"""
+    registry = get_sprite_registry()
+    try:
+        relative = registry.resolve(path).relative_to(registry.root)
+    except ValueError:
+        return None
+    return f"{RENDER_ORIGIN}{ASSET_PATH_PREFIX}{quote(relative.as_posix())}"
+
+
+def _serve_request(document: Dict[str, str], route) -> None:
+    """提供虚拟站点的请求：页面 HTML 及图标目录下的文件"""
+    path = unquote(urlsplit(route.request.url).path)
+    if path.startswith(ASSET_PATH_PREFIX):
+        registry = get_sprite_registry()
+        file_path = (registry.root / path[len(ASSET_PATH_PREFIX):]).resolve()
+        # 只允许访问图标目录内的文件
+        content = registry.read(file_path) if file_path.is_relative_to(registry.root.resolve()) else None
+        if content is None:
+            route.fulfill(status=404, body="")
+            return
+        route.fulfill(status=200, body=content,
+                      content_type=mimetypes.guess_type(file_path.name)[0] or "application/octet-stream")
+        return
+    route.fulfill(status=200, body=document['html'], content_type="text/html; charset=utf-8")
+
+
+def wait_until_ready(page, conditions: Iterable[str] = DEFAULT_READY, timeout: Optional[float] = None) -> bool:
+    """
+    等待页面满足模板声明的就绪条件
+
+    Args:
+        page: Playwright 页面
+        conditions: READY_CONDITIONS 中的条件名
+        timeout: 等待时间上限（毫秒），为None时从环境变量获取
+
+    Returns:
+        是否在时间内就绪；超时只记录警告，调用方照常截图
+    """
+    expressions = [READY_CONDITIONS[name] for name in conditions]
+    if not expressions:
+        return True
+    if timeout is None:
+        timeout = float(os.getenv('RENDER_READY_TIMEOUT', 3000))
+    try:
+        page.wait_for_function(" && ".join(f"({expression})" for expression in expressions), timeout=timeout)
+        return True
+    except PlaywrightTimeoutError:
+        logger.warning(f"页面在 {timeout:.0f}ms 内未满足就绪条件 {list(conditions)}，直接截图")
+        return False
+
+
+def load_html(page, html: str, ready: Iterable[str] = DEFAULT_READY, timeout: Optional[float] = None,
+              timer: Optional[PhaseTimer] = None, load_timeout: Optional[float] = None) -> bool:
+    """
+    在页面中加载内存中的 HTML，并等待模板声明的就绪条件
+
+    页面地址为虚拟站点 RENDER_DOCUMENT_URL，HTML 和 asset_url 生成的图标地址都由请求拦截直接返回，
+    不需要写临时文件，同一进程中的多个页面可以同时渲染。
+
+    Args:
+        page: Playwright 页面
+        html: 页面 HTML
+        ready: 就绪条件（READY_CONDITIONS 中的条件名）
+        timeout: 等待就绪条件的时间预算（毫秒），为None时从环境变量获取
+        timer: 记录 load / ready 阶段耗时的计时器
+        load_timeout: 加载文档（domcontentloaded）的时间上限（毫秒），为None时从环境变量获取
+
+    Returns:
+        是否在时间预算内就绪；加载或就绪超时只记录警告，调用方照常截图
+    """
+    if timeout is None:
+        timeout = float(os.getenv('RENDER_READY_TIMEOUT', 3000))
+    if load_timeout is None:
+        load_timeout = float(os.getenv('RENDER_LOAD_TIMEOUT', 30000))
+    timer = timer or PhaseTimer('unknown')
+
+    document = _page_documents.get(page)
+    if document is None:
+        document = {'html': ''}
+        page.route(f"{RENDER_ORIGIN}/**", lambda route: _serve_request(document, route))
+        _page_documents[page] = document
+    document['html'] = html
+
+    with timer.phase('load'):
+        try:
+            page.goto(RENDER_DOCUMENT_URL, wait_until="domcontentloaded", timeout=load_timeout)
+        except PlaywrightTimeoutError:
+            logger.warning(f"页面在 {load_timeout:.0f}ms 内未完成加载，直接截图")
+            timer.ready = False
+            return timer.ready
+    with timer.phase('ready'):
+        timer.ready = wait_until_ready(page, ready, timeout)
+    return timer.ready
+
+
+def capture_html(page, html: str, output_path: Union[str, Path], selector: str, width: int, height: int,
+                 ready: Iterable[str] = DEFAULT_READY, timer: Optional[PhaseTimer] = None) -> bool:
+    """
+    加载页面并对内容元素截取一次图片
+
+    视口按渲染器根据数据预估的内容高度只设置一次，内容完整落在视口内，截图时不再需要查询尺寸、
+    调整视口（触发重新布局）后再次截图；预估偏小时 Playwright 仍会截取完整的元素。
+    页面中没有内容元素时截取整个页面。
+
+    Args:
+        page: Playwright 页面
+        html: 页面 HTML
+        output_path: 图片保存路径
+        selector: 截图的内容元素
+        width: 视口宽度
+        height: 预估的内容高度（像素）
+        ready: 就绪条件（READY_CONDITIONS 中的条件名）
+        timer: 记录各阶段耗时的计时器
+
+    Returns:
+        是否在时间预算内就绪
+    """
+    timer = timer or PhaseTimer('unknown')
+    page.set_viewport_size({"width": width, "height": max(MIN_VIEWPORT_HEIGHT, min(int(height), MAX_VIEWPORT_HEIGHT))})
+    ready = load_html(page, html, ready, timer=timer)
+    with timer.phase('screenshot'):
+        target = page.locator(selector)
+        if target.count():
+            target.screenshot(path=str(output_path))
+        else:
+            # 页面中没有内容元素（如模板的兜底页面）时截取整个页面，不等待定位超时
+            logger.warning(f"页面中没有内容元素 {selector}，截取整个页面")
+            page.screenshot(path=str(output_path), full_page=True)
+    return ready
@@ -0,0 +1,159 @@
+import os
+import json
+import time
+import hashlib
+import logging
+import threading
+from pathlib import Path
+from typing import Any, Dict, Iterable, Optional
+
+
+class RenderResultCache:
+    """
+    渲染结果缓存：以 (模式, 渲染器版本, 规范化后的数据) 的哈希为键复用已生成的图片
+
+    索引常驻内存（查询为 O(1) 字典查找），并持久化到缓存目录下的索引文件，
+    重启后仍可复用之前生成的图片。索引变化后延迟 flush_interval 秒合并写入一次，
+    不在每次渲染后重写整个索引文件。
+    """
+
+    INDEX_FILE = "render_index.json"
+
+    def __init__(self, cache_dir: Path, flush_interval: Optional[float] = None):
+        """
+        初始化渲染结果缓存
+
+        Args:
+            cache_dir: 图片缓存目录
+            flush_interval: 索引变化后延迟写入的秒数，如果为None则从环境变量获取
+        """
+        self.logger = logging.getLogger('RenderResultCache')
+        self.logger.setLevel(logging.INFO)
+
+        self.cache_dir = Path(cache_dir)
+        self.index_path = self.cache_dir / self.INDEX_FILE
+        self._lock = threading.Lock()
+        self._index: Dict[str, Dict[str, Any]] = self._load_index()
+        self.flush_interval = flush_interval if flush_interval is not None else float(os.getenv('RENDER_INDEX_FLUSH_INTERVAL', 30))
+        self._flush_timer: Optional[threading.Timer] = None
+        self.hits = 0
+        self.misses = 0
+
+    def _load_index(self) -> Dict[str, Dict[str, Any]]:
+        if not self.index_path.exists():
+            return {}
+        try:
+            with open(self.index_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except Exception as e:
+            self.logger.error(f"加载渲染索引失败: {str(e)}")
+            return {}
+
+    def _save_index(self) -> None:
+        """原子地写入索引文件，调用方需持有锁"""
+        tmp_path = self.index_path.with_suffix('.tmp')
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(self._index, f, ensure_ascii=False)
+            os.replace(tmp_path, self.index_path)
+        except Exception as e:
+            self.logger.error(f"保存渲染索引失败: {str(e)}")
+
+    def _schedule_flush(self) -> None:
+        """索引已变化，延迟写入索引文件（已有待执行的写入时合并），调用方需持有锁"""
+        if self.flush_interval <= 0:
+            self._save_index()
+            return
+        if self._flush_timer is None:
+            self._flush_timer = threading.Timer(self.flush_interval, self.flush)
+            self._flush_timer.daemon = True
+            self._flush_timer.start()
+
+    def flush(self) -> None:
+        """立即写入尚未保存的索引变化（退出前调用）"""
+        with self._lock:
+            if self._flush_timer is None:
+                return
+            self._flush_timer.cancel()
+            self._flush_timer = None
+            self._save_index()
+
+    @staticmethod
+    def make_key(mode: str, data: Any, version: str) -> str:
+        """
+        计算缓存键
+
+        Args:
+            mode: 生成模式
+            data: 渲染数据
+            version: 渲染器/模板版本
+        """
+        normalized = json.dumps(data, sort_keys=True, ensure_ascii=False, separators=(',', ':'), default=str)
+        digest = hashlib.sha256()
+        digest.update(f"{mode}\0{version}\0".encode('utf-8'))
+        digest.update(normalized.encode('utf-8'))
+        return digest.hexdigest()
+
+    def lookup(self, key: str) -> Optional[str]:
+        """
+        查询已生成的图片
+
+        Returns:
+            图片路径；未命中或文件已被删除时返回None
+        """
+        with self._lock:
+            entry = self._index.get(key)
+            if entry is not None:
+                filepath = self.cache_dir / entry['file']
+                if filepath.exists():
+                    self.hits += 1
+                    return str(filepath)
+                # 文件已被清理，移除失效的索引项
+                del self._index[key]
+                self._schedule_flush()
+            self.misses += 1
+            return None
+
+    def store(self, key: str, filepath: str) -> None:
+        """
+        记录新生成的图片
+
+        Args:
+            key: 缓存键
+            filepath: 图片路径（需位于缓存目录中）
+        """
+        with self._lock:
+            self._index[key] = {'file': Path(filepath).name, 'created': int(time.time())}
+            self._schedule_flush()
+
+    def forget(self, filenames: Iterable[str]) -> int:
+        """
+        移除指向已删除图片的索引项（缓存清理线程删除图片后调用）
+
+        Args:
+            filenames: 已删除的图片文件名
+
+        Returns:
+            移除的索引项数
+        """
+        names = set(filenames)
+        if not names:
+            return 0
+        with self._lock:
+            stale = [key for key, entry in self._index.items() if entry['file'] in names]
+            for key in stale:
+                del self._index[key]
+            if stale:
+                self._schedule_flush()
+        return len(stale)
+
+    def stats(self) -> Dict[str, Any]:
+        """获取缓存命中统计"""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'entries': len(self._index),
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': (self.hits / total) if total else 0.0,
+            }
@@ -0,0 +1,152 @@
+"""
+渲染任务调度
+
+浏览器池（或渲染进程池）的任务队列按优先级分类：交互式指令（如“查村庄”）总是先于后台批量任务
+（定时部落报告等）执行；同一优先级内按群轮转，刷屏的群只能轮流占用渲染器。
+交互式任务带有截止时间，排队超过截止时间仍未开始渲染时直接放弃，由调用方回复文字版结果。配置项：
+    RENDER_INTERACTIVE_DEADLINE     交互式任务的截止时间（秒），0 表示不限制
+    RENDER_BACKGROUND_DEADLINE      后台任务的截止时间（秒），0 表示不限制
+"""
+import os
+import time
+import queue
+import threading
+from collections import OrderedDict, deque
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+from typing import Any, Deque, Dict, NamedTuple, Optional
+
+# 优先级分类，数值越小越先执行
+PRIORITY_INTERACTIVE = 0
+PRIORITY_BACKGROUND = 1
+
+# 各优先级截止时间的配置项及默认值（秒）
+DEADLINE_ENV = {
+    PRIORITY_INTERACTIVE: ('RENDER_INTERACTIVE_DEADLINE', 20),
+    PRIORITY_BACKGROUND: ('RENDER_BACKGROUND_DEADLINE', 0),
+}
+
+
+class RenderDeadlineExceeded(TimeoutError):
+    """渲染任务在截止时间前未能开始，已被放弃"""
+
+
+class JobSchedule(NamedTuple):
+    """渲染任务的调度信息"""
+    # 优先级分类（PRIORITY_INTERACTIVE / PRIORITY_BACKGROUND）
+    priority: int = PRIORITY_INTERACTIVE
+    # 发起任务的群（私聊为发送者），同一优先级内按群轮转
+    room: str = ''
+    # 截止时间（time.monotonic），为None时不限制
+    deadline: Optional[float] = None
+
+    @classmethod
+    def create(cls, priority: int = PRIORITY_INTERACTIVE, room: str = '') -> 'JobSchedule':
+        """按优先级对应的截止时间配置创建调度信息，截止时间从现在开始计算"""
+        name, default = DEADLINE_ENV.get(priority, DEADLINE_ENV[PRIORITY_BACKGROUND])
+        seconds = float(os.getenv(name, default))
+        return cls(priority, room or '', time.monotonic() + seconds if seconds > 0 else None)
+
+    def remaining(self) -> Optional[float]:
+        """距截止时间的秒数，不限制时为None"""
+        if self.deadline is None:
+            return None
+        return self.deadline - time.monotonic()
+
+
+class RenderJobQueue:
+    """
+    按优先级及群轮转的任务队列（浏览器池和渲染进程池共用，接口与 queue.Queue 的常用部分一致）
+
+    put(None) 放入的退出信号在所有任务取完后才返回，与 FIFO 队列中排在已有任务之后的行为相同。
+    """
+
+    def __init__(self):
+        self._cond = threading.Condition()
+        # 优先级 -> 群 -> 该群排队的任务
+        self._rooms: Dict[int, "OrderedDict[str, Deque[Any]]"] = {}
+        self._controls: Deque[Any] = deque()
+        self._size = 0
+
+    def put(self, item: Any, schedule: Optional[JobSchedule] = None) -> None:
+        """
+        放入任务
+
+        Args:
+            item: 任务，None 为工作线程的退出信号
+            schedule: 调度信息，为None时按交互式任务处理
+        """
+        with self._cond:
+            if item is None:
+                self._controls.append(item)
+            else:
+                schedule = schedule or JobSchedule()
+                rooms = self._rooms.setdefault(schedule.priority, OrderedDict())
+                rooms.setdefault(schedule.room, deque()).append(item)
+                self._size += 1
+            self._cond.notify()
+
+    def _pop(self) -> Any:
+        """取出优先级最高的一类中、轮到的群的第一个任务（调用方持有锁且队列非空）"""
+        if self._size:
+            priority = min(p for p, rooms in self._rooms.items() if rooms)
+            rooms = self._rooms[priority]
+            room, items = next(iter(rooms.items()))
+            item = items.popleft()
+            if items:
+                # 该群还有任务，排到本优先级的队尾以便其他群轮转
+                rooms.move_to_end(room)
+            else:
+                del rooms[room]
+            self._size -= 1
+            return item
+        return self._controls.popleft()
+
+    def get(self, block: bool = True, timeout: Optional[float] = None) -> Any:
+        """取出下一个任务，队列为空时等待；超时或非阻塞时队列为空抛出 queue.Empty"""
+        with self._cond:
+            if not self._cond.wait_for(lambda: self._size or self._controls, timeout if block else 0):
+                raise queue.Empty
+            return self._pop()
+
+    def get_nowait(self) -> Any:
+        return self.get(block=False)
+
+    def qsize(self) -> int:
+        """排队中的任务数（不含退出信号）"""
+        with self._cond:
+            return self._size
+
+    def room_sizes(self) -> Dict[int, Dict[str, int]]:
+        """各优先级各群排队的任务数"""
+        with self._cond:
+            return {priority: {room: len(items) for room, items in rooms.items()}
+                    for priority, rooms in self._rooms.items() if rooms}
+
+
+def wait_for_result(future: Future, schedule: Optional[JobSchedule], timeout: Optional[float] = None) -> Any:
+    """
+    等待渲染任务完成，任务在截止时间前仍未开始时取消任务
+
+    Args:
+        future: 任务的 Future 对象
+        schedule: 任务的调度信息
+        timeout: 任务开始后的等待时间上限（秒）
+
+    Returns:
+        任务结果
+
+    Raises:
+        RenderDeadlineExceeded: 任务在截止时间前未能开始
+    """
+    remaining = schedule.remaining() if schedule is not None else None
+    if remaining is not None:
+        try:
+            return future.result(timeout=max(remaining, 0))
+        except FutureTimeoutError:
+            if future.done():
+                # 任务本身抛出的超时异常
+                raise
+            # 仍在排队的任务取消后不会再被执行；已开始渲染的任务继续等待完成
+            if future.cancel():
+                raise RenderDeadlineExceeded(f"渲染任务排队超过截止时间（优先级 {schedule.priority}）")
+    return future.result(timeout=timeout)
@@ -0,0 +1,220 @@
+import io
+import re
+import hashlib
+import logging
+import mimetypes
+import threading
+from pathlib import Path
+from typing import Dict, Iterable, NamedTuple, Optional, Tuple, Union
+
+from PIL import Image
+
+from .asset_store import to_data_uri
+
+# 本地图标目录
+PIC_SRC_DIR = Path(__file__).parent.parent.parent / "storage/pic_src"
+
+# 1x1 透明像素，图标缺失时的占位图
+TRANSPARENT_PIXEL = "data:image/gif;base64,R0lGODlhAQABAIAAAAAAAP///yH5BAEAAAAALAAAAAABAAEAAAIBRAA7"
+
+
+class SpriteSheet(NamedTuple):
+    """合并后的雪碧图：样式表（只包含一次图片数据）及每个图标对应的 CSS 类名"""
+    css: str
+    classes: Dict[str, str]
+
+
+class SpriteRegistry:
+    """
+    本地图标的进程级缓存
+
+    每个文件第一次使用时读取并编码为 data URI，之后直接复用；文件修改时间或大小变化时自动重新加载。
+    对同一页面中重复出现的图标，可以合并为一张雪碧图，页面中只保留一份图片数据。
+    """
+
+    def __init__(self, root: Path = PIC_SRC_DIR):
+        """
+        初始化图标缓存
+
+        Args:
+            root: 图标根目录，相对路径以此为基准
+        """
+        self.logger = logging.getLogger('SpriteRegistry')
+        self.logger.setLevel(logging.INFO)
+
+        self.root = Path(root)
+        self._lock = threading.Lock()
+        # 绝对路径 -> (mtime_ns, size, 文件内容)
+        self._contents: Dict[Path, Tuple[int, int, bytes]] = {}
+        # 绝对路径 -> (mtime_ns, size, data URI)
+        self._data_uris: Dict[Path, Tuple[int, int, str]] = {}
+        # 雪碧图参数及文件版本 -> SpriteSheet
+        self._sheets: Dict[Tuple, SpriteSheet] = {}
+
+    def resolve(self, path: Union[str, Path]) -> Path:
+        """相对于图标根目录解析路径"""
+        path = Path(path)
+        return path if path.is_absolute() else self.root / path
+
+    @staticmethod
+    def _version(path: Path) -> Optional[Tuple[int, int]]:
+        try:
+            stat = path.stat()
+        except OSError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    def read(self, path: Union[str, Path]) -> Optional[bytes]:
+        """
+        读取图标文件内容（缓存在内存中，文件修改后重新读取）
+
+        Args:
+            path: 图标路径（绝对路径或相对于图标根目录）
+
+        Returns:
+            文件内容，文件不存在或读取失败时返回None
+        """
+        path = self.resolve(path)
+        version = self._version(path)
+        if version is None:
+            return None
+
+        cached = self._contents.get(path)
+        if cached is not None and cached[:2] == version:
+            return cached[2]
+
+        try:
+            content = path.read_bytes()
+        except OSError as e:
+            self.logger.error(f"读取图标失败 {path}: {e}")
+            return None
+        with self._lock:
+            self._contents[path] = (*version, content)
+        return content
+
+    def data_uri(self, path: Union[str, Path], default: Optional[str] = None) -> Optional[str]:
+        """
+        获取图标的 data URI
+
+        Args:
+            path: 图标路径（绝对路径或相对于图标根目录）
+            default: 文件不存在或读取失败时的返回值
+
+        Returns:
+            data URI，失败时返回 default
+        """
+        path = self.resolve(path)
+        version = self._version(path)
+        if version is None:
+            self.logger.warning(f"图标文件不存在: {path}")
+            return default
+
+        cached = self._data_uris.get(path)
+        if cached is not None and cached[:2] == version:
+            return cached[2]
+
+        content = self.read(path)
+        if content is None:
+            return default
+        mime = mimetypes.guess_type(path.name)[0] or "image/png"
+        data_uri = to_data_uri(content, mime)
+        with self._lock:
+            self._data_uris[path] = (*version, data_uri)
+        return data_uri
+
+    def sprite_sheet(self, paths: Iterable[Union[str, Path]], height: int, scale: int = 2) -> SpriteSheet:
+        """
+        将多个图标合并为一张雪碧图，生成引用它的 CSS 类
+
+        每个图标按 height（CSS 像素）等比缩放后横向排列，图片按 scale 倍分辨率保存以保证清晰。
+        生成的类名为 sprite-<相对路径>，使用时写作 <span class="sprite sprite-..."></span>。
+        相同参数且文件未修改时直接复用已生成的雪碧图。
+
+        Args:
+            paths: 图标路径列表
+            height: 显示高度（CSS 像素）
+            scale: 图片分辨率倍数
+
+        Returns:
+            SpriteSheet(css, classes)，classes 为 原始路径 -> 类名
+        """
+        paths = list(paths)
+        resolved = [self.resolve(path) for path in paths]
+        key = (tuple(resolved), height, scale, tuple(self._version(path) for path in resolved))
+        sheet = self._sheets.get(key)
+        if sheet is not None:
+            return sheet
+
+        icons = []
+        for path in resolved:
+            try:
+                with Image.open(path) as image:
+                    image = image.convert('RGBA')
+                    width = max(1, round(image.width * height * scale / image.height))
+                    icons.append(image.resize((width, height * scale), Image.LANCZOS))
+            except OSError as e:
+                self.logger.warning(f"无法加载图标 {path}: {e}")
+                icons.append(None)
+
+        sheet_width = sum(icon.width for icon in icons if icon) or 1
+        canvas = Image.new('RGBA', (sheet_width, height * scale), (0, 0, 0, 0))
+        sheet_id = hashlib.sha1(repr(key).encode('utf-8')).hexdigest()[:8]
+        rules = [f".sprite-{sheet_id} {{ display: inline-block; background-repeat: no-repeat; "
+                 f"background-size: {sheet_width / scale:g}px {height}px; }}"]
+        classes = {}
+        x = 0
+        for path, icon in zip(paths, icons):
+            class_name = f"sprite-{self._slug(path)}"
+            classes[path] = f"sprite-{sheet_id} {class_name}"
+            if icon is None:
+                rules.append(f".{class_name} {{ width: 0; height: {height}px; }}")
+                continue
+            canvas.paste(icon, (x, 0))
+            rules.append(f".{class_name} {{ width: {icon.width / scale:g}px; height: {height}px; "
+                         f"background-position: -{x / scale:g}px 0; }}")
+            x += icon.width
+
+        buffer = io.BytesIO()
+        canvas.save(buffer, format='PNG', optimize=True)
+        rules.insert(1, f".sprite-{sheet_id} {{ background-image: url({to_data_uri(buffer.getvalue())}); }}")
+        sheet = SpriteSheet("\n".join(rules), classes)
+        with self._lock:
+            self._sheets[key] = sheet
+        return sheet
+
+    def _slug(self, path: Union[str, Path]) -> str:
+        """路径转换为可用作 CSS 类名的字符串"""
+        path = self.resolve(path)
+        try:
+            path = path.relative_to(self.root)
+        except ValueError:
+            pass
+        return re.sub(r'[^a-zA-Z0-9_-]+', '-', str(path.with_suffix(''))).strip('-').lower()
+
+    def stats(self) -> Dict[str, int]:
+        """缓存统计信息"""
+        return {
+            'files': len(self._contents),
+            'icons': len(self._data_uris),
+            'sheets': len(self._sheets),
+            'bytes': sum(len(entry[2]) for entry in self._data_uris.values()),
+        }
+
+
+_sprite_registry: Optional[SpriteRegistry] = None
+_sprite_registry_lock = threading.Lock()
+
+
+def get_sprite_registry() -> SpriteRegistry:
+    """获取共享的本地图标缓存"""
+    global _sprite_registry
+    if _sprite_registry is None:
+        with _sprite_registry_lock:
+            if _sprite_registry is None:
+                _sprite_registry = SpriteRegistry()
+    return _sprite_registry
+
+
+def sprite_data_uri(path: Union[str, Path], default: Optional[str] = None) -> Optional[str]:
+    """获取本地图标的 data URI（使用共享缓存）"""
+    return get_sprite_registry().data_uri(path, default)
@@ -0,0 +1,187 @@
+/*
+ * 冲杯图片使用的奖杯曲线绘制脚本（内联到页面中，不依赖网络）
+ *
+ * 只实现页面需要的功能：单条平滑折线（单调三次插值）、渐变填充、Y 轴刻度和网格线。
+ * 不使用动画，绘制完成后设置 window.__chartReady = true，截图方以此为就绪信号。
+ */
+(function (global) {
+    'use strict';
+
+    // 计算合适的刻度间隔（1/2/5 × 10^n）
+    function niceStep(range, maxTicks) {
+        var rough = range / Math.max(maxTicks - 1, 1);
+        var power = Math.pow(10, Math.floor(Math.log10(rough)));
+        var steps = [1, 2, 5, 10];
+        for (var i = 0; i < steps.length; i++) {
+            if (steps[i] * power >= rough) {
+                return steps[i] * power;
+            }
+        }
+        return 10 * power;
+    }
+
+    // 单调三次插值的切线（Fritsch-Carlson），保证曲线不会越过相邻数据点
+    function monotoneTangents(points) {
+        var n = points.length;
+        var deltas = [];
+        var tangents = [];
+        for (var i = 0; i < n - 1; i++) {
+            var dx = points[i + 1].x - points[i].x;
+            deltas.push(dx === 0 ? 0 : (points[i + 1].y - points[i].y) / dx);
+        }
+        for (i = 0; i < n; i++) {
+            if (i === 0) {
+                tangents.push(deltas[0] || 0);
+            } else if (i === n - 1) {
+                tangents.push(deltas[n - 2] || 0);
+            } else if (deltas[i - 1] * deltas[i] <= 0) {
+                tangents.push(0);
+            } else {
+                tangents.push((deltas[i - 1] + deltas[i]) / 2);
+            }
+        }
+        for (i = 0; i < n - 1; i++) {
+            if (deltas[i] === 0) {
+                tangents[i] = 0;
+                tangents[i + 1] = 0;
+                continue;
+            }
+            var a = tangents[i] / deltas[i];
+            var b = tangents[i + 1] / deltas[i];
+            var s = a * a + b * b;
+            if (s > 9) {
+                var t = 3 / Math.sqrt(s);
+                tangents[i] = t * a * deltas[i];
+                tangents[i + 1] = t * b * deltas[i];
+            }
+        }
+        return tangents;
+    }
+
+    function tracePath(ctx, points) {
+        var tangents = monotoneTangents(points);
+        ctx.moveTo(points[0].x, points[0].y);
+        for (var i = 0; i < points.length - 1; i++) {
+            var p0 = points[i];
+            var p1 = points[i + 1];
+            var dx = (p1.x - p0.x) / 3;
+            ctx.bezierCurveTo(p0.x + dx, p0.y + dx * tangents[i],
+                              p1.x - dx, p1.y - dx * tangents[i + 1],
+                              p1.x, p1.y);
+        }
+    }
+
+    function draw(canvas, config) {
+        var data = config.data || [];
+        var maxTicks = config.maxTicks || 3;
+        var fontSize = config.fontSize || 10;
+        var tickPadding = config.tickPadding || 10;
+
+        // 画布铺满父容器的内容区域（先收起画布，避免画布默认尺寸撑大容器），按设备像素比绘制保证清晰
+        var parent = canvas.parentNode;
+        var style = global.getComputedStyle(parent);
+        canvas.style.display = 'block';
+        canvas.style.height = '0px';
+        var width = parent.clientWidth - parseFloat(style.paddingLeft) - parseFloat(style.paddingRight);
+        var height = parent.clientHeight - parseFloat(style.paddingTop) - parseFloat(style.paddingBottom);
+        var ratio = global.devicePixelRatio || 1;
+        canvas.style.width = width + 'px';
+        canvas.style.height = height + 'px';
+        canvas.width = Math.round(width * ratio);
+        canvas.height = Math.round(height * ratio);
+
+        var ctx = canvas.getContext('2d');
+        ctx.scale(ratio, ratio);
+        if (!data.length) {
+            return;
+        }
+
+        // Y 轴范围：下限固定为 config.min（低于下限的数据被裁剪），上限取数据最大值向上取整
+        var dataMax = Math.max.apply(null, data);
+        var yMin = config.min !== undefined ? config.min : Math.min.apply(null, data);
+        var step = niceStep(Math.max(dataMax - yMin, 1), maxTicks);
+        var yMax = Math.max(Math.ceil(dataMax / step) * step, yMin + step);
+        var ticks = [];
+        for (var v = yMin; v <= yMax + 1e-9; v += step) {
+            ticks.push(v);
+        }
+
+        ctx.font = fontSize + 'px ' + style.fontFamily;
+        var labelWidth = 0;
+        ticks.forEach(function (tick) {
+            labelWidth = Math.max(labelWidth, ctx.measureText(String(tick)).width);
+        });
+        var left = labelWidth + tickPadding;
+        var top = fontSize / 2 + 1;
+        var bottom = height - fontSize / 2 - 1;
+        var right = width;
+
+        function toY(value) {
+            return bottom - (value - yMin) / (yMax - yMin) * (bottom - top);
+        }
+
+        // 网格线和刻度
+        ctx.lineWidth = 1;
+        ctx.strokeStyle = config.gridColor || 'rgba(0, 0, 0, 0.05)';
+        ctx.fillStyle = config.tickColor || '#666';
+        ctx.textAlign = 'right';
+        ctx.textBaseline = 'middle';
+        ticks.forEach(function (tick) {
+            var y = Math.round(toY(tick)) + 0.5;
+            ctx.beginPath();
+            ctx.moveTo(left, y);
+            ctx.lineTo(right, y);
+            ctx.stroke();
+            ctx.fillText(String(tick), left - tickPadding, y);
+        });
+
+        // 数据点（单个数据点时画成水平线）
+        var count = data.length;
+        var points = data.map(function (value, i) {
+            var x = count > 1 ? left + (right - left) * i / (count - 1) : left;
+            return {x: x, y: toY(value)};
+        });
+        if (count === 1) {
+            points.push({x: right, y: points[0].y});
+        }
+
+        ctx.save();
+        ctx.beginPath();
+        ctx.rect(left, top, right - left, bottom - top);
+        ctx.clip();
+
+        // 渐变填充
+        if (config.fill) {
+            var gradient = ctx.createLinearGradient(0, 0, 0, 150);
+            gradient.addColorStop(0, config.fill[0]);
+            gradient.addColorStop(1, config.fill[1]);
+            ctx.beginPath();
+            tracePath(ctx, points);
+            ctx.lineTo(points[points.length - 1].x, bottom);
+            ctx.lineTo(points[0].x, bottom);
+            ctx.closePath();
+            ctx.fillStyle = gradient;
+            ctx.fill();
+        }
+
+        // 折线
+        ctx.beginPath();
+        tracePath(ctx, points);
+        ctx.lineWidth = config.lineWidth || 2;
+        ctx.lineCap = 'round';
+        ctx.lineJoin = 'round';
+        ctx.strokeStyle = config.color || '#3498db';
+        ctx.stroke();
+        ctx.restore();
+    }
+
+    global.TrophyChart = {
+        draw: function (canvas, config) {
+            try {
+                draw(canvas, config);
+            } finally {
+                global.__chartReady = true;
+            }
+        }
+    };
+})(window);
@@ -0,0 +1,76 @@
+"""
+预编译的 HTML 模板
+
+页面骨架和行片段使用 str.format 语法编写，导入时编译为一个 f-string 函数，
+渲染时一次性拼接出整个字符串，不再每次解析模板或逐段拼接。
+静态 CSS 在导入时作为字面量编译进页面骨架，渲染时不再参与格式化。
+"""
+from string import Formatter
+from typing import Any, Iterable, Mapping, Optional
+
+_formatter = Formatter()
+
+
+class Template:
+    """
+    预编译的字符串模板（str.format 语法，字段只支持名称及格式说明）
+
+    模板在创建时编译为等价的 f-string 函数，字段值从传入的字典中读取。
+    """
+
+    def __init__(self, source: str, **constants: str):
+        """
+        编译模板
+
+        Args:
+            source: 模板字符串，字面量中的花括号写作 {{ 和 }}
+            **constants: 编译时替换的静态内容（如 CSS），内容按原样插入，无需转义花括号
+        """
+        if constants:
+            source = self._inline_constants(source, constants)
+        self.source = source
+
+        pieces = []
+        fields = set()
+        for literal, field, spec, conversion in _formatter.parse(source):
+            if literal:
+                pieces.append(repr(literal))
+            if field is None:
+                continue
+            if conversion or not field.isidentifier() or any(c in (spec or '') for c in '{}"\\'):
+                raise ValueError(f"模板只支持简单字段及格式说明: {field}")
+            fields.add(field)
+            pieces.append(f'f"{{v[{field!r}]{":" + spec if spec else ""}}}"')
+        self.fields = frozenset(fields)
+        code = compile(f"lambda v: {' '.join(pieces) or repr('')}", "<template>", "eval")
+        self._render = eval(code)
+
+    @staticmethod
+    def _inline_constants(source: str, constants: Mapping[str, str]) -> str:
+        """将静态内容转义后替换到模板中的对应字段"""
+        pieces = []
+        for literal, field, spec, conversion in _formatter.parse(source):
+            pieces.append(literal.replace('{', '{{').replace('}', '}}'))
+            if field is None:
+                continue
+            if field in constants:
+                pieces.append(constants[field].replace('{', '{{').replace('}', '}}'))
+            else:
+                pieces.append("{" + field + (f"!{conversion}" if conversion else "") + (f":{spec}" if spec else "") + "}")
+        return "".join(pieces)
+
+    def render(self, values: Optional[Mapping[str, Any]] = None, **kwargs) -> str:
+        """
+        使用字段值渲染模板
+
+        Args:
+            values: 字段值
+            **kwargs: 其他字段值（覆盖 values 中的同名字段）
+        """
+        if kwargs:
+            values = {**values, **kwargs} if values else kwargs
+        return self._render(values)
+
+    def render_rows(self, rows: Iterable[Mapping[str, Any]]) -> str:
+        """逐行渲染片段并一次性拼接"""
+        return "".join(self.render(row) for row in rows)
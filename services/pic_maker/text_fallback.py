@@ -0,0 +1,126 @@
+"""
+文字版结果
+
+渲染任务排队超过截止时间被放弃时，用已经取到的数据生成简短的文字摘要回复，
+用户不必等待图片，也不会收不到任何结果。
+"""
+import logging
+from typing import Any, Callable, Dict
+
+logger = logging.getLogger('TextFallback')
+
+# 文字摘要中最多列出的成员数
+MAX_LISTED_MEMBERS = 10
+
+
+def _player_info(data: Dict[str, Any]) -> str:
+    clan = data.get('clan') or {}
+    lines = [
+        f"玩家：{data.get('name', '未知')} {data.get('tag', '')}",
+        f"大本营：{data.get('townHallLevel', '?')} 本  经验等级：{data.get('expLevel', '?')}",
+        f"奖杯：{data.get('trophies', 0)}（最高 {data.get('bestTrophies', 0)}）",
+        f"部落战星数：{data.get('warStars', 0)}",
+    ]
+    if clan:
+        lines.append(f"部落：{clan.get('name', '')} {clan.get('tag', '')}")
+    return "\n".join(lines)
+
+
+def _player_legend(data: Dict[str, Any]) -> str:
+    from .player_legend import get_most_recent_day_data
+    date, day_data = get_most_recent_day_data(data)
+    lines = [f"玩家：{data.get('name', '未知')} {data.get('tag', '')}"]
+    if not day_data:
+        lines.append("暂无冲杯记录")
+        return "\n".join(lines)
+    attacks = day_data.get('new_attacks', [])
+    defenses = day_data.get('new_defenses', [])
+    gained = sum(abs(attack.get('change', 0)) for attack in attacks)
+    lost = sum(abs(defense.get('change', 0)) for defense in defenses)
+    battles = sorted(attacks + defenses, key=lambda battle: battle.get('time', 0))
+    lines.append(f"日期：{date}")
+    if battles:
+        lines.append(f"当前奖杯：{battles[-1].get('trophies', '?')}")
+    lines.append(f"进攻 {len(attacks)} 次 +{gained}，防守 {len(defenses)} 次 -{lost}，净变化 {gained - lost:+d}")
+    return "\n".join(lines)
+
+
+def _player_warhits(data: Any) -> str:
+    from .player_warhits import compute_warhits_stats
+    items = data.get('items', []) if isinstance(data, dict) else data
+    if not items:
+        return "暂无部落战记录"
+    member = items[0].get('member_data', {})
+    stats, score = compute_warhits_stats(items)
+    lines = [f"玩家：{member.get('name', '未知')} {member.get('tag', '')}", f"综合评分：{score:.1f}"]
+    for war_type, label in (('cwl', '联赛'), ('random', '部落战')):
+        attacks = stats[war_type]['attacks']
+        defenses = stats[war_type]['defenses']
+        if attacks['total'] or defenses['total']:
+            lines.append(f"{label}：进攻 {attacks['total']} 次 平均 {attacks['avg_stars']:.2f} 星，"
+                         f"防守 {defenses['total']} 次 平均被打 {defenses['avg_stars']:.2f} 星")
+    return "\n".join(lines)
+
+
+def _clan_info(data: Dict[str, Any]) -> str:
+    lines = [
+        f"部落：{data.get('name', '未知')} {data.get('tag', '')}",
+        f"等级：{data.get('clanLevel', '?')}  成员：{data.get('members', len(data.get('memberList') or []))}/50",
+        f"部落战：{data.get('warWins', 0)}胜/{data.get('warTies', 0)}平/{data.get('warLosses', 0)}负  连胜：{data.get('warWinStreak', 0)}",
+        f"积分：{data.get('clanPoints', 0)}",
+    ]
+    members = sorted(data.get('memberList') or [], key=lambda member: member.get('clanRank', 99))
+    if members:
+        lines.append("成员排名：")
+        lines.extend(f"{rank}. {member.get('name', '')} {member.get('trophies', 0)}杯"
+                     for rank, member in enumerate(members[:MAX_LISTED_MEMBERS], 1))
+        if len(members) > MAX_LISTED_MEMBERS:
+            lines.append(f"……共 {len(members)} 人")
+    return "\n".join(lines)
+
+
+def _clan_raids(data: Dict[str, Any]) -> str:
+    from .clan_raids import process_raid_data
+    members, _ = process_raid_data(data)
+    if not members:
+        return "暂无突袭记录"
+    attacks = sum(member.get('attacks', 0) for member in members)
+    loot = sum(member.get('capitalResourcesLooted', 0) for member in members)
+    unfinished = [member for member in members if member.get('attacks', 0) < member.get('max_attacks', 6)]
+    lines = [f"突袭进攻 {attacks} 次，共获得 {loot} 紫币", "紫币排名："]
+    lines.extend(f"{rank}. {member.get('name', '')} {member.get('capitalResourcesLooted', 0)}"
+                 for rank, member in enumerate(members[:MAX_LISTED_MEMBERS], 1))
+    if unfinished:
+        lines.append(f"未打满：{'、'.join(member.get('name', '') for member in unfinished[:MAX_LISTED_MEMBERS])}"
+                     + (f" 等 {len(unfinished)} 人" if len(unfinished) > MAX_LISTED_MEMBERS else ""))
+    return "\n".join(lines)
+
+
+# 模式 -> 文字摘要函数
+SUMMARIZERS: Dict[str, Callable[[Any], str]] = {
+    'player_info': _player_info,
+    'player_legend': _player_legend,
+    'player_warhits': _player_warhits,
+    'clan_info': _clan_info,
+    'clan_raids': _clan_raids,
+}
+
+
+def summarize(mode: str, data: Any) -> str:
+    """
+    生成模式对应的文字摘要
+
+    Args:
+        mode: 图片模式
+        data: 渲染数据
+
+    Returns:
+        文字摘要；模式不支持或数据无法解析时为通用提示
+    """
+    summarizer = SUMMARIZERS.get(mode)
+    if summarizer is not None:
+        try:
+            return f"图片生成繁忙，先发送文字版：\n{summarizer(data)}"
+        except Exception as e:
+            logger.warning(f"生成 {mode} 文字摘要失败: {e}")
+    return "图片生成繁忙，请稍后再试"
@@ -0,0 +1,97 @@
+"""
+长图分页
+
+成员较多的列表（部落信息、部落突袭）渲染成一张长图时栅格化很慢，发送到微信后还会被压缩得无法辨认。
+分页模式下按数据预先计算页数，每页只渲染固定行数的成员卡片，各页并行渲染后按顺序发送。配置项：
+    TILED_MODES     启用分页的模式，如 clan_info,clan_raids
+    TILE_ROWS       每页的成员卡片行数
+"""
+import os
+import logging
+from typing import Any, Callable, Dict, List, NamedTuple, Tuple
+
+logger = logging.getLogger('Tiling')
+
+# 默认每页的成员卡片行数
+DEFAULT_TILE_ROWS = 6
+
+
+class Tile(NamedTuple):
+    """一页的成员范围"""
+    # 页序号（从 0 开始）
+    index: int
+    # 总页数
+    count: int
+    # 本页成员在完整列表中的范围 [start, stop)
+    start: int
+    stop: int
+
+    @property
+    def label(self) -> str:
+        """页码文本，如 (2/3)"""
+        return f"({self.index + 1}/{self.count})"
+
+    def slice(self, items: List[Any]) -> List[Any]:
+        """取出本页的成员"""
+        return items[self.start:self.stop]
+
+
+def _count_clan_info(data: Dict[str, Any]) -> int:
+    return len(data.get('memberList') or [])
+
+
+def _count_clan_raids(data: Dict[str, Any]) -> int:
+    from .clan_raids import process_raid_data
+    members, _ = process_raid_data(data)
+    return len(members or [])
+
+
+# 支持分页的模式 -> (每行卡片数（与模板的成员列表列数一致）, 统计成员数的函数)
+TILE_LAYOUTS: Dict[str, Tuple[int, Callable[[Dict[str, Any]], int]]] = {
+    'clan_info': (4, _count_clan_info),
+    'clan_raids': (5, _count_clan_raids),
+}
+
+
+def tiled_modes() -> set:
+    """TILED_MODES 中配置的、支持分页的模式"""
+    modes = {mode.strip() for mode in os.getenv('TILED_MODES', '').split(',') if mode.strip()}
+    return modes & TILE_LAYOUTS.keys()
+
+
+def split_tiles(item_count: int, per_page: int) -> List[Tile]:
+    """
+    将成员列表按每页数量分页
+
+    Args:
+        item_count: 成员总数
+        per_page: 每页成员数
+
+    Returns:
+        各页的范围，成员数不超过一页时只有一页
+    """
+    per_page = max(1, per_page)
+    count = max(1, -(-item_count // per_page))
+    return [Tile(index, count, index * per_page, min(item_count, (index + 1) * per_page)) for index in range(count)]
+
+
+def plan_tiles(mode: str, data: Dict[str, Any]) -> List[Tile]:
+    """
+    按数据预先计算分页（渲染前即可确定页数）
+
+    Args:
+        mode: 图片模式
+        data: 渲染数据
+
+    Returns:
+        各页的范围；模式未启用分页时为空列表
+    """
+    if mode not in tiled_modes():
+        return []
+    columns, count_items = TILE_LAYOUTS[mode]
+    try:
+        rows = int(os.getenv('TILE_ROWS', DEFAULT_TILE_ROWS))
+    except ValueError:
+        logger.warning(f"配置 TILE_ROWS 不是有效的整数，使用默认值 {DEFAULT_TILE_ROWS}")
+        rows = DEFAULT_TILE_ROWS
+    return split_tiles(count_items(data), rows * columns)
@@ -0,0 +1,170 @@
+"""
+渲染预热
+
+机器人启动时用随包附带的示例数据把每个模板渲染一遍，让浏览器提前加载字体、解码图标，
+Python 侧也提前导入渲染模块、编译模板并填充图标缓存，第一个真实请求不再承担冷启动耗时。
+"""
+import json
+import time
+import random
+import logging
+import tempfile
+from datetime import datetime, timedelta
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger('RenderWarmUp')
+logger.setLevel(logging.INFO)
+
+MODULE_DIR = Path(__file__).parent
+# 调试时保存的部落数据（storage/debug/clan_info_*.json）
+DEBUG_DIR = MODULE_DIR.parent.parent / "storage" / "debug"
+
+
+def sample_legend_data(days: int = 30, seed: int = 0) -> Dict[str, Any]:
+    """生成固定随机种子的冲杯测试数据"""
+    rng = random.Random(seed)
+    legends = {}
+    trophies = 5200
+    base_time = 1746000000
+    for day in range(days):
+        attacks, defenses = [], []
+        for i in range(8):
+            change = rng.randint(5, 40)
+            trophies += change
+            attacks.append({'time': base_time + day * 86400 + i * 600, 'trophies': trophies,
+                            'change': change, 'hero_gear': []})
+            change = rng.randint(0, 40)
+            trophies -= change
+            defenses.append({'time': base_time + day * 86400 + i * 600 + 300, 'trophies': trophies,
+                             'change': -change})
+        date = (datetime(2025, 5, 1) + timedelta(days=day)).strftime('%Y-%m-%d')
+        legends[date] = {'new_attacks': attacks, 'new_defenses': defenses}
+    return {'name': 'Benchmark', 'tag': '#BENCH', 'legends': legends}
+
+
+def sample_player_data() -> Dict[str, Any]:
+    """
+    生成玩家信息的测试数据：拥有所有英雄、装备、部队和法术，页面用到的每个本地图标都会被加载
+
+    不包含标签、部落徽章和联赛图标的远程地址，预热时不会下载图片。
+    """
+    from .player_info import hero_order, hero_equipment_map, troop_list, pet_list, machine_list, spell_list
+
+    def units(names):
+        return [{'name': name, 'level': 1, 'maxLevel': 2, 'village': 'home'} for name in names]
+
+    equipment = [name for hero in hero_order for name in hero_equipment_map.get(hero, [])]
+    return {
+        'name': 'Benchmark', 'tag': '#BENCH', 'labels': [], 'expLevel': 200, 'townHallLevel': 17,
+        'clan': {'name': 'Benchmark', 'badgeUrls': {'small': ''}}, 'role': 'member',
+        'trophies': 5000, 'bestTrophies': 6000,
+        'heroes': units(hero_order), 'heroEquipment': units(equipment),
+        'troops': units(list(dict.fromkeys(troop_list + pet_list + machine_list))), 'spells': units(spell_list),
+    }
+
+
+def _load_json(path: Path) -> Optional[Any]:
+    """读取示例数据，文件不存在或格式错误时返回None"""
+    try:
+        return json.loads(path.read_text(encoding='utf-8'))
+    except (OSError, ValueError) as e:
+        logger.warning(f"无法读取预热数据 {path}: {e}")
+        return None
+
+
+@lru_cache(maxsize=1)
+def warm_up_samples() -> Tuple[Tuple[str, Any], ...]:
+    """
+    各模式的预热数据（只读取一次）
+
+    Returns:
+        ((模式, 数据), ...)，缺少示例数据的模式跳过
+    """
+    samples: List[Tuple[str, Any]] = []
+    clan_info_paths = sorted(DEBUG_DIR.glob("clan_info_*.json"))
+    if clan_info_paths:
+        samples.append(('clan_info', _load_json(clan_info_paths[-1])))
+    samples.append(('clan_raids', _load_json(MODULE_DIR / "capital.json")))
+    samples.append(('player_warhits', _load_json(MODULE_DIR / "test.json")))
+    samples.append(('player_legend', sample_legend_data()))
+    samples.append(('player_info', sample_player_data()))
+    return tuple((mode, data) for mode, data in samples if data)
+
+
+def _browser_renderers() -> Dict[str, Callable[..., Any]]:
+    """各模式的浏览器渲染函数，签名为 (data, output_path, page)"""
+    from .clan_info import generate_clan_info_image
+    from .clan_raids import generate_clan_raids_image
+    from .player_info import generate_player_info_image
+    from .player_legend import generate_player_legend_image
+    from .player_warhits import generate_player_warhits_image
+    return {
+        'clan_info': generate_clan_info_image,
+        'clan_raids': generate_clan_raids_image,
+        'player_info': generate_player_info_image,
+        'player_legend': generate_player_legend_image,
+        'player_warhits': generate_player_warhits_image,
+    }
+
+
+def warm_up_page(page) -> Dict[str, float]:
+    """
+    在页面上用示例数据依次渲染各模板，渲染结果写入临时目录后丢弃
+
+    Args:
+        page: Playwright 页面
+
+    Returns:
+        模式 -> 渲染耗时（毫秒），渲染失败的模式不计入
+    """
+    renderers = _browser_renderers()
+    timings = {}
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for mode, data in warm_up_samples():
+            start = time.perf_counter()
+            try:
+                renderers[mode](data, str(Path(tmp_dir) / f"{mode}.png"), page=page)
+            except Exception as e:
+                logger.warning(f"预热 {mode} 失败: {e}")
+                continue
+            timings[mode] = (time.perf_counter() - start) * 1000
+    return timings
+
+
+def warm_up_pillow() -> Dict[str, float]:
+    """
+    预热 PILLOW_RENDER_MODES 中配置的 Pillow 渲染器（加载字体、缩放图标）
+
+    Returns:
+        模式 -> 渲染耗时（毫秒）
+    """
+    from .pillow_engine import pillow_render_modes
+    modes = pillow_render_modes()
+    renderers = {}
+    if 'clan_raids' in modes:
+        from .clan_raids_pillow import render_clan_raids_image
+        renderers['clan_raids'] = render_clan_raids_image
+    if 'player_warhits' in modes:
+        from .player_warhits_pillow import render_player_warhits_image
+        renderers['player_warhits'] = render_player_warhits_image
+
+    timings = {}
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for mode, data in warm_up_samples():
+            if mode not in renderers:
+                continue
+            start = time.perf_counter()
+            try:
+                renderers[mode](data, str(Path(tmp_dir) / f"{mode}.png"))
+            except Exception as e:
+                logger.warning(f"预热 {mode}（Pillow）失败: {e}")
+                continue
+            timings[mode] = (time.perf_counter() - start) * 1000
+    return timings
+
+
+def format_timings(timings: Dict[str, float]) -> str:
+    """耗时字典格式化为日志文本"""
+    return ", ".join(f"{mode} {elapsed:.0f}ms" for mode, elapsed in timings.items()) or "无"
@@ -1,5 +1,6 @@
 import json
 import os
+import threading
 from datetime import datetime
 from pathlib import Path
 
@@ -8,6 +9,8 @@ DATA_PATH = Path(__file__).parent.parent.parent / "storage" / "sign_system" / "d
 class SignSystem:
     def __init__(self):
         self.data = self._load_data()
+        # 消息由多个工作线程并发处理，签到的读改写需要串行
+        self._lock = threading.Lock()
 
     def _load_data(self):
         if not DATA_PATH.exists():
@@ -29,6 +32,10 @@ class SignSystem:
             user["rank"] = rank
 
     def sign(self, wxid):
+        with self._lock:
+            return self._sign(wxid)
+
+    def _sign(self, wxid):
         today = datetime.now().strftime("%Y-%m-%d")
         user = self.data["users"].get(wxid, {
             "last_sign_date": None,
@@ -0,0 +1,60 @@
+import importlib.util
+import threading
+from pathlib import Path
+
+import pytest
+
+pytest.importorskip("wcferry")
+
+# 直接加载 bot/dispatcher.py，不经过 bot 包的 __init__（其中会启动整个机器人所需的服务）
+_spec = importlib.util.spec_from_file_location(
+    "bot_dispatcher", Path(__file__).resolve().parent.parent / "bot" / "dispatcher.py")
+_dispatcher = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(_dispatcher)
+MsgDispatcher = _dispatcher.MsgDispatcher
+
+
+class FakeMsg:
+    def __init__(self, roomid: str, content: str):
+        self.roomid = roomid
+        self.sender = "sender"
+        self.content = content
+
+    def from_group(self) -> bool:
+        return True
+
+
+def test_full_queue_keeps_active_session():
+    """队列已满时收到正在处理的会话的消息，不能删除该会话的队列（否则工作线程退出）"""
+    started = threading.Event()
+    release = threading.Event()
+    done = threading.Event()
+    handled = []
+
+    def handler(msg):
+        handled.append(msg.content)
+        if msg.content == "r1-1":
+            started.set()
+            release.wait(timeout=5)
+        elif msg.content == "r2-1":
+            done.set()
+
+    replies = []
+    dispatcher = MsgDispatcher(handler, lambda msg, text: replies.append((msg.content, text)),
+                               workers=1, max_queue=1)
+    dispatcher.start()
+    try:
+        assert dispatcher.dispatch(FakeMsg("r1", "r1-1"))
+        assert started.wait(timeout=5)
+        assert dispatcher.dispatch(FakeMsg("r2", "r2-1"))
+        # 队列已满，r1 正在处理且没有排队的消息
+        assert not dispatcher.dispatch(FakeMsg("r1", "r1-2"))
+
+        release.set()
+        assert done.wait(timeout=5)
+        assert handled == ["r1-1", "r2-1"]
+        assert all(t.is_alive() for t in dispatcher._threads)
+        assert dispatcher.stats()['pending'] == 0
+        assert ("r1-2", "⏳ 当前请求过多，请稍后再试") in replies
+    finally:
+        dispatcher.stop()